@@ -3,6 +3,7 @@ from __future__ import annotations
 import json
 import time
 import os
+import uuid
 from dataclasses import asdict
 from typing import List, Optional
 
@@ -11,6 +12,17 @@ import streamlit as st
 import altair as alt
 
 from baccarat_core import RunParams, simulate_hands, save_csv, save_json
+from baccarat_fan import fan_chart
+from baccarat_jobs import JobManager, JobLimitExceeded, JOB_DONE
+from baccarat_history import SessionRegistry
+from baccarat_exports import (
+    ExportCache,
+    SUMMARY_FORMATS,
+    available_report_formats,
+    describe as describe_export,
+    export_mime,
+    export_name,
+)
 from i18n import t, render_language_selector, get_language, set_language
 
 
@@ -572,6 +584,40 @@ def _run_batch(params: RunParams):
         summary = stop.value
     return events, summary
 
+@st.cache_resource
+def _get_job_manager() -> JobManager:
+    """Process-wide job manager shared by all sessions (bounded worker pool)."""
+    return JobManager(
+        max_workers=int(os.environ.get("JOB_WORKERS", "2")),
+        per_user_limit=int(os.environ.get("JOB_PER_USER_LIMIT", "2")),
+        # 按用户保留的已完成任务数（每个任务保留全部逐局事件）
+        keep_finished=int(os.environ.get("JOB_KEEP_FINISHED", "4")),
+    )
+
+
+@st.cache_resource
+def _get_export_cache() -> ExportCache:
+    """Shared on-disk cache for generated download files."""
+    return ExportCache(ttl_seconds=float(os.environ.get("EXPORT_TTL_SECONDS", "3600")))
+
+
+@st.cache_resource
+def _get_playback_registry() -> SessionRegistry:
+    """Process-wide LRU of playback generators/histories with a per-session memory budget."""
+    return SessionRegistry(
+        max_sessions=int(os.environ.get("PLAYBACK_MAX_SESSIONS", "32")),
+        idle_seconds=float(os.environ.get("PLAYBACK_IDLE_SECONDS", "1800")),
+        budget_bytes=int(float(os.environ.get("PLAYBACK_SESSION_BUDGET_MB", "4")) * 1024 * 1024),
+    )
+
+
+def _session_owner() -> str:
+    """Stable per-browser-session id used for per-user job limits."""
+    if "session_owner" not in st.session_state:
+        st.session_state.session_owner = uuid.uuid4().hex
+    return st.session_state.session_owner
+
+
 # 移除原本的st.set_page_config，因为现在在main函数中设置
 
 CSV_COLUMNS = [
@@ -627,6 +673,19 @@ def render_summary(summary, rebate_pct: float = 0.0):
     c11.metric(t("profit_rebate"), f"{profit_with_rebate:+,.2f}")
     c12.metric(t("roi_with_rebate"), f"{roi_with_rebate*100:.2f}%")
 
+    # 风险指标由模拟流式计算，无需保留逐局事件
+    if summary.max_drawdown is not None:
+        c13, c14, c15, c16 = st.columns(4)
+        c13.metric(
+            t("max_drawdown"),
+            f"{summary.max_drawdown:,.2f}",
+            f"-{summary.max_drawdown_pct*100:.2f}% / {summary.max_drawdown_duration}",
+            delta_color="off",
+        )
+        c14.metric(t("volatility"), f"{summary.pnl_volatility:,.2f}")
+        c15.metric(t("sharpe_ratio"), f"{summary.sharpe_ratio:.4f}" if summary.sharpe_ratio is not None else "N/A")
+        c16.metric(t("max_consecutive_losses"), f"{summary.longest_loss_streak}")
+
     st.write(
         f"Outcomes 结果: Player 闲 {summary.player_wins} ({summary.outcome_distribution['player']['pct']*100:.2f}%), "
         f"Banker 庄 {summary.banker_wins} ({summary.outcome_distribution['banker']['pct']*100:.2f}%), "
@@ -795,19 +854,27 @@ def page_play_mode():
         },
     )
 
+    # 生成器与历史记录保存在进程级 LRU 注册表中，闲置会话会被淘汰以控制内存
+    registry = _get_playback_registry()
+    owner = _session_owner()
+    sess = registry.get(owner)
+
     if "params" not in st.session_state:
         st.session_state.params = None
-    if "events" not in st.session_state:
-        st.session_state.events = []
-    if "gen" not in st.session_state:
-        st.session_state.gen = None
     if "playing" not in st.session_state:
         st.session_state.playing = False
+    if st.session_state.playing and sess.gen is None:
+        # 会话已被淘汰
+        st.session_state.playing = False
+    if sess.replaced_evicted:
+        sess.replaced_evicted = False
+        st.info("播放会话因闲置或容量限制被回收，已重新开始 / Playback session was evicted and has restarted")
 
     def reset_state():
-        st.session_state.events = []
-        st.session_state.gen = None
+        registry.reset(owner)
         st.session_state.playing = False
+        # 每次重置/开始都换一个运行标识，导出缓存按它区分不同运行
+        st.session_state.play_run_id = uuid.uuid4().hex
         st.session_state.params = RunParams(
             bankroll=bankroll,
             bet=bet,
@@ -822,9 +889,11 @@ def page_play_mode():
 
     if st.sidebar.button(t("reset")):
         reset_state()
+        sess = registry.get(owner)
 
     if st.session_state.params is None:
         reset_state()
+        sess = registry.get(owner)
 
     def _build_params_from_widgets() -> RunParams:
         return RunParams(
@@ -847,11 +916,15 @@ def page_play_mode():
             win_progression_loss_mode=st.session_state.get("play_win_loss_mode", win_loss_mode),
         )
 
+    def start_run():
+        st.session_state.params = _build_params_from_widgets()
+        sess.gen = simulate_hands(st.session_state.params, yield_per_hand=True)
+        st.session_state.play_run_id = uuid.uuid4().hex
+
     # If user loaded settings with autorun, start automatically once
     loaded = st.session_state.get("play_loaded_payload")
-    if loaded and loaded.get("autorun") and not st.session_state.playing and st.session_state.gen is None:
-        st.session_state.params = _build_params_from_widgets()
-        st.session_state.gen = simulate_hands(st.session_state.params, yield_per_hand=True)
+    if loaded and loaded.get("autorun") and not st.session_state.playing and sess.gen is None:
+        start_run()
         st.session_state.playing = True
 
     st.title(t("baccarat_simulator_playback"))
@@ -859,42 +932,37 @@ def page_play_mode():
     # Controls
     c_ctrl1, c_ctrl2, c_ctrl3, c_ctrl4, c_ctrl5, c_ctrl6 = st.columns(6)
     if c_ctrl1.button(t("start")):
-        st.session_state.params = _build_params_from_widgets()
-        st.session_state.gen = simulate_hands(st.session_state.params, yield_per_hand=True)
+        start_run()
         st.session_state.playing = True
     if c_ctrl2.button(t("pause")):
         st.session_state.playing = False
     if c_ctrl3.button(t("resume")):
-        if st.session_state.gen is None:
-            st.session_state.params = _build_params_from_widgets()
-            st.session_state.gen = simulate_hands(st.session_state.params, yield_per_hand=True)
+        if sess.gen is None:
+            start_run()
         st.session_state.playing = True
     if c_ctrl4.button(t("next")):
-        if st.session_state.gen is None:
-            st.session_state.params = _build_params_from_widgets()
-            st.session_state.gen = simulate_hands(st.session_state.params, yield_per_hand=True)
+        if sess.gen is None:
+            start_run()
         try:
-            ev = next(st.session_state.gen)
-            st.session_state.events.append(ev)
+            ev = next(sess.gen)
+            sess.history.append(ev)
         except StopIteration:
             st.session_state.playing = False
     if c_ctrl5.button(t("skip_5")):
-        if st.session_state.gen is None:
-            st.session_state.params = _build_params_from_widgets()
-            st.session_state.gen = simulate_hands(st.session_state.params, yield_per_hand=True)
+        if sess.gen is None:
+            start_run()
         for _ in range(5):
             try:
-                ev = next(st.session_state.gen)
-                st.session_state.events.append(ev)
+                ev = next(sess.gen)
+                sess.history.append(ev)
             except StopIteration:
                 st.session_state.playing = False
                 break
     if c_ctrl6.button(t("skip_to_report")):
-        if st.session_state.gen is None:
-            st.session_state.params = _build_params_from_widgets()
-            st.session_state.gen = simulate_hands(st.session_state.params, yield_per_hand=True)
-        for ev in st.session_state.gen:
-            st.session_state.events.append(ev)
+        if sess.gen is None:
+            start_run()
+        for ev in sess.gen:
+            sess.history.append(ev)
         st.session_state.playing = False
 
     # Live playback
@@ -906,8 +974,8 @@ def page_play_mode():
     if st.session_state.playing:
         # iterate one step
         try:
-            ev = next(st.session_state.gen)
-            st.session_state.events.append(ev)
+            ev = next(sess.gen)
+            sess.history.append(ev)
         except StopIteration:
             st.session_state.playing = False
 
@@ -915,31 +983,28 @@ def page_play_mode():
         if speed_sec > 0:
             time.sleep(speed_sec)
 
-    events = st.session_state.events
+    history = sess.history
+    stats = history.stats
 
     # Summary-like derived values during playback
-    if events:
-        last = events[-1]
-        player_count = sum(1 for e in events if e.outcome == "player")
-        banker_count = sum(1 for e in events if e.outcome == "banker")
-        tie_count = sum(1 for e in events if e.outcome == "tie")
-        bet_count = sum(1 for e in events if e.bet_side)
-        push_count = sum(1 for e in events if e.bet_side and e.outcome == "tie")
-        wins = sum(1 for e in events if e.bet_side and e.bet_side == e.outcome)
-        attempts = bet_count - push_count
-        hit_rate = (wins / attempts) if attempts > 0 else None
+    if len(history) > 0:
+        last = history.last
+        player_count = stats.player_wins
+        banker_count = stats.banker_wins
+        tie_count = stats.ties
+        hit_rate = stats.hit_rate
 
         with placeholder_metrics.container():
             c1, c2, c3, c4, c5 = st.columns(5)
             c1.metric("Progress", f"{last.hand_no}/{st.session_state.params.hands}")
             c2.metric("Bankroll", f"{last.bankroll_after:,.2f}", f"{last.cumulative_win:+,.2f}")
-            c3.metric("Player", f"{player_count} ({(player_count/len(events))*100:.2f}%)")
-            c4.metric("Banker", f"{banker_count} ({(banker_count/len(events))*100:.2f}%)")
-            c5.metric("Tie", f"{tie_count} ({(tie_count/len(events))*100:.2f}%)")
+            c3.metric("Player", f"{player_count} ({(player_count/stats.hands)*100:.2f}%)")
+            c4.metric("Banker", f"{banker_count} ({(banker_count/stats.hands)*100:.2f}%)")
+            c5.metric("Tie", f"{tie_count} ({(tie_count/stats.hands)*100:.2f}%)")
             st.caption(f"Hit rate 胜率: {hit_rate*100:.2f}%" if hit_rate is not None else "Hit rate 胜率: N/A")
 
         # extra KPI row: turnover/rebate/profit(+rebate)
-        total_wagered = sum(e.bet_amount for e in events if e.bet_side)
+        total_wagered = stats.total_wagered
         rebate_amt = round(total_wagered * (rebate_pct/100.0), 2)
         profit = round(last.bankroll_after - float(st.session_state.params.bankroll), 2)
         profit_with_rebate = round(profit + rebate_amt, 2)
@@ -962,7 +1027,7 @@ def page_play_mode():
 
         # Charts row: bankroll curve (last 2000) and P&L histogram (all so far)
         colA, colB = st.columns(2)
-        recent = events[-2000:]
+        recent = history.tail(2000)
         if len(recent) >= 2:
             chart_df = pd.DataFrame({
                 "hand_no": [e.hand_no for e in recent],
@@ -981,7 +1046,10 @@ def page_play_mode():
             colA.subheader(t("bankroll_curve_recent"))
             colA.altair_chart(line, use_container_width=True)
 
-        pnl_df = pd.DataFrame({"win_amount": [e.win_amount for e in events]})
+        # 盈亏分布来自增量计数（value -> count），无需保留全部事件
+        pnl_df = pd.DataFrame(
+            {"win_amount": list(stats.pnl_counts.keys()), "n": list(stats.pnl_counts.values())}
+        )
         if len(pnl_df) >= 1:
             hist = (
                 alt.Chart(pnl_df)
@@ -990,7 +1058,7 @@ def page_play_mode():
                 .encode(
                     x=alt.X("win_amount_binned:Q", title="每局盈亏", bin="binned"),
                     x2="win_amount_binned_end:Q",
-                    y=alt.Y("count():Q", title="次数"),
+                    y=alt.Y("sum(n):Q", title="次数"),
                 )
                 .properties(height=280)
             )
@@ -998,30 +1066,30 @@ def page_play_mode():
             colB.altair_chart(hist, use_container_width=True)
 
         # Recent table N=30
-        table_df = to_df(events[-30:])
+        table_df = to_df(history.tail(30))
         placeholder_table.dataframe(table_df, use_container_width=True)
 
         # Downloads section - show when there are events
-        if len(events) > 0:
+        if len(history) > 0:
             st.subheader(t("data_download"))
             col_down1, col_down2 = st.columns(2)
-            
-            # Generate full CSV and summary for download
-            full_df = to_df(events)
-            csv_bytes = full_df.to_csv(index=False).encode("utf-8")
-            
+
+            # Full CSV is streamed from the (partly spilled) history only when requested
+            n_hands = len(history)
+            csv_loader = _get_export_cache().report_loader(f"play_{owner}_{st.session_state.play_run_id}_{n_hands}", history, "csv")
+
             # Create summary-like data for JSON download
             summary_data = {
-                "total_hands": len(events),
-                "bet_hands": sum(1 for e in events if e.bet_side),
-                "observe_hands": sum(1 for e in events if not e.bet_side),
-                "player_wins": sum(1 for e in events if e.outcome == "player"),
-                "banker_wins": sum(1 for e in events if e.outcome == "banker"),
-                "ties": sum(1 for e in events if e.outcome == "tie"),
-                "total_wagered": sum(e.bet_amount for e in events if e.bet_side),
+                "total_hands": n_hands,
+                "bet_hands": stats.bet_hands,
+                "observe_hands": stats.observe_hands,
+                "player_wins": stats.player_wins,
+                "banker_wins": stats.banker_wins,
+                "ties": stats.ties,
+                "total_wagered": stats.total_wagered,
                 "current_bankroll": last.bankroll_after,
                 "total_profit": last.cumulative_win,
-                "commission_paid": sum(e.commission_paid for e in events),
+                "commission_paid": stats.commission_total,
                 "hit_rate": hit_rate,
                 "settings": {
                     "initial_bankroll": float(st.session_state.params.bankroll),
@@ -1032,20 +1100,20 @@ def page_play_mode():
                 }
             }
             json_bytes = json.dumps(summary_data, ensure_ascii=False, indent=2).encode("utf-8")
-            
+
             with col_down1:
                 st.download_button(
-                    t("download_complete_csv"), 
-                    data=csv_bytes, 
-                    file_name=f"baccarat_playback_{len(events)}hands.csv", 
+                    t("download_complete_csv"),
+                    data=csv_loader,
+                    file_name=f"baccarat_playback_{n_hands}hands.csv",
                     mime="text/csv"
                 )
-            
+
             with col_down2:
                 st.download_button(
-                    t("download_statistics_json"), 
-                    data=json_bytes, 
-                    file_name=f"baccarat_playback_summary_{len(events)}hands.json", 
+                    t("download_statistics_json"),
+                    data=json_bytes,
+                    file_name=f"baccarat_playback_summary_{n_hands}hands.json",
                     mime="application/json"
                 )
 
@@ -1137,9 +1205,15 @@ def page_fast_mode():
 
     st.title("Baccarat Simulator - Fast Mode")
 
+    manager = _get_job_manager()
+    owner = _session_owner()
+
     auto_run_loaded = st.session_state.get("fast_loaded_payload", {}).get("autorun", False)
     run_clicked = st.button("运行（只看报告）") or auto_run_loaded
     if run_clicked:
+        if auto_run_loaded:
+            # 自动运行只触发一次，避免每次 rerun 都提交新任务
+            st.session_state["fast_loaded_payload"]["autorun"] = False
         params = RunParams(
             bankroll=bankroll,
             bet=bet,
@@ -1159,53 +1233,164 @@ def page_fast_mode():
             win_progression_start=win_prog_start_fast,
             win_progression_loss_mode=win_loss_mode_fast,
         )
-        events, summary = _run_batch(params)
+        try:
+            job = manager.submit(owner, params)
+            st.session_state.fast_job_id = job.job_id
+        except JobLimitExceeded:
+            st.warning(f"任务数已达上限（{manager.per_user_limit}），请等待或取消进行中的任务 / Job limit reached")
+
+    # 任务列表在片段中单独轮询，进行中时不重跑下方的结果与图表
+    was_active = any(j.active for j in manager.list_jobs(owner))
+    st.fragment(_render_job_list, run_every=JOB_POLL_SECONDS if was_active else None)(manager, owner, was_active)
+
+    current = manager.get(st.session_state.get("fast_job_id", ""))
+    if current is not None and current.status == JOB_DONE:
+        _render_fast_results(current.events, current.summary, rebate_pct_fast, current.job_id)
+        _render_fan_chart(current.params, current.job_id)
+        if st.button("重新开始"):
+            st.session_state.fast_job_id = None
+            _safe_rerun()
 
-        render_summary(summary, rebate_pct=(rebate_pct_fast/100.0))
-        df = to_df(events)
+    # 本次执行中刚提交的任务（如分位带）在整页渲染完成后才出现，需再整页重跑一次开始轮询
+    if not was_active and any(j.active for j in manager.list_jobs(owner)):
+        _safe_rerun()
 
-        # Charts row (full dataset)
-        colA, colB = st.columns(2)
-        if len(df) >= 2:
-            line = (
-                alt.Chart(df.assign(hand_no=df["hand_no"].astype(int)))
-                .mark_line()
-                .encode(
-                    x=alt.X("hand_no:Q", title="Hand #"),
-                    y=alt.Y("bankroll_after:Q", title="Bankroll"),
-                )
-                .properties(height=300)
-            )
-            colA.subheader(t("bankroll_curve_full"))
-            colA.altair_chart(line, use_container_width=True)
 
-        if len(df) >= 1:
-            pnl = (
-                alt.Chart(df)
-                .transform_bin("win_amount_binned", field="win_amount", bin={"maxbins": 60})
-                .mark_bar()
-                .encode(
-                    x=alt.X("win_amount_binned:Q", title="每局盈亏", bin="binned"),
-                    x2="win_amount_binned_end:Q",
-                    y=alt.Y("count():Q", title="次数"),
-                )
-                .properties(height=300)
-            )
-            colB.subheader(t("profit_distribution_full"))
-            colB.altair_chart(pnl, use_container_width=True)
+# 任务列表轮询间隔（秒）
+JOB_POLL_SECONDS = 0.5
 
-        # Show preview head/tail
-        st.subheader(t("results_preview"))
-        st.dataframe(pd.concat([df.head(20), df.tail(20)]), use_container_width=True)
 
-        # Downloads
-        csv_bytes = df.to_csv(index=False).encode("utf-8")
-        json_bytes = json.dumps(asdict(summary), ensure_ascii=False, indent=2).encode("utf-8")
-        st.download_button(t("download_csv"), data=csv_bytes, file_name="baccarat_report.csv", mime="text/csv")
-        st.download_button(t("download_json"), data=json_bytes, file_name="baccarat_summary.json", mime="application/json")
+def _render_job_list(manager: JobManager, owner: str, was_active: bool):
+    """Job rows with progress; runs as a fragment polled every JOB_POLL_SECONDS while jobs are active.
 
-        if st.button("重新开始"):
-            _safe_rerun()
+    When the last active job finishes (or a result is chosen) the whole page reruns once
+    so results and the fan chart render; otherwise only this fragment refreshes.
+    """
+    jobs = manager.list_jobs(owner)
+    if jobs:
+        st.subheader("任务 / Jobs")
+        for job in reversed(jobs):
+            c_info, c_prog, c_act = st.columns([3, 4, 2])
+            label = "" if job.kind == "simulate" else f"[{job.kind}] "
+            c_info.write(f"`{job.job_id}` {label}{job.params.strategy} × {job.params.hands} — {job.status}")
+            c_prog.progress(job.progress, text=f"{job.hands_done}/{job.total}")
+            if job.active:
+                if c_act.button("取消 / Cancel", key=f"fast_cancel_{job.job_id}"):
+                    manager.cancel(job.job_id)
+            elif job.status == JOB_DONE and job.kind == "simulate":
+                if c_act.button("查看 / View", key=f"fast_view_{job.job_id}"):
+                    st.session_state.fast_job_id = job.job_id
+                    _safe_rerun()
+            elif job.error:
+                c_act.caption(job.error)
+    if was_active and not any(j.active for j in jobs):
+        _safe_rerun()
+
+
+# 分位带任务每批会话数：批次越小进度更新与取消响应越及时
+FAN_CHUNK_SESSIONS = 500
+
+
+def _render_fan_chart(params: RunParams, result_key: str):
+    """Bankroll percentile bands over many sessions with the same settings (no paths stored).
+
+    Runs as a background job in the shared pool (counts towards the per-user limit);
+    its progress is polled in the job list fragment, which reruns the page once it finishes.
+    """
+    with st.expander("多会话分位带 / Ensemble fan chart", expanded=False):
+        c_n, c_btn = st.columns([3, 2])
+        sessions = int(c_n.number_input("sessions 会话数", min_value=100, max_value=20000, value=2000, step=500, key="fast_fan_sessions"))
+        state_key = f"fan_{result_key}_{sessions}"
+        job_key = f"fan_job_{result_key}_{sessions}"
+        manager = _get_job_manager()
+        if c_btn.button("计算 / Compute", key="fast_fan_run"):
+            try:
+                job = manager.submit_task(
+                    _session_owner(),
+                    params,
+                    lambda progress: fan_chart(params, sessions, checkpoints=50, chunk_sessions=FAN_CHUNK_SESSIONS, progress=progress),
+                    total=sessions,
+                    kind="fan",
+                )
+                st.session_state[job_key] = job.job_id
+                st.session_state.pop(state_key, None)
+            except JobLimitExceeded:
+                st.warning(f"任务数已达上限（{manager.per_user_limit}），请等待或取消进行中的任务 / Job limit reached")
+        job = manager.get(st.session_state.get(job_key, ""))
+        if job is not None:
+            if job.active:
+                st.caption(f"计算中，进度见任务列表 / Running, see Jobs — {job.hands_done}/{sessions} sessions")
+            elif job.status == JOB_DONE and state_key not in st.session_state:
+                st.session_state[state_key] = job.result.table()
+            elif job.error:
+                st.caption(job.error)
+        rows = st.session_state.get(state_key)
+        if rows:
+            df = pd.DataFrame(rows)
+            base = alt.Chart(df).encode(x=alt.X("hand_no:Q", title="Hand #"))
+            outer = base.mark_area(opacity=0.2).encode(y=alt.Y("p5:Q", title="Bankroll (p5–p95, p25–p75, p50)"), y2="p95:Q")
+            inner = base.mark_area(opacity=0.35).encode(y="p25:Q", y2="p75:Q")
+            median = base.mark_line().encode(y="p50:Q")
+            st.altair_chart((outer + inner + median).properties(height=320), use_container_width=True)
+            st.dataframe(df, use_container_width=True, hide_index=True)
+
+
+def _render_fast_results(events, summary, rebate_pct_fast: float, result_key: str):
+    render_summary(summary, rebate_pct=(rebate_pct_fast/100.0))
+    df = to_df(events)
+
+    # Charts row (full dataset)
+    colA, colB = st.columns(2)
+    if len(df) >= 2:
+        line = (
+            alt.Chart(df.assign(hand_no=df["hand_no"].astype(int)))
+            .mark_line()
+            .encode(
+                x=alt.X("hand_no:Q", title="Hand #"),
+                y=alt.Y("bankroll_after:Q", title="Bankroll"),
+            )
+            .properties(height=300)
+        )
+        colA.subheader(t("bankroll_curve_full"))
+        colA.altair_chart(line, use_container_width=True)
+
+    if len(df) >= 1:
+        pnl = (
+            alt.Chart(df)
+            .transform_bin("win_amount_binned", field="win_amount", bin={"maxbins": 60})
+            .mark_bar()
+            .encode(
+                x=alt.X("win_amount_binned:Q", title="每局盈亏", bin="binned"),
+                x2="win_amount_binned_end:Q",
+                y=alt.Y("count():Q", title="次数"),
+            )
+            .properties(height=300)
+        )
+        colB.subheader(t("profit_distribution_full"))
+        colB.altair_chart(pnl, use_container_width=True)
+
+    # Show preview head/tail
+    st.subheader(t("results_preview"))
+    st.dataframe(pd.concat([df.head(20), df.tail(20)]), use_container_width=True)
+
+    # Downloads：点击时才生成，并缓存到磁盘
+    exports = _get_export_cache()
+    c_fmt, c_csv, c_json = st.columns([2, 2, 2])
+    report_fmt = c_fmt.selectbox(
+        "格式 / Format", options=available_report_formats(), format_func=describe_export, key="fast_report_fmt"
+    )
+    c_csv.download_button(
+        t("download_csv"),
+        data=exports.report_loader(result_key, events, report_fmt),
+        file_name=export_name("baccarat_report", report_fmt),
+        mime=export_mime(report_fmt),
+    )
+    c_json.download_button(
+        t("download_json"),
+        data=exports.summary_loader(result_key, summary, "json"),
+        file_name=export_name("baccarat_summary", "json", SUMMARY_FORMATS),
+        mime=export_mime("json", SUMMARY_FORMATS),
+    )
 
 
 def main():
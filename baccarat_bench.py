@@ -0,0 +1,716 @@
+"""
+性能基准 / Benchmark suite for the simulation hot paths
+
+覆盖 Shoe.reset、Shoe.draw、BaccaratGame.deal_one_hand、各策略 × 进阶模式下的
+_simulate_hands_iter、save_csv、save_json 以及 app.to_df（后两类按多个局数规模）。
+
+每个基准先预热一次，再重复 repeats 次计时，报告：
+- 吞吐量（每秒局数 / 张数 / 次数）每次重复的样本、中位数与 MAD；
+- 单次调用延迟分位数（微基准按小批量计时后均摊到每次调用）；
+- 峰值内存（单独一次运行在 tracemalloc 下测得，不影响计时）。
+结果写成 JSON（含 Python/平台/提交号），便于跨提交对比。
+
+compare 把当前结果与基线对比：吞吐量按中位数比较，噪声用两边的 MAD 估计
+（σ ≈ 1.4826·MAD，中位数标准误 ≈ 1.2533·σ/√n）；下降超过阈值且超出 k 倍噪声才算回归，
+超过阈值但在噪声内的标为 noisy。峰值内存按相对增长判断。默认只对 core 组
+（baccarat_core 中的函数）设闸，出现回归时以非零状态码退出。多个 JSON 文件
+（多次独立运行）会合并各自的重复样本。
+
+    python baccarat_bench.py run --out bench.json
+    python baccarat_bench.py run --quick --filter simulate
+    python baccarat_bench.py compare baseline.json bench.json
+
+memory 测量快速模式会话在各局数规模（默认 10^3–10^6）下的内存占用：每局字节数
+（List[HandEvent] 深度大小、app.to_df 得到的 DataFrame、CSV 字节）、JSON 汇总大小，以及在
+独立子进程中测得的峰值 RSS（仅事件列表 / 完整会话：事件 + DataFrame + CSV + JSON）；
+据此按线性拟合给出常见内存上限下可允许的最大局数。
+
+    python baccarat_bench.py memory --out out/sizing.json
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from baccarat_core import BaccaratGame, RunParams, Shoe, _simulate_hands_iter, save_csv, save_json, simulate_hands, write_csv
+from baccarat_rng import DEFAULT_RNG, RNG_BACKENDS, make_rng
+
+
+STRATEGIES = ("flip-opposite-wait", "always-banker", "always-player", "alternate", "random")
+# 进阶模式 -> RunParams 覆盖项
+PROGRESSIONS: Dict[str, Dict[str, Any]] = {
+    "flat": {},
+    "loss-reset": {"loss_progression_pct": 100.0, "loss_progression_win_mode": "reset"},
+    "loss-persist": {"loss_progression_pct": 50.0, "loss_progression_win_mode": "persist"},
+    "win-inc": {"win_progression_inc_pct": 50.0, "win_progression_loss_mode": "reset"},
+}
+DEFAULT_HANDS = (1000, 10000)
+# 每个延迟样本包含的调用次数（单次调用太短，逐次计时会被计时器开销淹没）
+_BATCH = 50
+
+
+@dataclass
+class Benchmark:
+    """One benchmark: setup() builds state once; run(state) does one sample of work.
+
+    run returns (units processed, per-call latencies in seconds);
+    teardown(state), if given, runs after the last sample.
+    """
+    name: str
+    group: str
+    unit: str
+    setup: Callable[[], Any]
+    run: Callable[[Any], Tuple[int, List[float]]]
+    params: Dict[str, Any] = field(default_factory=dict)
+    teardown: Optional[Callable[[Any], None]] = None
+
+
+def _percentiles(values: Sequence[float], qs: Sequence[float] = (50, 90, 99)) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    out = {}
+    for q in qs:
+        idx = min(len(ordered) - 1, max(0, round(q / 100.0 * (len(ordered) - 1))))
+        out[f"p{q:g}"] = ordered[idx]
+    out["max"] = ordered[-1]
+    return out
+
+
+def mad(values: Sequence[float]) -> float:
+    """Median absolute deviation."""
+    if not values:
+        return 0.0
+    med = statistics.median(values)
+    return statistics.median(abs(v - med) for v in values)
+
+
+def _params(hands: int, strategy: str = "always-banker", progression: str = "flat") -> RunParams:
+    return RunParams(bankroll=1e12, bet=100, hands=hands, strategy=strategy, seed=1234, **PROGRESSIONS[progression])
+
+
+def _bench_shoe_reset(decks: int, rng: str = DEFAULT_RNG) -> Benchmark:
+    def run(shoe: Shoe) -> Tuple[int, List[float]]:
+        lat = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            shoe.reset()
+            lat.append(time.perf_counter() - t0)
+        return 20, lat
+
+    # 默认后端沿用原名称，便于与旧基线对比
+    name = f"shoe.reset[{decks}]" if rng == DEFAULT_RNG else f"shoe.reset[{decks},{rng}]"
+    return Benchmark(name, "core", "shoes", lambda: Shoe(decks, make_rng(rng, 1)), run, {"decks": decks, "rng": rng})
+
+
+def _bench_shoe_draw(decks: int) -> Benchmark:
+    def run(shoe: Shoe) -> Tuple[int, List[float]]:
+        lat = []
+        total = 0
+        for _ in range(5):
+            shoe.reset()
+            n = shoe.cards_left - shoe.cards_left % _BATCH
+            for _b in range(n // _BATCH):
+                t0 = time.perf_counter()
+                for _i in range(_BATCH):
+                    shoe.draw()
+                lat.append((time.perf_counter() - t0) / _BATCH)
+            total += n
+        return total, lat
+
+    return Benchmark(f"shoe.draw[{decks}]", "core", "cards", lambda: Shoe(decks, random.Random(1)), run, {"decks": decks})
+
+
+def _bench_deal(decks: int) -> Benchmark:
+    def run(game: BaccaratGame) -> Tuple[int, List[float]]:
+        lat = []
+        total = 0
+        for _ in range(20):
+            game.shuffle()
+            # 每批 50 手最多 300 张，6 副牌也够
+            t0 = time.perf_counter()
+            for _i in range(_BATCH):
+                game.deal_one_hand()
+            lat.append((time.perf_counter() - t0) / _BATCH)
+            total += _BATCH
+        return total, lat
+
+    return Benchmark(
+        f"game.deal_one_hand[{decks}]", "core", "hands",
+        lambda: BaccaratGame(Shoe(decks, random.Random(1))), run, {"decks": decks},
+    )
+
+
+def _bench_simulate(strategy: str, progression: str, hands: int) -> Benchmark:
+    params = _params(hands, strategy, progression)
+
+    def run(_state: Any) -> Tuple[int, List[float]]:
+        lat = []
+        n = 0
+        t0 = time.perf_counter()
+        for _ev in _simulate_hands_iter(params):
+            n += 1
+            if n % _BATCH == 0:
+                t1 = time.perf_counter()
+                lat.append((t1 - t0) / _BATCH)
+                t0 = t1
+        return n, lat
+
+    return Benchmark(
+        f"simulate[{strategy},{progression},{hands}]", "core", "hands", lambda: None, run,
+        {"strategy": strategy, "progression": progression, "hands": hands},
+    )
+
+
+def _events(hands: int) -> List[Any]:
+    events, _ = simulate_hands(_params(hands), yield_per_hand=False)
+    return events
+
+
+def _remove_dir(state: Tuple[Any, ...]) -> None:
+    shutil.rmtree(os.path.dirname(state[0]), ignore_errors=True)
+
+
+def _bench_save_csv(hands: int) -> Benchmark:
+    def setup():
+        d = tempfile.mkdtemp(prefix="baccarat_bench_")
+        return os.path.join(d, "report.csv"), _events(hands), _params(hands)
+
+    def run(state) -> Tuple[int, List[float]]:
+        path, events, params = state
+        t0 = time.perf_counter()
+        save_csv(events, path, params)
+        return len(events), [(time.perf_counter() - t0) / len(events)]
+
+    return Benchmark(f"save_csv[{hands}]", "export", "hands", setup, run, {"hands": hands}, _remove_dir)
+
+
+def _bench_save_json(hands: int) -> Benchmark:
+    def setup():
+        d = tempfile.mkdtemp(prefix="baccarat_bench_")
+        _, summary = simulate_hands(_params(hands), yield_per_hand=False)
+        return os.path.join(d, "summary.json"), summary
+
+    def run(state) -> Tuple[int, List[float]]:
+        path, summary = state
+        lat = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            save_json(summary, path)
+            lat.append(time.perf_counter() - t0)
+        return 20, lat
+
+    return Benchmark(f"save_json[{hands}]", "export", "files", setup, run, {"hands": hands}, _remove_dir)
+
+
+def _bench_to_df(hands: int) -> Benchmark:
+    def setup():
+        from app import to_df  # 需要 streamlit / pandas
+        return to_df, _events(hands)
+
+    def run(state) -> Tuple[int, List[float]]:
+        to_df, events = state
+        t0 = time.perf_counter()
+        to_df(events)
+        return len(events), [(time.perf_counter() - t0) / len(events)]
+
+    return Benchmark(f"app.to_df[{hands}]", "app", "hands", setup, run, {"hands": hands})
+
+
+def default_suite(hands: Sequence[int] = DEFAULT_HANDS, decks: Sequence[int] = (8,)) -> List[Benchmark]:
+    suite: List[Benchmark] = []
+    for d in decks:
+        suite += [_bench_shoe_reset(d, rng) for rng in RNG_BACKENDS]
+        suite += [_bench_shoe_draw(d), _bench_deal(d)]
+    for h in hands:
+        for strategy in STRATEGIES:
+            for progression in PROGRESSIONS:
+                suite.append(_bench_simulate(strategy, progression, h))
+    for h in hands:
+        suite += [_bench_save_csv(h), _bench_save_json(h), _bench_to_df(h)]
+    return suite
+
+
+def run_benchmark(bench: Benchmark, repeats: int = 5, warmup: int = 1, memory: bool = True) -> Dict[str, Any]:
+    """Time ``bench`` ``repeats`` times; returns a JSON-ready result dict."""
+    try:
+        state = bench.setup()
+    except ImportError as e:
+        return {"name": bench.name, "group": bench.group, "params": bench.params, "skipped": str(e)}
+    rates: List[float] = []
+    seconds: List[float] = []
+    latencies: List[float] = []
+    units = 0
+    peak = None
+    try:
+        for _ in range(warmup):
+            bench.run(state)
+        for _ in range(max(1, int(repeats))):
+            gc.collect()
+            t0 = time.perf_counter()
+            units, lat = bench.run(state)
+            elapsed = time.perf_counter() - t0
+            seconds.append(elapsed)
+            rates.append(units / elapsed if elapsed > 0 else float("inf"))
+            latencies.extend(lat)
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                bench.run(state)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+    finally:
+        if bench.teardown is not None:
+            bench.teardown(state)
+    return {
+        "name": bench.name,
+        "group": bench.group,
+        "params": bench.params,
+        "unit": bench.unit,
+        "units_per_repeat": units,
+        "repeats": len(rates),
+        "rate_samples": rates,
+        "rate_median": statistics.median(rates),
+        "rate_mad": mad(rates),
+        "seconds_median": statistics.median(seconds),
+        "latency_us": {k: v * 1e6 for k, v in _percentiles(latencies).items()},
+        "peak_bytes": peak,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_suite(
+    benchmarks: Sequence[Benchmark],
+    repeats: int = 5,
+    memory: bool = True,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    results = []
+    for bench in benchmarks:
+        res = run_benchmark(bench, repeats=repeats, memory=memory)
+        results.append(res)
+        if on_result is not None:
+            on_result(res)
+    return {"meta": {**environment(), "repeats": repeats}, "results": results}
+
+
+def format_result(res: Dict[str, Any]) -> str:
+    if "skipped" in res:
+        return f"{res['name']:<48} skipped: {res['skipped']}"
+    lat = res["latency_us"]
+    peak = "-" if res["peak_bytes"] is None else f"{res['peak_bytes'] / 1024:,.0f} KiB"
+    return (
+        f"{res['name']:<48} {res['rate_median']:>14,.0f} {res['unit']}/s ±{res['rate_mad']:>10,.0f}  "
+        f"p50 {lat.get('p50', 0):8.2f}µs p99 {lat.get('p99', 0):8.2f}µs  peak {peak}"
+    )
+
+
+def load_reports(paths: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """Results by benchmark name, pooling rate samples and peak memory of several report files."""
+    pooled: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        for res in report.get("results", []):
+            if "skipped" in res:
+                continue
+            entry = pooled.setdefault(res["name"], {"name": res["name"], "group": res["group"], "unit": res["unit"], "rates": [], "peaks": []})
+            entry["rates"].extend(res["rate_samples"])
+            if res.get("peak_bytes") is not None:
+                entry["peaks"].append(res["peak_bytes"])
+    return pooled
+
+
+@dataclass
+class Comparison:
+    name: str
+    group: str
+    unit: str
+    status: str                     # ok / faster / noisy / regression / new / missing
+    baseline_rate: Optional[float] = None
+    current_rate: Optional[float] = None
+    rate_change: Optional[float] = None   # 相对变化，负数为变慢
+    noise: Optional[float] = None         # 判定所用的噪声幅度（相对基线）
+    baseline_peak: Optional[float] = None
+    current_peak: Optional[float] = None
+    peak_change: Optional[float] = None
+    gated: bool = True
+    reasons: List[str] = field(default_factory=list)
+
+
+def _median_se(samples: Sequence[float]) -> float:
+    if len(samples) < 2:
+        return 0.0
+    return 1.2533 * 1.4826 * mad(samples) / len(samples) ** 0.5
+
+
+def compare_reports(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    threshold: float = 0.05,
+    mem_threshold: float = 0.10,
+    noise_k: float = 3.0,
+    min_noise: float = 0.01,
+    gate_groups: Sequence[str] = ("core",),
+) -> List[Comparison]:
+    """Compare pooled results (see load_reports) benchmark by benchmark."""
+    rows: List[Comparison] = []
+    for name in list(current) + [n for n in baseline if n not in current]:
+        cur = current.get(name)
+        base = baseline.get(name)
+        ref = cur or base
+        row = Comparison(name=name, group=ref["group"], unit=ref["unit"], status="ok", gated=ref["group"] in gate_groups)
+        if base is None:
+            row.status = "new"
+        elif cur is None:
+            row.status = "missing"
+        else:
+            b = statistics.median(base["rates"])
+            c = statistics.median(cur["rates"])
+            row.baseline_rate, row.current_rate = b, c
+            row.rate_change = (c - b) / b if b > 0 else None
+            # 噪声：两边中位数标准误合成，至少为基线的 min_noise
+            row.noise = max(min_noise, noise_k * (_median_se(base["rates"]) ** 2 + _median_se(cur["rates"]) ** 2) ** 0.5 / b) if b > 0 else None
+            if row.rate_change is not None:
+                if row.rate_change < -threshold:
+                    if -row.rate_change > row.noise:
+                        row.status = "regression"
+                        row.reasons.append(f"{row.unit}/s {row.rate_change:+.1%}")
+                    else:
+                        row.status = "noisy"
+                elif row.rate_change > threshold and row.rate_change > row.noise:
+                    row.status = "faster"
+            if base["peaks"] and cur["peaks"]:
+                row.baseline_peak = statistics.median(base["peaks"])
+                row.current_peak = statistics.median(cur["peaks"])
+                if row.baseline_peak > 0:
+                    row.peak_change = (row.current_peak - row.baseline_peak) / row.baseline_peak
+                    # 小于 1 KiB 的增长视为测量抖动
+                    if row.peak_change > mem_threshold and row.current_peak - row.baseline_peak > 1024:
+                        row.status = "regression"
+                        row.reasons.append(f"peak memory {row.peak_change:+.1%}")
+        rows.append(row)
+    return rows
+
+
+def regressions(rows: Sequence[Comparison]) -> List[Comparison]:
+    return [r for r in rows if r.gated and r.status == "regression"]
+
+
+def format_comparison(rows: Sequence[Comparison]) -> str:
+    def pct(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v:+.1%}"
+
+    def rate(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v:,.0f}"
+
+    lines = [f"{'benchmark':<48} {'baseline':>14} {'current':>14} {'change':>8} {'noise':>7} {'memory':>8}  status"]
+    for r in rows:
+        status = r.status.upper() if r.status == "regression" and r.gated else r.status
+        if r.status == "regression" and not r.gated:
+            status += " (not gated)"
+        noise = "-" if r.noise is None else f"±{r.noise:.1%}"
+        lines.append(
+            f"{r.name:<48} {rate(r.baseline_rate):>14} {rate(r.current_rate):>14} {pct(r.rate_change):>8} "
+            f"{noise:>7} {pct(r.peak_change):>8}  {status}{'  ' + '; '.join(r.reasons) if r.reasons else ''}"
+        )
+    bad = regressions(rows)
+    counts = {s: sum(1 for r in rows if r.status == s) for s in ("ok", "faster", "noisy", "regression", "new", "missing")}
+    lines.append("")
+    lines.append("; ".join(f"{k}: {v}" for k, v in counts.items() if v))
+    lines.append(f"FAIL: {len(bad)} gated regression(s)" if bad else "PASS: no gated regressions")
+    return "\n".join(lines)
+
+
+SIZING_HANDS = (1000, 10000, 100000, 1000000)
+# 计算深度大小时最多遍历的事件数，更大的规模按前缀均摊估计
+_DEEP_SAMPLE = 100000
+# 常见容器内存上限（MiB），用于给出最大局数建议
+SIZING_LIMITS_MB = (512, 1024, 2048, 4096)
+
+
+def deep_sizeof(obj: Any) -> int:
+    """Bytes reachable from ``obj`` (containers, instance __dict__); shared objects counted once."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        d = getattr(o, "__dict__", None)
+        if d is not None and not isinstance(o, type):
+            stack.append(d)
+    return total
+
+
+class _ByteCounter:
+    """Text stream that only counts UTF-8 bytes written."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text: str) -> int:
+        self.bytes += len(text.encode("utf-8"))
+        return len(text)
+
+
+def _max_rss_bytes() -> Optional[int]:
+    """Peak RSS of this process; VmHWM on Linux (ru_maxrss there survives exec from a large parent)."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _rss_child(hands: int, stage: str) -> Dict[str, Optional[int]]:
+    """Runs in a fresh process: peak RSS before and after one fast-mode session of ``hands`` hands."""
+    if stage == "session":
+        from app import to_df  # noqa: F401  预先导入，使基线包含 streamlit / pandas
+    gc.collect()
+    baseline = _max_rss_bytes()
+    events, summary = simulate_hands(_params(hands), yield_per_hand=False)
+    keep: List[Any] = [events, summary]
+    if stage == "session":
+        keep.append(to_df(events))
+        buf = io.StringIO()
+        write_csv(events, buf, _params(hands))
+        keep.append(buf.getvalue().encode("utf-8"))
+        keep.append(json.dumps(asdict(summary), ensure_ascii=False, indent=2))
+    peak = _max_rss_bytes()
+    return {"baseline_rss": baseline, "peak_rss": peak}
+
+
+def _peak_rss(hands: int, stage: str) -> Dict[str, Optional[int]]:
+    # 每次测量使用新的 spawn 进程，峰值 RSS 不受之前测量影响
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_rss_child, hands, stage).result()
+
+
+def measure_footprint(hands: int, rss: bool = True) -> Dict[str, Any]:
+    """Per-hand sizes of each result form for one session of ``hands`` hands."""
+    params = _params(hands)
+    events, summary = simulate_hands(params, yield_per_hand=False)
+    sample = events if len(events) <= _DEEP_SAMPLE else events[:_DEEP_SAMPLE]
+    row: Dict[str, Any] = {
+        "hands": len(events),
+        "events_bytes_per_hand": deep_sizeof(sample) / len(sample),
+        "events_sampled": len(sample),
+    }
+    try:
+        from app import to_df
+    except ImportError:
+        row["dataframe_bytes_per_hand"] = None
+    else:
+        row["dataframe_bytes_per_hand"] = int(to_df(events).memory_usage(deep=True).sum()) / len(events)
+    counter = _ByteCounter()
+    write_csv(events, counter, params)
+    row["csv_bytes_per_hand"] = counter.bytes / len(events)
+    row["json_summary_bytes"] = len(json.dumps(asdict(summary), ensure_ascii=False, indent=2).encode("utf-8"))
+    del events, sample
+    if rss:
+        for stage in ("events", "session"):
+            try:
+                r = _peak_rss(hands, stage)
+            except ImportError:
+                r = {"baseline_rss": None, "peak_rss": None}
+            row[f"{stage}_baseline_rss"] = r["baseline_rss"]
+            row[f"{stage}_peak_rss"] = r["peak_rss"]
+            if r["peak_rss"] is not None and r["baseline_rss"] is not None:
+                row[f"{stage}_rss_per_hand"] = (r["peak_rss"] - r["baseline_rss"]) / hands
+    return row
+
+
+def sizing_recommendations(rows: Sequence[Dict[str, Any]], limits_mb: Sequence[int] = SIZING_LIMITS_MB, headroom: float = 0.8) -> List[Dict[str, Any]]:
+    """Max hands per session for each memory limit, from a least-squares line peak_rss = a + b * hands.
+
+    Only ``headroom`` of each limit is budgeted for one session.
+    """
+    pts = [(r["hands"], r["session_peak_rss"]) for r in rows if r.get("session_peak_rss")]
+    if len(pts) < 2:
+        return []
+    n = len(pts)
+    mx = sum(h for h, _ in pts) / n
+    my = sum(v for _, v in pts) / n
+    sxx = sum((h - mx) ** 2 for h, _ in pts)
+    if sxx <= 0:
+        return []
+    slope = sum((h - mx) * (v - my) for h, v in pts) / sxx
+    intercept = my - slope * mx
+    out = []
+    for mb in limits_mb:
+        budget = mb * 1024 * 1024 * headroom - intercept
+        out.append({
+            "limit_mb": mb,
+            "max_hands": int(budget / slope) if slope > 0 and budget > 0 else 0,
+            "bytes_per_hand": slope,
+            "base_bytes": intercept,
+        })
+    return out
+
+
+def format_sizing(rows: Sequence[Dict[str, Any]], recs: Sequence[Dict[str, Any]]) -> str:
+    def num(v: Optional[float], scale: float = 1.0, fmt: str = ",.0f") -> str:
+        return "-" if v is None else format(v / scale, fmt)
+
+    mib = 1024 * 1024
+    lines = [
+        f"{'hands':>10} {'events B/hand':>14} {'df B/hand':>10} {'csv B/hand':>11} {'json B':>8} "
+        f"{'RSS events MiB':>15} {'RSS session MiB':>16} {'session B/hand':>15}"
+    ]
+    for r in rows:
+        lines.append(
+            f"{r['hands']:>10,} {num(r['events_bytes_per_hand']):>14} {num(r['dataframe_bytes_per_hand']):>10} "
+            f"{num(r['csv_bytes_per_hand']):>11} {num(r['json_summary_bytes']):>8} "
+            f"{num(r.get('events_peak_rss'), mib, ',.1f'):>15} {num(r.get('session_peak_rss'), mib, ',.1f'):>16} "
+            f"{num(r.get('session_rss_per_hand')):>15}"
+        )
+    if recs:
+        lines += ["", f"Fit: peak RSS ≈ {recs[0]['base_bytes'] / mib:,.1f} MiB + {recs[0]['bytes_per_hand']:,.0f} B × hands (80% of limit per session)"]
+        for rec in recs:
+            lines.append(f"  mem_limit {rec['limit_mb']:>5} MiB -> max hands per session {rec['max_hands']:>12,}")
+    return "\n".join(lines)
+
+
+def _int_list(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks for the simulation hot paths")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="运行基准并输出 JSON")
+    run.add_argument("--out", type=str, default=None, help="结果 JSON 路径（默认 out/bench_<时间>.json）")
+    run.add_argument("--hands", type=_int_list, default=list(DEFAULT_HANDS), help="局数规模，逗号分隔（默认 1000,10000）")
+    run.add_argument("--repeats", type=int, default=5)
+    run.add_argument("--filter", type=str, default=None, help="只运行名称包含该子串的基准")
+    run.add_argument("--no-memory", action="store_true", help="跳过 tracemalloc 峰值内存测量")
+    run.add_argument("--quick", action="store_true", help="快速模式：1000 局、3 次重复")
+    run.add_argument("--list", action="store_true", help="只列出基准名称")
+    run.add_argument("--baseline", action="append", default=None, help="运行后与该基线 JSON 对比（可重复）")
+
+    cmp_ = sub.add_parser("compare", help="与基线对比，出现回归时以状态码 1 退出")
+    cmp_.add_argument("baseline", help="基线 JSON；多个文件用逗号分隔，合并重复样本")
+    cmp_.add_argument("current", nargs="+", help="当前结果 JSON（可多个，合并重复样本）")
+    for p in (run, cmp_):
+        p.add_argument("--threshold", type=float, default=0.05, help="吞吐量下降阈值（默认 0.05 即 5%%）")
+        p.add_argument("--mem-threshold", type=float, default=0.10, help="峰值内存增长阈值（默认 0.10）")
+        p.add_argument("--noise-k", type=float, default=3.0, help="超出噪声的倍数（默认 3）")
+        p.add_argument("--min-noise", type=float, default=0.01, help="噪声下限（相对基线，默认 0.01；共享机器上可调高）")
+        p.add_argument("--gate", type=str, default="core", help="设闸的基准组，逗号分隔（core,export,app）")
+    mem = sub.add_parser("memory", help="快速模式会话的内存占用与容器规格表")
+    mem.add_argument("--hands", type=_int_list, default=list(SIZING_HANDS), help="局数规模，逗号分隔（默认 1000,10000,100000,1000000）")
+    mem.add_argument("--no-rss", action="store_true", help="跳过子进程峰值 RSS 测量")
+    mem.add_argument("--out", type=str, default=None, help="结果 JSON 路径（默认 out/sizing_<时间>.json）")
+    args = parser.parse_args(argv)
+
+    if args.command == "memory":
+        rows = []
+        for h in args.hands:
+            rows.append(measure_footprint(h, rss=not args.no_rss))
+            print(f"measured {h:,} hands", flush=True)
+        recs = sizing_recommendations(rows)
+        print(format_sizing(rows, recs))
+        out = args.out or os.path.join("out", f"sizing_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"meta": environment(), "rows": rows, "recommendations": recs}, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {out}")
+        return
+
+    def gate(baseline_paths: Sequence[str], current_paths: Sequence[str]) -> None:
+        rows = compare_reports(
+            load_reports(baseline_paths),
+            load_reports(current_paths),
+            threshold=args.threshold,
+            mem_threshold=args.mem_threshold,
+            noise_k=args.noise_k,
+            min_noise=args.min_noise,
+            gate_groups=[g.strip() for g in args.gate.split(",") if g.strip()],
+        )
+        print(format_comparison(rows))
+        if regressions(rows):
+            sys.exit(1)
+
+    if args.command == "compare":
+        gate([p for p in args.baseline.split(",") if p], args.current)
+        return
+
+    hands = [1000] if args.quick else args.hands
+    repeats = 3 if args.quick else args.repeats
+    suite = [b for b in default_suite(hands) if not args.filter or args.filter in b.name]
+    if args.list:
+        for b in suite:
+            print(b.name)
+        return
+    report = run_suite(suite, repeats=repeats, memory=not args.no_memory, on_result=lambda r: print(format_result(r), flush=True))
+    out = args.out or os.path.join("out", f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parent = os.path.dirname(os.path.abspath(out))
+    os.makedirs(parent, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Wrote {len(report['results'])} results to {out}")
+    if args.baseline:
+        print()
+        gate(args.baseline, [out])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import csv
 import json
 import os
-import random
-from dataclasses import dataclass, asdict
+import threading
+import time
+from dataclasses import dataclass, asdict, fields
 from datetime import datetime, timedelta
-from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from baccarat_rng import DEFAULT_RNG, RNG, make_rng
 
 
 # ----------------------------
@@ -55,6 +60,66 @@ def banker_draws(banker_total: int, player_third_value: Optional[int]) -> bool:
     return False
 
 
+@lru_cache(maxsize=None)
+def outcome_probabilities(decks: int = 8) -> Dict[str, float]:
+    """Exact off-the-top probabilities of player/banker/tie for a full shoe of ``decks`` decks.
+
+    Enumerates every ordered draw of point values (p1, p2, b1, b2, [p3], [b3])
+    without replacement, applying the same drawing rules as BaccaratGame.
+    """
+    counts = [16 * decks] + [4 * decks] * 9  # index = card point
+    total = 52 * decks
+    probs = {"player": 0.0, "banker": 0.0, "tie": 0.0}
+
+    def take(v: int, left: int) -> float:
+        p = counts[v] / left
+        counts[v] -= 1
+        return p
+
+    for p1 in range(10):
+        w1 = take(p1, total)
+        for p2 in range(10):
+            if not counts[p2]:
+                continue
+            w2 = w1 * take(p2, total - 1)
+            for b1 in range(10):
+                if not counts[b1]:
+                    continue
+                w3 = w2 * take(b1, total - 2)
+                for b2 in range(10):
+                    if not counts[b2]:
+                        continue
+                    w4 = w3 * take(b2, total - 3)
+                    pt = (p1 + p2) % 10
+                    bt = (b1 + b2) % 10
+                    if pt >= 8 or bt >= 8:
+                        probs[_compare_totals(pt, bt)] += w4
+                    elif player_draws(pt):
+                        for p3 in range(10):
+                            if not counts[p3]:
+                                continue
+                            w5 = w4 * take(p3, total - 4)
+                            pt3 = (pt + p3) % 10
+                            if banker_draws(bt, p3):
+                                for b3 in range(10):
+                                    if counts[b3]:
+                                        probs[_compare_totals(pt3, (bt + b3) % 10)] += w5 * counts[b3] / (total - 5)
+                            else:
+                                probs[_compare_totals(pt3, bt)] += w5
+                            counts[p3] += 1
+                    elif banker_draws(bt, None):
+                        for b3 in range(10):
+                            if counts[b3]:
+                                probs[_compare_totals(pt, (bt + b3) % 10)] += w4 * counts[b3] / (total - 4)
+                    else:
+                        probs[_compare_totals(pt, bt)] += w4
+                    counts[b2] += 1
+                counts[b1] += 1
+            counts[p2] += 1
+        counts[p1] += 1
+    return probs
+
+
 @dataclass
 class Card:
     rank: str
@@ -72,10 +137,16 @@ class Hand:
         return sum(c.point for c in self.cards) % 10
 
 
+@lru_cache(maxsize=None)
+def _deck_template(decks: int) -> Tuple[Card, ...]:
+    """Unshuffled shoe in the canonical order; Card objects are shared and never mutated."""
+    return tuple(Card(rank=r) for _ in range(decks) for r in RANKS for _s in range(4))
+
+
 @dataclass
 class Shoe:
     decks: int
-    rng: random.Random
+    rng: RNG
     cards: List[Card] = None
     shuffle_count: int = 0
 
@@ -83,13 +154,14 @@ class Shoe:
         self.reset()
 
     def reset(self) -> None:
-        deck: List[Card] = []
-        for _ in range(self.decks):
-            for r in RANKS:
-                for _s in range(4):
-                    deck.append(Card(rank=r))
-        self.cards = deck
-        self.rng.shuffle(self.cards)
+        # 从不变的整靴模板洗出新牌序；与逐张新建 Card 再 shuffle 的牌序完全一致
+        deck = _deck_template(self.decks)
+        shuffled = getattr(self.rng, "shuffled", None)
+        if shuffled is not None:
+            self.cards = shuffled(deck)
+        else:
+            self.cards = list(deck)
+            self.rng.shuffle(self.cards)
         self.shuffle_count += 1
 
     def draw(self) -> Card:
@@ -176,14 +248,14 @@ class AlternateStrategy(Strategy):
 
 
 class RandomStrategy(Strategy):
-    def __init__(self, rng: random.Random):
+    def __init__(self, rng: RNG):
         self.rng = rng
 
     def decide(self) -> Optional[str]:
         return self.rng.choice(["player", "banker"])
 
 
-def build_strategy(name: str, rng: random.Random) -> Strategy:
+def build_strategy(name: str, rng: RNG) -> Strategy:
     name = name.lower()
     if name == "flip-opposite-wait":
         return FlipOppositeWaitStrategy()
@@ -199,9 +271,30 @@ def build_strategy(name: str, rng: random.Random) -> Strategy:
 
 
 class BaccaratGame:
+    """Deals hands from a generated Shoe.
+
+    The simulation loop only uses deal_one_hand / needs_shuffle / shuffle /
+    cards_left / exhausted, so another hand source (e.g. baccarat_replay.ReplayGame)
+    can be passed in its place.
+    """
+
+    # 生成的牌靴不会耗尽；回放数据源在记录用完时为 True
+    exhausted = False
+
     def __init__(self, shoe: Shoe):
         self.shoe = shoe
 
+    @property
+    def cards_left(self) -> int:
+        return self.shoe.cards_left
+
+    def needs_shuffle(self, penetration: int) -> bool:
+        # reshuffle if penetration reached or insufficient cards for next hand
+        return self.shoe.cards_left < 6 or self.shoe.cards_left <= penetration
+
+    def shuffle(self) -> None:
+        self.shoe.reset()
+
     def deal_one_hand(self) -> Dict[str, Any]:
         player_hand = Hand(cards=[self.shoe.draw(), self.shoe.draw()])
         banker_hand = Hand(cards=[self.shoe.draw(), self.shoe.draw()])
@@ -278,6 +371,20 @@ class RunParams:
     win_progression_start: int = 1       # 从第几次连赢开始生效
     # 连赢被打断（输一局）后的注码调整：'reset' 回到基础注；'persist' 保持调整后的注码
     win_progression_loss_mode: str = "reset"
+    # 随机数后端（见 baccarat_rng）：mt 与历史结果逐位一致；pcg64 / philox 洗牌更快
+    rng: str = DEFAULT_RNG
+
+
+def run_params_from_dict(data: Dict[str, Any]) -> RunParams:
+    """Build RunParams from a plain dict (JSON payloads, manifests); unknown keys are rejected."""
+    names = {f.name for f in fields(RunParams)}
+    unknown = sorted(set(data) - names)
+    if unknown:
+        raise ValueError(f"Unknown RunParams field(s): {', '.join(unknown)}")
+    missing = [k for k in ("bankroll", "bet", "hands") if k not in data]
+    if missing:
+        raise ValueError(f"Missing RunParams field(s): {', '.join(missing)}")
+    return RunParams(**data)
 
 
 @dataclass
@@ -288,8 +395,9 @@ class HandEvent:
     bet_amount: float
     player_cards: List[str]
     banker_cards: List[str]
-    player_total: int
-    banker_total: int
+    # 只有结果的回放记录没有牌面，点数为 None
+    player_total: Optional[int]
+    banker_total: Optional[int]
     outcome: str
     win_amount: float
     bankroll_after: float
@@ -320,11 +428,77 @@ class RunSummary:
     shoe_reshuffles: int
     strategy_hit_rate: Optional[float]
     outcome_distribution: Dict[str, Dict[str, float]]
-
-
-def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
-    rng = random.Random(params.seed)
-    shoe = Shoe(decks=params.decks, rng=rng)
+    # 风险指标（模拟过程中 O(1) 内存流式维护）
+    peak_bankroll: Optional[float] = None
+    trough_bankroll: Optional[float] = None
+    max_drawdown: Optional[float] = None            # 从前期峰值回落的最大金额
+    max_drawdown_pct: Optional[float] = None        # 相对当时峰值的最大回落比例
+    max_drawdown_duration: Optional[int] = None     # 最长水下手数（低于前期峰值）
+    pnl_volatility: Optional[float] = None          # 每局盈亏的样本标准差（含观望局）
+    sharpe_ratio: Optional[float] = None            # 每局平均盈亏 / 标准差（逐局，不年化）
+    longest_loss_streak: Optional[int] = None
+    # 按目标精度提前停止时的估计结果（见 baccarat_sequential）
+    stopping: Optional[Dict[str, Any]] = None
+    # 分阶段计时（启用 phase_timing 时）：总耗时、吞吐量与各阶段耗时/次数
+    timing: Optional[Dict[str, Any]] = None
+
+
+# 分阶段计时：yield 阶段为消费者处理事件的时间
+PHASES: Tuple[str, ...] = ("reshuffle", "decide", "size", "deal", "settle", "event", "yield")
+_RESHUFFLE, _DECIDE, _SIZE, _DEAL, _SETTLE, _EVENT, _YIELD = range(len(PHASES))
+PHASE_TIMING_ENV = "BACCARAT_PHASE_TIMING"
+
+
+def phase_timing_enabled(flag: Optional[bool] = None) -> bool:
+    """Explicit flag, else the BACCARAT_PHASE_TIMING environment variable (1/true/yes/on)."""
+    if flag is not None:
+        return bool(flag)
+    return os.environ.get(PHASE_TIMING_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _lap(seconds: List[float], calls: List[int], phase: int, since: float, count: bool = True) -> float:
+    now = time.perf_counter()
+    seconds[phase] += now - since
+    if count:
+        calls[phase] += 1
+    return now
+
+
+def _timing_report(seconds: List[float], calls: List[int], wall: float, hands: int, shuffles: int) -> Dict[str, Any]:
+    return {
+        "wall_seconds": wall,
+        "hands_per_sec": hands / wall if wall > 0 else None,
+        "shuffles_per_sec": shuffles / wall if wall > 0 else None,
+        "phases": {
+            name: {
+                "seconds": seconds[i],
+                "calls": calls[i],
+                "pct": seconds[i] / wall if wall > 0 else None,
+                "us_per_call": seconds[i] / calls[i] * 1e6 if calls[i] else None,
+            }
+            for i, name in enumerate(PHASES)
+        },
+    }
+
+
+def _simulate_hands_iter(
+    params: RunParams,
+    should_stop: Optional[Callable[[HandEvent], bool]] = None,
+    game: Optional[BaccaratGame] = None,
+    phase_timing: Optional[bool] = None,
+    rng: Optional[RNG] = None,
+) -> Iterator[HandEvent]:
+    # 计时关闭时只剩局部布尔判断，不调用计时器
+    timing = phase_timing_enabled(phase_timing)
+    if timing:
+        phase_seconds = [0.0] * len(PHASES)
+        phase_calls = [0] * len(PHASES)
+        run_start = lap = time.perf_counter()
+    if rng is None:
+        rng = make_rng(params.rng, params.seed)
+    # 传入 game（如回放）时不构建牌靴
+    if game is None:
+        game = BaccaratGame(Shoe(decks=params.decks, rng=rng))
     strat = build_strategy(params.strategy, rng)
 
     now = datetime.now()
@@ -344,7 +518,18 @@ def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
     shoe_reshuffles = 1
     total_wagered = 0.0
 
-    game = BaccaratGame(shoe)
+    hands_played = 0
+
+    # 风险指标：峰值/谷值、回撤深度与时长、每局盈亏的 Welford 方差、最长连输
+    peak_bankroll = bankroll
+    trough_bankroll = bankroll
+    max_drawdown = 0.0
+    max_drawdown_pct = 0.0
+    underwater = 0
+    max_drawdown_duration = 0
+    pnl_mean = 0.0
+    pnl_m2 = 0.0
+    longest_loss_streak = 0
 
     cumulative_win = 0.0
     loss_streak = 0  # 连输次数（只统计已下注且输的手；和局不变，赢则清零）
@@ -355,12 +540,21 @@ def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
     win_persist_multiplier = 1.0
 
     for hand_no in range(1, params.hands + 1):
-        # reshuffle if penetration reached or insufficient cards for next hand
-        if shoe.cards_left < 6 or shoe.cards_left <= params.penetration:
-            shoe.reset()
+        if game.needs_shuffle(params.penetration):
+            if timing:
+                # 上一局结束到洗牌前的循环开销照常计入 decide（不计次数），再单独计时洗牌
+                lap = _lap(phase_seconds, phase_calls, _DECIDE, lap, count=False)
+            game.shuffle()
             shoe_reshuffles += 1
+            if timing:
+                lap = _lap(phase_seconds, phase_calls, _RESHUFFLE, lap)
+        # 回放数据用完时提前结束（params.hands 为上限）
+        if game.exhausted:
+            break
 
         bet_side = strat.decide()
+        if timing:
+            lap = _lap(phase_seconds, phase_calls, _DECIDE, lap)
         # progressive bet sizing based on last outcome (loss or win)
         base_bet = float(params.bet)
         if bet_side:
@@ -420,10 +614,14 @@ def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
             total_wagered += bet_amount
         else:
             observe_hands += 1
+        if timing:
+            lap = _lap(phase_seconds, phase_calls, _SIZE, lap)
 
         result = game.deal_one_hand()
         outcome = result["outcome"]
         cards_dealt_total += result["cards_dealt"]
+        if timing:
+            lap = _lap(phase_seconds, phase_calls, _DEAL, lap)
 
         if outcome == "player":
             player_wins += 1
@@ -475,6 +673,8 @@ def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
                 # 更新连赢/连输状态
                 win_streak = 0
                 loss_streak += 1
+                if loss_streak > longest_loss_streak:
+                    longest_loss_streak = loss_streak
                 last_bet_outcome = "loss"
                 # 连赢持久倍率在输后根据模式复位
                 if (params.win_progression_loss_mode or "reset") == "reset":
@@ -499,6 +699,26 @@ def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
         bankroll += win_amount
         cumulative_win += win_amount
 
+        if bankroll >= peak_bankroll:
+            peak_bankroll = bankroll
+            underwater = 0
+        else:
+            underwater += 1
+            drawdown = peak_bankroll - bankroll
+            if drawdown > max_drawdown:
+                max_drawdown = drawdown
+            if peak_bankroll > 0 and drawdown / peak_bankroll > max_drawdown_pct:
+                max_drawdown_pct = drawdown / peak_bankroll
+            if underwater > max_drawdown_duration:
+                max_drawdown_duration = underwater
+            if bankroll < trough_bankroll:
+                trough_bankroll = bankroll
+        delta = win_amount - pnl_mean
+        pnl_mean += delta / hand_no
+        pnl_m2 += delta * (win_amount - pnl_mean)
+        if timing:
+            lap = _lap(phase_seconds, phase_calls, _SETTLE, lap)
+
         event = HandEvent(
             timestamp=hand_time.isoformat(),
             hand_no=hand_no,
@@ -511,24 +731,36 @@ def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
             outcome=outcome,
             win_amount=round(win_amount, 2),
             bankroll_after=round(bankroll, 2),
-            shoe_cards_left=shoe.cards_left,
+            shoe_cards_left=game.cards_left,
             commission_paid=round(commission_paid, 2),
             cumulative_win=round(cumulative_win, 2),
         )
+        if timing:
+            lap = _lap(phase_seconds, phase_calls, _EVENT, lap)
         # Always yield in iterator mode
         yield event
+        if timing:
+            lap = _lap(phase_seconds, phase_calls, _YIELD, lap)
 
         strat.observe_outcome(outcome)
         hand_time += timedelta(seconds=1)
+        hands_played = hand_no
+        # 可选的提前停止（params.hands 作为上限）
+        if should_stop is not None and should_stop(event):
+            break
 
-    avg_cards = (cards_dealt_total / params.hands) if params.hands > 0 else 0.0
+    avg_cards = (cards_dealt_total / hands_played) if hands_played > 0 else 0.0
     roi = ( (bankroll - float(params.bankroll)) / total_wagered ) if total_wagered > 0 else 0.0
     attempts = bet_hands - push_hands
     hit_rate = (wins / attempts) if attempts > 0 else None
+    pnl_volatility = (pnl_m2 / (hands_played - 1)) ** 0.5 if hands_played > 1 else 0.0
+    sharpe = (pnl_mean / pnl_volatility) if pnl_volatility > 0 else None
 
     summary = RunSummary(
         params={
             "hands": params.hands,
+            # 实际模拟的局数（should_stop 提前停止或回放用完时小于 hands 上限）
+            "hands_played": hands_played,
             "decks": params.decks,
             "penetration": params.penetration,
             "seed": params.seed,
@@ -542,6 +774,7 @@ def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
             "win_progression_dec_pct": getattr(params, "win_progression_dec_pct", 0.0),
             "win_progression_start": getattr(params, "win_progression_start", 1),
             "win_progression_loss_mode": getattr(params, "win_progression_loss_mode", "reset"),
+            "rng": getattr(params, "rng", DEFAULT_RNG),
             "csv_path": params.csv_path,
             "json_path": params.json_path,
         },
@@ -564,22 +797,43 @@ def _simulate_hands_iter(params: RunParams) -> Iterator[HandEvent]:
         shoe_reshuffles=shoe_reshuffles,
         strategy_hit_rate=hit_rate,
         outcome_distribution={
-            "player": {"count": player_wins, "pct": player_wins / params.hands},
-            "banker": {"count": banker_wins, "pct": banker_wins / params.hands},
-            "tie": {"count": ties, "pct": ties / params.hands},
+            "player": {"count": player_wins, "pct": (player_wins / hands_played) if hands_played else 0.0},
+            "banker": {"count": banker_wins, "pct": (banker_wins / hands_played) if hands_played else 0.0},
+            "tie": {"count": ties, "pct": (ties / hands_played) if hands_played else 0.0},
         },
+        peak_bankroll=round(peak_bankroll, 2),
+        trough_bankroll=round(trough_bankroll, 2),
+        max_drawdown=round(max_drawdown, 2),
+        max_drawdown_pct=max_drawdown_pct,
+        max_drawdown_duration=max_drawdown_duration,
+        pnl_volatility=pnl_volatility,
+        sharpe_ratio=sharpe,
+        longest_loss_streak=longest_loss_streak,
     )
+    if timing:
+        summary.timing = _timing_report(phase_seconds, phase_calls, time.perf_counter() - run_start, hands_played, shoe_reshuffles)
     # In generator semantics, return the summary as StopIteration.value
     return summary
 
 
-def simulate_hands(params: RunParams, yield_per_hand: bool = True):
+def simulate_hands(
+    params: RunParams,
+    yield_per_hand: bool = True,
+    should_stop: Optional[Callable[[HandEvent], bool]] = None,
+    game: Optional[BaccaratGame] = None,
+    phase_timing: Optional[bool] = None,
+    rng: Optional[RNG] = None,
+):
     """Simulation API.
 
     - When yield_per_hand=True: returns an iterator of HandEvent (streaming).
     - When yield_per_hand=False: runs the whole simulation and returns (events, summary).
+    - should_stop(event) -> True ends the run after that hand; params.hands is then an upper bound.
+    - game replaces the generated shoe as the source of hands (e.g. recorded shoes).
+    - phase_timing=True (or BACCARAT_PHASE_TIMING=1 when None) fills summary.timing.
+    - rng replaces make_rng(params.rng, params.seed), e.g. a worker's spawned stream.
     """
-    gen = _simulate_hands_iter(params)
+    gen = _simulate_hands_iter(params, should_stop, game, phase_timing, rng)
     if yield_per_hand:
         # return the iterator directly for streaming consumption
         return gen
@@ -594,64 +848,193 @@ def simulate_hands(params: RunParams, yield_per_hand: bool = True):
     return events, summary
 
 
+class AsyncSimulation:
+    """Async iterator over a simulation, computed in chunks of ``batch`` hands.
+
+    - use_executor=True: each chunk runs in ``executor`` (the loop's default
+      executor when None), so the event loop is never blocked by CPU work.
+    - use_executor=False: chunks run on the loop thread, yielding control
+      (``await asyncio.sleep(0)``) after every chunk.
+
+    Work is pulled by the consumer: a new chunk is only computed when the
+    buffered one has been consumed (plus at most one chunk prefetched when
+    ``prefetch`` is set), so a slow consumer naturally throttles the producer.
+    ``summary`` holds the RunSummary once iteration has finished.
+    """
+
+    def __init__(
+        self,
+        params: RunParams,
+        batch: int = 500,
+        use_executor: bool = True,
+        executor: Optional[Any] = None,
+        prefetch: bool = False,
+    ):
+        self.params = params
+        self.batch = max(1, int(batch))
+        self.use_executor = use_executor
+        self.executor = executor
+        self.prefetch = prefetch and use_executor
+        self.summary: Optional[RunSummary] = None
+        self._gen = _simulate_hands_iter(params)
+        self._buffer: List[HandEvent] = []
+        self._pos = 0
+        self._exhausted = False
+        self._closed = False
+        self._pending: Optional["asyncio.Future"] = None
+        self._gen_lock = threading.Lock()
+
+    def _next_chunk(self) -> Tuple[List[HandEvent], Optional[RunSummary]]:
+        chunk: List[HandEvent] = []
+        with self._gen_lock:
+            if self._closed:
+                return chunk, None
+            gen = self._gen
+            try:
+                for _ in range(self.batch):
+                    chunk.append(next(gen))
+            except StopIteration as stop:
+                return chunk, stop.value
+            finally:
+                # aclose() 期间正在计算的分块：算完后在工作线程中关闭生成器
+                if self._closed:
+                    gen.close()
+        return chunk, None
+
+    def _schedule(self) -> "asyncio.Future":
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.executor, self._next_chunk)
+
+    async def _fill(self) -> None:
+        if self.use_executor:
+            fut = self._pending or self._schedule()
+            self._pending = None
+            chunk, summary = await fut
+            if summary is None and self.prefetch and not self._closed:
+                self._pending = self._schedule()
+        else:
+            chunk, summary = self._next_chunk()
+            await asyncio.sleep(0)
+        self._buffer, self._pos = chunk, 0
+        if summary is not None:
+            self.summary = summary
+            self._exhausted = True
+
+    def __aiter__(self) -> "AsyncSimulation":
+        return self
+
+    async def __anext__(self) -> HandEvent:
+        while self._pos >= len(self._buffer):
+            if self._exhausted or self._closed:
+                raise StopAsyncIteration
+            try:
+                await self._fill()
+            except asyncio.CancelledError:
+                await self.aclose()
+                raise
+        ev = self._buffer[self._pos]
+        self._pos += 1
+        return ev
+
+    async def aclose(self) -> None:
+        """Stop the simulation; an in-flight executor chunk closes the generator when it finishes."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pending = None
+        if self._gen_lock.acquire(blocking=False):
+            try:
+                self._gen.close()
+            finally:
+                self._gen_lock.release()
+
+    async def run(self) -> Tuple[List[HandEvent], RunSummary]:
+        """Consume the whole run and return (events, summary)."""
+        events = [ev async for ev in self]
+        return events, self.summary
+
+
+def asimulate_hands(params: RunParams, batch: int = 500, use_executor: bool = True, executor: Optional[Any] = None, prefetch: bool = False) -> AsyncSimulation:
+    """Async counterpart of simulate_hands(params, yield_per_hand=True).
+
+    Usage::
+
+        sim = asimulate_hands(params, batch=1000)
+        async for ev in sim:
+            ...
+        summary = sim.summary
+    """
+    return AsyncSimulation(params, batch=batch, use_executor=use_executor, executor=executor, prefetch=prefetch)
+
+
+CSV_FIELDS: List[str] = [
+    "timestamp",
+    "hand_no",
+    "bet_side",
+    "bet_amount",
+    "player_cards",
+    "banker_cards",
+    "player_total",
+    "banker_total",
+    "outcome",
+    "win_amount",
+    "bankroll_after",
+    "shoe_cards_left",
+    "commission_paid",
+    "cumulative_win",
+]
+
+
+def _csv_param_payload(params: Optional[Union[RunParams, Dict[str, Any]]]) -> Dict[str, Any]:
+    # Optional run parameters to include as constant columns per row
+    if params is None:
+        return {}
+    if isinstance(params, RunParams):
+        return {
+            "strategy": params.strategy,
+            "bet_size": params.bet,
+            "decks": params.decks,
+            "penetration": params.penetration,
+            "seed": params.seed,
+            "loss_progression_pct": getattr(params, "loss_progression_pct", 0.0),
+            "loss_progression_dec_pct": getattr(params, "loss_progression_dec_pct", 0.0),
+            "loss_progression_start": getattr(params, "loss_progression_start", 1),
+            "loss_progression_win_mode": getattr(params, "loss_progression_win_mode", "reset"),
+            "win_progression_inc_pct": getattr(params, "win_progression_inc_pct", 0.0),
+            "win_progression_dec_pct": getattr(params, "win_progression_dec_pct", 0.0),
+            "win_progression_start": getattr(params, "win_progression_start", 1),
+            "win_progression_loss_mode": getattr(params, "win_progression_loss_mode", "reset"),
+        }
+    return {k: params.get(k) for k in [
+        "strategy","bet_size","decks","penetration","seed",
+        "loss_progression_pct","loss_progression_dec_pct","loss_progression_start","loss_progression_win_mode",
+        "win_progression_inc_pct","win_progression_dec_pct","win_progression_start","win_progression_loss_mode"
+    ] if k in params}
+
+
+def write_csv(events: Iterable[HandEvent], stream, params: Optional[Union[RunParams, Dict[str, Any]]] = None) -> None:
+    """Write events as CSV rows to an open text stream, one row at a time."""
+    param_payload = _csv_param_payload(params)
+    # extend fields preserving order
+    fields = CSV_FIELDS + list(param_payload.keys())
+    writer = csv.DictWriter(stream, fieldnames=fields)
+    writer.writeheader()
+    for e in events:
+        row = asdict(e)
+        # player_cards/banker_cards should be JSON strings in CSV
+        row["player_cards"] = json.dumps(row["player_cards"], ensure_ascii=False)
+        row["banker_cards"] = json.dumps(row["banker_cards"], ensure_ascii=False)
+        # add params as constant columns per row if provided
+        row.update(param_payload)
+        writer.writerow(row)
+
+
 def save_csv(events: List[HandEvent], path: str, params: Optional[Union[RunParams, Dict[str, Any]]] = None) -> None:
     parent = os.path.dirname(os.path.abspath(path))
     if parent and not os.path.exists(parent):
         os.makedirs(parent, exist_ok=True)
-    fields = [
-        "timestamp",
-        "hand_no",
-        "bet_side",
-        "bet_amount",
-        "player_cards",
-        "banker_cards",
-        "player_total",
-        "banker_total",
-        "outcome",
-        "win_amount",
-        "bankroll_after",
-        "shoe_cards_left",
-        "commission_paid",
-        "cumulative_win",
-    ]
-    # Optional run parameters to include as constant columns per row
-    param_payload: Dict[str, Any] = {}
-    if params is not None:
-        if isinstance(params, RunParams):
-            param_payload = {
-                "strategy": params.strategy,
-                "bet_size": params.bet,
-                "decks": params.decks,
-                "penetration": params.penetration,
-                "seed": params.seed,
-                "loss_progression_pct": getattr(params, "loss_progression_pct", 0.0),
-                "loss_progression_dec_pct": getattr(params, "loss_progression_dec_pct", 0.0),
-                "loss_progression_start": getattr(params, "loss_progression_start", 1),
-                "loss_progression_win_mode": getattr(params, "loss_progression_win_mode", "reset"),
-                "win_progression_inc_pct": getattr(params, "win_progression_inc_pct", 0.0),
-                "win_progression_dec_pct": getattr(params, "win_progression_dec_pct", 0.0),
-                "win_progression_start": getattr(params, "win_progression_start", 1),
-                "win_progression_loss_mode": getattr(params, "win_progression_loss_mode", "reset"),
-            }
-        else:
-            param_payload = {k: params.get(k) for k in [
-                "strategy","bet_size","decks","penetration","seed",
-                "loss_progression_pct","loss_progression_dec_pct","loss_progression_start","loss_progression_win_mode",
-                "win_progression_inc_pct","win_progression_dec_pct","win_progression_start","win_progression_loss_mode"
-            ] if k in params}
-        # extend fields preserving order
-        fields.extend(list(param_payload.keys()))
     with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        for e in events:
-            row = asdict(e)
-            # player_cards/banker_cards should be JSON strings in CSV
-            row["player_cards"] = json.dumps(row["player_cards"], ensure_ascii=False)
-            row["banker_cards"] = json.dumps(row["banker_cards"], ensure_ascii=False)
-            # add params as constant columns per row if provided
-            row.update(param_payload)
-            writer.writerow(row)
+        write_csv(events, f, params)
 
 
 def save_json(summary: Union[RunSummary, Dict[str, Any]], path: str) -> None:
@@ -0,0 +1,188 @@
+"""
+下载文件生成 / Lazy download payloads
+
+报表只在用户点击下载时生成：逐行流式写入磁盘缓存文件（CSV / gzip / zip / Parquet），
+过期前重复下载直接读取缓存，不再重新序列化。
+"""
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from baccarat_core import CSV_FIELDS, HandEvent, RunSummary, write_csv
+
+
+# format -> (file suffix, mime)
+REPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "zip": (".csv.zip", "application/zip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+SUMMARY_FORMATS: Dict[str, Tuple[str, str]] = {
+    "json": (".json", "application/json"),
+    "json.gz": (".json.gz", "application/gzip"),
+}
+
+
+def _parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_report_formats() -> List[str]:
+    return [f for f in REPORT_FORMATS if f != "parquet" or _parquet_available()]
+
+
+def _write_report(events: List[HandEvent], fmt: str, path: str) -> None:
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            write_csv(events, f)
+    elif fmt == "csv.gz":
+        with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+            write_csv(events, f)
+    elif fmt == "zip":
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            with zf.open("baccarat_report.csv", "w") as raw:
+                with io.TextIOWrapper(raw, encoding="utf-8", newline="") as f:
+                    write_csv(events, f)
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns: Dict[str, list] = {name: [] for name in CSV_FIELDS}
+        for e in events:
+            row = asdict(e)
+            row["player_cards"] = json.dumps(row["player_cards"], ensure_ascii=False)
+            row["banker_cards"] = json.dumps(row["banker_cards"], ensure_ascii=False)
+            for name in CSV_FIELDS:
+                columns[name].append(row[name])
+        pq.write_table(pa.table(columns), path, compression="zstd")
+    else:
+        raise ValueError(f"Unknown report format: {fmt}")
+
+
+def _write_summary(summary: RunSummary, fmt: str, path: str) -> None:
+    payload = json.dumps(asdict(summary), ensure_ascii=False, indent=2)
+    if fmt == "json":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(payload)
+    elif fmt == "json.gz":
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        raise ValueError(f"Unknown summary format: {fmt}")
+
+
+class ExportCache:
+    """On-disk cache of generated download files with time-based expiry.
+
+    Files are keyed by (result key, format); a result key identifies one finished
+    run (e.g. a job id). Generation writes to a temp file and renames it in place,
+    so concurrent sessions never read a half-written file.
+    """
+
+    def __init__(self, root: Optional[str] = None, ttl_seconds: float = 3600.0, purge_interval: float = 300.0):
+        self.root = root or os.environ.get("EXPORT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "baccarat_exports")
+        self.ttl_seconds = float(ttl_seconds)
+        self.purge_interval = float(purge_interval)
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str, suffix: str) -> str:
+        safe = "".join(ch for ch in key if ch.isalnum() or ch in "-_")
+        return os.path.join(self.root, f"{safe}{suffix}")
+
+    def _fresh(self, path: str) -> bool:
+        try:
+            return (time.time() - os.path.getmtime(path)) < self.ttl_seconds
+        except OSError:
+            return False
+
+    def _get_or_create(self, key: str, suffix: str, writer: Callable[[str], None]) -> str:
+        self.maybe_purge()
+        path = self._path(key, suffix)
+        if self._fresh(path):
+            return path
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            writer(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return path
+
+    def report_path(self, key: str, events: List[HandEvent], fmt: str = "csv") -> str:
+        suffix, _mime = REPORT_FORMATS[fmt]
+        return self._get_or_create(key, suffix, lambda p: _write_report(events, fmt, p))
+
+    def summary_path(self, key: str, summary: RunSummary, fmt: str = "json") -> str:
+        suffix, _mime = SUMMARY_FORMATS[fmt]
+        return self._get_or_create(key, suffix, lambda p: _write_summary(summary, fmt, p))
+
+    def report_loader(self, key: str, events: List[HandEvent], fmt: str = "csv") -> Callable[[], bytes]:
+        """Zero-arg callable for deferred download buttons."""
+        def load() -> bytes:
+            with open(self.report_path(key, events, fmt), "rb") as f:
+                return f.read()
+        return load
+
+    def summary_loader(self, key: str, summary: RunSummary, fmt: str = "json") -> Callable[[], bytes]:
+        def load() -> bytes:
+            with open(self.summary_path(key, summary, fmt), "rb") as f:
+                return f.read()
+        return load
+
+    def maybe_purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isfile(path) and not self._fresh(path):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+def export_name(prefix: str, fmt: str, formats: Dict[str, Tuple[str, str]] = REPORT_FORMATS) -> str:
+    return f"{prefix}{formats[fmt][0]}"
+
+
+def export_mime(fmt: str, formats: Dict[str, Tuple[str, str]] = REPORT_FORMATS) -> str:
+    return formats[fmt][1]
+
+
+def describe(fmt: str) -> str:
+    labels: Dict[str, Any] = {
+        "csv": "CSV",
+        "csv.gz": "CSV (gzip)",
+        "zip": "CSV (zip)",
+        "parquet": "Parquet",
+        "json": "JSON",
+        "json.gz": "JSON (gzip)",
+    }
+    return labels.get(fmt, fmt)
@@ -0,0 +1,258 @@
+"""
+多会话资金分位带 / Streaming fan chart across ensemble sessions
+
+在若干检查点（局号）上为资金维护可合并的 t-digest 分位数草图：会话批次在
+baccarat_vector 中同步推进，每到检查点就把整批会话的资金并入对应草图，不保存任何
+资金轨迹。各批次（可在不同进程中运行）得到的 FanChart 直接合并。内存只与检查点数和
+草图压缩参数有关，与会话数 × 局数无关。
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from baccarat_core import RunParams
+from baccarat_rng import DEFAULT_RNG, RNG_BACKENDS, spawn_seeds
+from baccarat_vector import simulate_sessions
+
+
+DEFAULT_QUANTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+
+class TDigest:
+    """Mergeable t-digest (merging variant, k1 scale) with vectorized compression.
+
+    Centroids near the tails stay small, so extreme quantiles keep their
+    accuracy; at most about delta / 2 centroids are kept.
+    """
+
+    def __init__(self, delta: float = 200.0):
+        self.delta = float(delta)
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray) -> "TDigest":
+        v = np.asarray(values, dtype=float).ravel()
+        if len(v):
+            self.min = min(self.min, float(v.min()))
+            self.max = max(self.max, float(v.max()))
+            self._compress(np.concatenate([self.means, v]), np.concatenate([self.weights, np.ones(len(v))]))
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="stable")
+        m, w = means[order], weights[order]
+        total = w.sum()
+        q = (np.cumsum(w) - w / 2.0) / total
+        # k1 尺度：k(q) = delta / (2π) · asin(2q - 1)，每个质心在 k 上跨度不超过 1
+        k = self.delta / (2.0 * math.pi) * np.arcsin(np.clip(2.0 * q - 1.0, -1.0, 1.0))
+        bucket = np.floor(k - k[0]).astype(np.int64)
+        wsum = np.bincount(bucket, weights=w)
+        msum = np.bincount(bucket, weights=w * m)
+        keep = wsum > 0
+        self.weights = wsum[keep]
+        self.means = msum[keep] / self.weights
+
+    def quantile(self, q: Sequence[float]) -> np.ndarray:
+        """Quantiles for probabilities ``q`` in [0, 1]."""
+        qs = np.asarray(q, dtype=float)
+        if not len(self.means):
+            return np.full(qs.shape, math.nan)
+        total = self.weights.sum()
+        centres = np.cumsum(self.weights) - self.weights / 2.0
+        xs = np.concatenate([[0.0], centres, [total]])
+        ys = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(qs * total, xs, ys)
+
+
+def default_checkpoints(hands: int, n: int = 50) -> np.ndarray:
+    """About ``n`` evenly spaced hand numbers from 0 (start) to ``hands``."""
+    return np.unique(np.linspace(0, int(hands), max(2, int(n) + 1)).round().astype(np.int64))
+
+
+@dataclass
+class FanChart:
+    """Per-checkpoint bankroll sketches; merge() combines charts from other batches/processes."""
+    checkpoints: np.ndarray
+    quantiles: Sequence[float] = DEFAULT_QUANTILES
+    delta: float = 200.0
+    digests: List[TDigest] = field(default_factory=list, repr=False)
+    sums: np.ndarray = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.checkpoints = np.asarray(self.checkpoints, dtype=np.int64)
+        if not self.digests:
+            self.digests = [TDigest(self.delta) for _ in self.checkpoints]
+        if self.sums is None:
+            self.sums = np.zeros(len(self.checkpoints))
+        self._index = {int(h): i for i, h in enumerate(self.checkpoints)}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state.pop("_index", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._index = {int(h): i for i, h in enumerate(self.checkpoints)}
+
+    @property
+    def sessions(self) -> int:
+        return int(self.digests[0].count) if self.digests else 0
+
+    def observe(self, hand_no: int, bankroll: np.ndarray) -> None:
+        i = self._index.get(hand_no)
+        if i is not None:
+            self.digests[i].update(bankroll)
+            self.sums[i] += float(np.sum(bankroll))
+
+    def merge(self, other: "FanChart") -> "FanChart":
+        if not np.array_equal(self.checkpoints, other.checkpoints):
+            raise ValueError("Cannot merge fan charts with different checkpoints")
+        for mine, theirs in zip(self.digests, other.digests):
+            mine.merge(theirs)
+        self.sums += other.sums
+        return self
+
+    def nbytes(self) -> int:
+        return int(sum(d.means.nbytes + d.weights.nbytes for d in self.digests) + self.sums.nbytes)
+
+    def table(self) -> List[Dict[str, Any]]:
+        """One row per checkpoint: hand_no, sessions, mean and p<q> columns."""
+        probs = [q / 100.0 for q in self.quantiles]
+        rows = []
+        for h, d, s in zip(self.checkpoints, self.digests, self.sums):
+            n = d.count
+            row: Dict[str, Any] = {"hand_no": int(h), "sessions": int(n), "mean": float(s / n) if n else math.nan}
+            for q, v in zip(self.quantiles, d.quantile(probs)):
+                row[f"p{q:g}"] = float(v)
+            rows.append(row)
+        return rows
+
+
+def _run_chunk(params: RunParams, sessions: int, seed: Any, checkpoints: np.ndarray, quantiles: Sequence[float], delta: float) -> FanChart:
+    """Simulate one batch of sessions into a fresh chart; module-level for worker processes."""
+    chart = FanChart(checkpoints, quantiles, delta)
+    chart.observe(0, np.full(int(sessions), float(params.bankroll)))
+    simulate_sessions(params, sessions, seed=seed, on_hand=chart.observe)
+    return chart
+
+
+def fan_chart(
+    params: RunParams,
+    sessions: int,
+    checkpoints: int = 50,
+    chunk_sessions: int = 2000,
+    workers: Optional[int] = None,
+    seed: Optional[int] = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    delta: float = 200.0,
+    progress: Optional[Callable[[int], None]] = None,
+) -> FanChart:
+    """Bankroll percentile bands of ``sessions`` sessions of ``params``.
+
+    Sessions run in batches of ``chunk_sessions``, each with its own child
+    SeedSequence spawned from seed (default params.seed) and passed to the
+    worker, which builds its params.rng stream from it; workers > 1 runs batches in a process
+    pool and merges their charts as they finish. ``progress`` is called with the
+    number of sessions merged so far after each batch (an exception it raises
+    aborts the run).
+    """
+    total = int(sessions)
+    if total < 1:
+        raise ValueError("sessions must be >= 1")
+    points = default_checkpoints(params.hands, checkpoints)
+    size = max(1, int(chunk_sessions))
+    counts = [min(size, total - start) for start in range(0, total, size)]
+    seeds = spawn_seeds(params.seed if seed is None else seed, len(counts))
+    chart = FanChart(points, quantiles, delta)
+    if workers and workers > 1 and len(counts) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_chunk, params, n, s, points, quantiles, delta) for n, s in zip(counts, seeds)]
+            try:
+                for f in futures:
+                    chart.merge(f.result())
+                    if progress is not None:
+                        progress(chart.sessions)
+            except BaseException:
+                # 中止时不再启动尚未开始的批次
+                for f in futures:
+                    f.cancel()
+                raise
+    else:
+        for n, s in zip(counts, seeds):
+            chart.merge(_run_chunk(params, n, s, points, quantiles, delta))
+            if progress is not None:
+                progress(chart.sessions)
+    return chart
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Bankroll percentile bands across many sessions")
+    parser.add_argument("--bankroll", type=float, required=True)
+    parser.add_argument("--bet", type=float, required=True)
+    parser.add_argument("--hands", type=int, required=True)
+    parser.add_argument("--decks", type=int, default=8, choices=[6, 8])
+    parser.add_argument("--penetration", type=int, default=52)
+    parser.add_argument("--strategy", type=str, default="flip-opposite-wait")
+    parser.add_argument("--loss-progression-pct", type=float, default=0.0)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--checkpoints", type=int, default=50)
+    parser.add_argument("--chunk-sessions", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--rng",
+        type=str,
+        default=DEFAULT_RNG,
+        choices=list(RNG_BACKENDS),
+        help="随机数后端（向量化引擎中 mt 与 pcg64 使用同一个 default_rng（PCG64）流）",
+    )
+    parser.add_argument("--csv", dest="csv_path", type=str, default=None, help="分位带表格 CSV 输出路径")
+    args = parser.parse_args(argv)
+    params = RunParams(
+        bankroll=args.bankroll,
+        bet=args.bet,
+        hands=args.hands,
+        decks=args.decks,
+        penetration=args.penetration,
+        strategy=args.strategy,
+        seed=args.seed,
+        loss_progression_pct=args.loss_progression_pct,
+        rng=args.rng,
+    )
+    chart = fan_chart(params, args.sessions, args.checkpoints, args.chunk_sessions, args.workers)
+    rows = chart.table()
+    keys = list(rows[0].keys())
+    if args.csv_path:
+        with open(args.csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=keys)
+            writer.writeheader()
+            writer.writerows(rows)
+    print("\t".join(keys))
+    for row in rows:
+        print("\t".join(f"{row[k]:.2f}" if isinstance(row[k], float) else str(row[k]) for k in keys))
+    print(f"rng: {params.rng}; seed: {params.seed}; sketch bytes: {chart.nbytes()}")
+
+
+if __name__ == "__main__":
+    main()
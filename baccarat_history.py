@@ -0,0 +1,295 @@
+"""
+播放模式历史记录 / Bounded playback history
+
+每个会话只在内存中保留最近的若干手（环形缓冲），更早的记录按列压缩后追加到磁盘日志，
+导出或查看历史时再按需分页读回。进程级 SessionRegistry 按 LRU / 空闲时间淘汰会话的
+生成器与缓冲区；被淘汰的会话只做标记，由所属会话下次访问时（或空闲超时后）再关闭，
+不会在其他用户的请求线程中关闭正在播放的生成器。
+"""
+from __future__ import annotations
+
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field, fields
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from baccarat_core import HandEvent
+
+
+EVENT_FIELDS: List[str] = [f.name for f in fields(HandEvent)]
+# 单个 HandEvent（含牌面列表）在 CPython 中的大致内存占用，用于把字节预算换算成条数
+EVENT_BYTES_ESTIMATE = 1200
+_CHUNK_HEADER = struct.Struct("<II")  # (payload bytes, event count)
+# 盈亏取值计数的精确取值上限；超出后新取值按两位有效数字归入近似桶
+PNL_COUNT_LIMIT = 1000
+
+
+def _pnl_key(counts: Counter, value: float) -> float:
+    if value in counts or len(counts) < PNL_COUNT_LIMIT:
+        return value
+    return float(f"{value:.2g}")
+
+
+def _encode_chunk(events: List[HandEvent]) -> bytes:
+    columns: Dict[str, List[Any]] = {name: [] for name in EVENT_FIELDS}
+    for e in events:
+        for name in EVENT_FIELDS:
+            columns[name].append(getattr(e, name))
+    payload = zlib.compress(json.dumps(columns, separators=(",", ":")).encode("utf-8"), 6)
+    return _CHUNK_HEADER.pack(len(payload), len(events)) + payload
+
+
+def _decode_chunk(payload: bytes) -> List[HandEvent]:
+    columns = json.loads(zlib.decompress(payload).decode("utf-8"))
+    n = len(columns["hand_no"])
+    return [HandEvent(**{name: columns[name][i] for name in EVENT_FIELDS}) for i in range(n)]
+
+
+@dataclass
+class RunningStats:
+    """Playback KPIs maintained incrementally, so they never need the full history."""
+    hands: int = 0
+    player_wins: int = 0
+    banker_wins: int = 0
+    ties: int = 0
+    bet_hands: int = 0
+    push_hands: int = 0
+    wins: int = 0
+    total_wagered: float = 0.0
+    commission_total: float = 0.0
+    # 每局盈亏的取值计数，用于盈亏分布图。固定注码时取值种类很少；启用进阶注码后
+    # 取值可能很多，超过 PNL_COUNT_LIMIT 种后新取值按两位有效数字合并，保证有界
+    pnl_counts: Counter = field(default_factory=Counter)
+
+    def update(self, e: HandEvent) -> None:
+        self.hands += 1
+        if e.outcome == "player":
+            self.player_wins += 1
+        elif e.outcome == "banker":
+            self.banker_wins += 1
+        else:
+            self.ties += 1
+        if e.bet_side:
+            self.bet_hands += 1
+            self.total_wagered += e.bet_amount
+            if e.outcome == "tie":
+                self.push_hands += 1
+            elif e.bet_side == e.outcome:
+                self.wins += 1
+        self.commission_total += e.commission_paid
+        self.pnl_counts[_pnl_key(self.pnl_counts, e.win_amount)] += 1
+
+    @property
+    def observe_hands(self) -> int:
+        return self.hands - self.bet_hands
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        attempts = self.bet_hands - self.push_hands
+        return (self.wins / attempts) if attempts > 0 else None
+
+
+class EventHistory:
+    """Append-only event history with a bounded in-memory tail.
+
+    The newest ``ring_size`` events stay in memory. Older events are grouped into
+    chunks of ``chunk_size`` and appended to a spill file as zlib-compressed
+    column blocks; an in-memory index of chunk offsets allows paging them back.
+    """
+
+    def __init__(self, ring_size: int = 2000, chunk_size: int = 1000, spill_dir: Optional[str] = None):
+        self.ring_size = max(1, int(ring_size))
+        self.chunk_size = max(1, int(chunk_size))
+        self.spill_dir = spill_dir or os.environ.get("PLAYBACK_SPILL_DIR") or tempfile.gettempdir()
+        self.stats = RunningStats()
+        self._ring: Deque[HandEvent] = deque()
+        self._pending: List[HandEvent] = []
+        # (file offset, event count) per spilled chunk
+        self._index: List[Tuple[int, int]] = []
+        self._spilled = 0
+        self._spill_path: Optional[str] = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def for_budget(cls, budget_bytes: int, **kwargs: Any) -> "EventHistory":
+        """Size the in-memory tail from a per-session byte budget."""
+        return cls(ring_size=max(100, int(budget_bytes) // EVENT_BYTES_ESTIMATE), **kwargs)
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._pending) + len(self._ring)
+
+    def __iter__(self) -> Iterator[HandEvent]:
+        return self.iter_all()
+
+    @property
+    def last(self) -> Optional[HandEvent]:
+        return self._ring[-1] if self._ring else None
+
+    @property
+    def memory_events(self) -> int:
+        return len(self._ring) + len(self._pending)
+
+    def append(self, event: HandEvent) -> None:
+        with self._lock:
+            self.stats.update(event)
+            self._ring.append(event)
+            if len(self._ring) > self.ring_size:
+                self._pending.append(self._ring.popleft())
+                if len(self._pending) >= self.chunk_size:
+                    self._flush_pending()
+
+    def _flush_pending(self) -> None:
+        if not self._pending:
+            return
+        if self._spill_path is None:
+            fd, self._spill_path = tempfile.mkstemp(prefix="baccarat_history_", suffix=".bin", dir=self.spill_dir)
+            os.close(fd)
+        block = _encode_chunk(self._pending)
+        with open(self._spill_path, "ab") as f:
+            offset = f.tell()
+            f.write(block)
+        self._index.append((offset, len(self._pending)))
+        self._spilled += len(self._pending)
+        self._pending = []
+
+    def _read_chunk(self, i: int) -> List[HandEvent]:
+        offset, _count = self._index[i]
+        with open(self._spill_path, "rb") as f:
+            f.seek(offset)
+            size, _n = _CHUNK_HEADER.unpack(f.read(_CHUNK_HEADER.size))
+            return _decode_chunk(f.read(size))
+
+    def iter_all(self) -> Iterator[HandEvent]:
+        """Stream the full history, oldest first, one spilled chunk at a time."""
+        with self._lock:
+            n_chunks = len(self._index)
+            pending = list(self._pending)
+            ring = list(self._ring)
+        for i in range(n_chunks):
+            yield from self._read_chunk(i)
+        yield from pending
+        yield from ring
+
+    def page(self, start: int, stop: int) -> List[HandEvent]:
+        """Events with positions in [start, stop) (0-based, oldest first)."""
+        with self._lock:
+            total = len(self)
+            start, stop = max(0, start), min(stop, total)
+            if start >= stop:
+                return []
+            out: List[HandEvent] = []
+            pos = 0
+            for i, (_offset, count) in enumerate(self._index):
+                if pos + count > start and pos < stop:
+                    chunk = self._read_chunk(i)
+                    out.extend(chunk[max(0, start - pos):stop - pos])
+                pos += count
+                if pos >= stop:
+                    return out
+            for e in list(self._pending) + list(self._ring):
+                if start <= pos < stop:
+                    out.append(e)
+                pos += 1
+            return out
+
+    def tail(self, n: int) -> List[HandEvent]:
+        if n <= len(self._ring):
+            return list(self._ring)[-n:] if n > 0 else []
+        total = len(self)
+        return self.page(total - n, total)
+
+    def close(self) -> None:
+        with self._lock:
+            self._ring.clear()
+            self._pending = []
+            self._index = []
+            self._spilled = 0
+            if self._spill_path and os.path.exists(self._spill_path):
+                os.remove(self._spill_path)
+            self._spill_path = None
+
+
+@dataclass
+class PlaybackSession:
+    history: EventHistory
+    gen: Optional[Iterator[HandEvent]] = None
+    last_access: float = field(default_factory=time.time)
+    # 替换了一个被淘汰的会话（页面据此提示播放已重新开始）
+    replaced_evicted: bool = False
+
+    def close(self) -> None:
+        if self.gen is not None and hasattr(self.gen, "close"):
+            self.gen.close()
+        self.gen = None
+        self.history.close()
+
+
+class SessionRegistry:
+    """Process-wide LRU of playback sessions (generator + history per session).
+
+    Sessions idle longer than ``idle_seconds`` are evicted, and at most
+    ``max_sessions`` are kept; the least recently used go first.
+
+    Eviction only detaches a session: it may still be auto-playing in its own
+    script thread, so it is closed by its owner's next ``get`` (which then
+    returns a fresh session with replaced_evicted=True), or by any caller once
+    it has also been idle for ``idle_seconds``.
+    """
+
+    def __init__(self, max_sessions: int = 32, idle_seconds: float = 1800.0, budget_bytes: int = 4 * 1024 * 1024):
+        self.max_sessions = max(1, int(max_sessions))
+        self.idle_seconds = float(idle_seconds)
+        self.budget_bytes = int(budget_bytes)
+        self._sessions: "OrderedDict[str, PlaybackSession]" = OrderedDict()
+        # 已淘汰、尚未关闭的会话
+        self._evicted: Dict[str, PlaybackSession] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str) -> PlaybackSession:
+        """Return the session's state, creating a fresh one if absent or evicted."""
+        now = time.time()
+        with self._lock:
+            closing: List[PlaybackSession] = []
+            sess = self._sessions.get(session_id)
+            if sess is None:
+                own = self._evicted.pop(session_id, None)
+                if own is not None:
+                    closing.append(own)
+                sess = PlaybackSession(history=EventHistory.for_budget(self.budget_bytes), replaced_evicted=own is not None)
+                self._sessions[session_id] = sess
+            sess.last_access = now
+            self._sessions.move_to_end(session_id)
+            self._evict_locked(now)
+            closing.extend(self._collect_idle_locked(now))
+        for old in closing:
+            old.close()
+        return sess
+
+    def reset(self, session_id: str) -> PlaybackSession:
+        with self._lock:
+            old = self._sessions.pop(session_id, None) or self._evicted.pop(session_id, None)
+        if old is not None:
+            old.close()
+        return self.get(session_id)
+
+    def _evict_locked(self, now: float) -> None:
+        for sid in list(self._sessions.keys()):
+            if now - self._sessions[sid].last_access > self.idle_seconds:
+                self._evicted[sid] = self._sessions.pop(sid)
+        while len(self._sessions) > self.max_sessions:
+            sid, sess = self._sessions.popitem(last=False)
+            self._evicted[sid] = sess
+
+    def _collect_idle_locked(self, now: float) -> List[PlaybackSession]:
+        """Detach evicted sessions idle for idle_seconds; they are no longer in use."""
+        idle = [sid for sid, sess in self._evicted.items() if now - sess.last_access > self.idle_seconds]
+        return [self._evicted.pop(sid) for sid in idle]
@@ -0,0 +1,342 @@
+"""
+后台模拟任务 / Background simulation jobs
+
+在有界线程池中运行模拟，超出并发的任务排队等待；每个任务通过共享状态报告进度，
+支持取消，并按用户限制同时存在的任务数。Streamlit 页面轮询 Job 对象即可显示进度。
+keep_events=False 的任务只保留汇总（逐局事件边生成边丢弃），用于只返回汇总的接口。
+submit_task 在同一线程池中运行其他耗时计算（如多会话分位带），同样受并发与按用户的限制。
+已完成任务与结果缓存保留的逐局事件按估算字节数计入预算（EVENT_BYTES / 局），超出时先丢弃最旧的。
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from baccarat_core import HandEvent, RunParams, RunSummary, simulate_hands
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+# 每个保留的 HandEvent 的估算内存：对象本身约 240 B + 两个牌面列表约 320 B
+# （见 baccarat_profile.py --profile mem 的对象统计）
+EVENT_BYTES = 560
+
+
+def _events_bytes(events: Optional[List[HandEvent]]) -> int:
+    return len(events) * EVENT_BYTES if events else 0
+
+
+class JobLimitExceeded(RuntimeError):
+    """Raised when an owner already has the maximum number of active jobs."""
+
+
+class _JobCancelled(Exception):
+    """Raised from a task's progress callback once cancellation was requested."""
+
+
+@dataclass
+class Job:
+    job_id: str
+    owner: str
+    params: RunParams
+    kind: str = "simulate"
+    status: str = JOB_QUEUED
+    # 已完成的进度单位：模拟任务为局数，submit_task 任务由任务自行定义（共 total 个）
+    hands_done: int = 0
+    total: Optional[int] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    cached: bool = False
+    keep_events: bool = True
+    events: Optional[List[HandEvent]] = None
+    summary: Optional[RunSummary] = None
+    result: Any = None
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def __post_init__(self):
+        if self.total is None:
+            self.total = int(self.params.hands)
+
+    @property
+    def progress(self) -> float:
+        return min(1.0, self.hands_done / (self.total or 1))
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATES
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job leaves the queued/running states."""
+        return self._done.wait(timeout)
+
+    def status_dict(self) -> Dict[str, object]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "hands_done": self.hands_done,
+            "hands": int(self.params.hands),
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "cached": self.cached,
+        }
+
+
+def _params_key(params: RunParams) -> Optional[Tuple]:
+    """Cache key for a run; only seeded runs are deterministic and cacheable."""
+    if params.seed is None:
+        return None
+    payload = asdict(params)
+    # 输出路径不影响结果
+    payload.pop("csv_path", None)
+    payload.pop("json_path", None)
+    return tuple(sorted(payload.items()))
+
+
+class ResultCache:
+    """Small LRU cache of (events, summary) for seeded runs, shared across sessions.
+
+    Summary-only runs are stored with events=None; they never replace a full entry
+    and are not returned to callers that need events. Least recently used entries
+    are dropped beyond max_entries or once retained events exceed max_event_bytes.
+    """
+
+    def __init__(self, max_entries: int = 8, max_event_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_event_bytes = max_event_bytes
+        self._data: "OrderedDict[Tuple, Tuple[List[HandEvent], RunSummary]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, params: RunParams, need_events: bool = True) -> Optional[Tuple[Optional[List[HandEvent]], RunSummary]]:
+        key = _params_key(params)
+        if key is None:
+            return None
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None or (need_events and hit[0] is None):
+                return None
+            self._data.move_to_end(key)
+            return hit
+
+    def put(self, params: RunParams, events: Optional[List[HandEvent]], summary: RunSummary) -> None:
+        key = _params_key(params)
+        if key is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            existing = self._data.get(key)
+            if events is None and existing is not None and existing[0] is not None:
+                events = existing[0]
+            self._data[key] = (events, summary)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            if self.max_event_bytes is not None:
+                retained = sum(_events_bytes(ev) for ev, _ in self._data.values())
+                while retained > self.max_event_bytes and self._data:
+                    ev, _ = self._data.popitem(last=False)[1]
+                    retained -= _events_bytes(ev)
+
+
+class JobManager:
+    """Bounded worker pool for simulation jobs.
+
+    - max_workers: jobs running at the same time; further jobs wait in the executor queue.
+    - per_user_limit: max queued + running jobs per owner.
+    - progress_every: hands between progress updates / cancellation checks.
+    - keep_finished: finished jobs retained per owner for result retrieval (oldest dropped
+      first), so one owner's jobs never push out another's results.
+    - max_event_bytes: byte budget (EVENT_BYTES per hand) for events held by finished
+      jobs; the oldest finished jobs holding events are dropped once it is exceeded.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        per_user_limit: int = 2,
+        progress_every: int = 500,
+        keep_finished: int = 32,
+        cache: Optional[ResultCache] = None,
+        max_event_bytes: Optional[int] = None,
+    ):
+        self.max_workers = max(1, int(max_workers))
+        self.per_user_limit = max(1, int(per_user_limit))
+        self.progress_every = max(1, int(progress_every))
+        self.keep_finished = max(1, int(keep_finished))
+        self.max_event_bytes = max_event_bytes
+        self.cache = cache if cache is not None else ResultCache()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="baccarat-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, owner: str, params: RunParams, keep_events: bool = True) -> Job:
+        job = self._register(Job(job_id=uuid.uuid4().hex[:12], owner=owner, params=params, keep_events=keep_events))
+        self._executor.submit(self._run, job)
+        return job
+
+    def submit_task(
+        self,
+        owner: str,
+        params: RunParams,
+        fn: Callable[[Callable[[int], None]], Any],
+        total: int,
+        kind: str = "task",
+    ) -> Job:
+        """Run ``fn(progress)`` as a job; the return value is stored in job.result.
+
+        ``fn`` reports progress by calling progress(done) with 0 <= done <= total;
+        the call raises once the job is cancelled, which aborts ``fn``.
+        """
+        job = self._register(Job(job_id=uuid.uuid4().hex[:12], owner=owner, params=params, kind=kind, total=int(total)))
+        self._executor.submit(self._run_task, job, fn)
+        return job
+
+    def _register(self, job: Job) -> Job:
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if j.owner == job.owner and j.active)
+            if active >= self.per_user_limit:
+                raise JobLimitExceeded(
+                    f"Owner {job.owner!r} already has {active} active job(s) (limit {self.per_user_limit})"
+                )
+            self._jobs[job.job_id] = job
+            self._prune_locked()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, owner: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            return [j for j in self._jobs.values() if owner is None or j.owner == owner]
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.cancel()
+        return True
+
+    def shutdown(self, wait: bool = False) -> None:
+        for job in self.list_jobs():
+            job.cancel()
+        self._executor.shutdown(wait=wait)
+
+    def _prune_locked(self) -> None:
+        finished: Dict[str, List[str]] = {}
+        for jid, j in self._jobs.items():
+            if not j.active:
+                finished.setdefault(j.owner, []).append(jid)
+        for jids in finished.values():
+            for jid in jids[: max(0, len(jids) - self.keep_finished)]:
+                del self._jobs[jid]
+        if self.max_event_bytes is None:
+            return
+        holding = [j for j in self._jobs.values() if not j.active and j.events]
+        retained = sum(_events_bytes(j.events) for j in holding)
+        # 最新的一个总是保留（单个任务的大小由调用方的局数上限约束）
+        for job in holding[:-1]:
+            if retained <= self.max_event_bytes:
+                break
+            retained -= _events_bytes(job.events)
+            del self._jobs[job.job_id]
+
+    def _finish(self, job: Job) -> None:
+        job.finished_at = time.time()
+        job._done.set()
+        with self._lock:
+            self._prune_locked()
+
+    def _start(self, job: Job) -> bool:
+        """Mark ``job`` running; False (and finished) if it was cancelled while queued."""
+        if job.cancel_requested:
+            job.status = JOB_CANCELLED
+            job.finished_at = time.time()
+            job._done.set()
+            return False
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        return True
+
+    def _run_task(self, job: Job, fn: Callable[[Callable[[int], None]], Any]) -> None:
+        if not self._start(job):
+            return
+
+        def progress(done: int) -> None:
+            job.hands_done = int(done)
+            if job.cancel_requested:
+                raise _JobCancelled()
+
+        try:
+            job.result = fn(progress)
+            job.status = JOB_DONE
+        except _JobCancelled:
+            job.status = JOB_CANCELLED
+        except Exception as e:  # surfaced through job.error for the polling page
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = JOB_FAILED
+        finally:
+            self._finish(job)
+
+    def _run(self, job: Job) -> None:
+        if not self._start(job):
+            return
+        try:
+            hit = self.cache.get(job.params, need_events=job.keep_events)
+            if hit is not None:
+                events, job.summary = hit
+                job.events = events if job.keep_events else None
+                dist = job.summary.outcome_distribution
+                job.hands_done = sum(int(dist[k]["count"]) for k in ("player", "banker", "tie"))
+                job.cached = True
+                job.status = JOB_DONE
+                return
+            events = [] if job.keep_events else None
+            hands = 0
+            gen = simulate_hands(job.params, yield_per_hand=True)
+            every = self.progress_every
+            try:
+                while True:
+                    ev = next(gen)
+                    hands += 1
+                    if events is not None:
+                        events.append(ev)
+                    if hands % every == 0:
+                        job.hands_done = hands
+                        if job.cancel_requested:
+                            gen.close()
+                            job.status = JOB_CANCELLED
+                            return
+            except StopIteration as stop:
+                summary = stop.value
+            job.hands_done = hands
+            job.events, job.summary = events, summary
+            self.cache.put(job.params, events, summary)
+            job.status = JOB_DONE
+        except Exception as e:  # surfaced through job.error for the polling page
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = JOB_FAILED
+        finally:
+            self._finish(job)
@@ -0,0 +1,392 @@
+"""
+HTTP 压测 / Load generator for the simulation HTTP API
+
+N 个并发模拟用户（线程，各自带不同的 X-Client-Id）按加权场景混合反复请求 server.py：
+
+    simulate  POST /simulate（同步快速模式）
+    job       POST /jobs -> 轮询 GET /jobs/{id} -> GET /jobs/{id}/events 第一页
+    stream    GET /stream?format=ndjson&hands_per_sec=0（读完整个流）
+
+参数按混合比例随机抽取（局数、策略、进阶设置），请求之间有指数分布的思考时间。
+后台线程定期采样服务进程的 RSS。每个并发级别（--users 1,4,16 逐级加压）报告吞吐量、
+p50/p95/p99 延迟、错误率（含 429 拒绝）、按时间窗的变化以及服务端内存。
+
+    python baccarat_loadtest.py --start --users 1,4,16 --duration 30 --out out/load.json
+    python baccarat_loadtest.py --url http://127.0.0.1:8000 --server-pid 1234 --users 8
+
+--url 模式下若给出 --server-pid 则同样采样该进程内存（仅 Linux /proc）；被测服务需设置
+API_TRUST_CLIENT_ID=1，否则所有模拟用户按同一来源地址计入按用户的任务限制（--start 会自动设置）。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+DEFAULT_SCENARIOS: Dict[str, float] = {"simulate": 0.7, "job": 0.2, "stream": 0.1}
+DEFAULT_HANDS_MIX: Dict[int, float] = {1000: 0.6, 10000: 0.3, 100000: 0.1}
+STRATEGIES = ("flip-opposite-wait", "always-banker", "always-player", "alternate", "random")
+# 进阶设置混合：大部分用户平注
+PROGRESSION_MIX: List[Tuple[Dict[str, Any], float]] = [
+    ({}, 0.6),
+    ({"loss_progression_pct": 100.0}, 0.2),
+    ({"loss_progression_pct": 50.0, "loss_progression_win_mode": "persist"}, 0.1),
+    ({"win_progression_inc_pct": 50.0}, 0.1),
+]
+# 流式场景局数上限（逐局推送，太长会占满连接）
+STREAM_MAX_HANDS = 2000
+
+
+@dataclass
+class Sample:
+    scenario: str
+    started: float        # 相对本级开始的秒数
+    latency: float
+    status: int           # HTTP 状态码；网络错误为 0
+    hands: int
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+def _weighted(rng: random.Random, items: Sequence[Tuple[Any, float]]) -> Any:
+    values = [v for v, _ in items]
+    weights = [w for _, w in items]
+    return rng.choices(values, weights=weights, k=1)[0]
+
+
+def random_params(rng: random.Random, hands_mix: Dict[int, float]) -> Dict[str, Any]:
+    params: Dict[str, Any] = {
+        "bankroll": float(rng.choice((10000, 50000, 100000))),
+        "bet": float(rng.choice((50, 100, 200))),
+        "hands": int(_weighted(rng, list(hands_mix.items()))),
+        "decks": rng.choice((6, 8)),
+        "strategy": rng.choice(STRATEGIES),
+        "seed": rng.randrange(1 << 31),
+    }
+    params.update(_weighted(rng, PROGRESSION_MIX))
+    return params
+
+
+class _Client:
+    def __init__(self, base_url: str, client_id: str, timeout: float):
+        self.base = base_url.rstrip("/")
+        self.headers = {"X-Client-Id": client_id, "Content-Type": "application/json"}
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, bytes]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method, headers=self.headers)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def _run_simulate(client: _Client, params: Dict[str, Any]) -> Tuple[int, int]:
+    status, _ = client.request("POST", "/simulate", params)
+    return status, params["hands"]
+
+
+def _run_job(client: _Client, params: Dict[str, Any], poll: float = 0.05) -> Tuple[int, int]:
+    status, body = client.request("POST", "/jobs", params)
+    if status != 202:
+        return status, 0
+    job_id = json.loads(body)["job_id"]
+    while True:
+        status, body = client.request("GET", f"/jobs/{job_id}")
+        if status != 200:
+            return status, 0
+        state = json.loads(body)["status"]
+        if state == "done":
+            break
+        if state in ("failed", "cancelled"):
+            return 500, 0
+        time.sleep(poll)
+    status, _ = client.request("GET", f"/jobs/{job_id}/events?offset=0&limit=1000")
+    return status, params["hands"]
+
+
+def _run_stream(client: _Client, params: Dict[str, Any]) -> Tuple[int, int]:
+    params = dict(params, hands=min(params["hands"], STREAM_MAX_HANDS))
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    status, body = client.request("GET", f"/stream?format=ndjson&hands_per_sec=0&{query}")
+    return status, params["hands"] if status == 200 and body.rstrip().endswith(b"}") else 0
+
+
+SCENARIOS: Dict[str, Callable[[_Client, Dict[str, Any]], Tuple[int, int]]] = {
+    "simulate": _run_simulate,
+    "job": _run_job,
+    "stream": _run_stream,
+}
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size of ``pid`` from /proc (Linux); None elsewhere."""
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _percentile(ordered: Sequence[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100.0 * (len(ordered) - 1))))]
+
+
+def _stats(samples: Sequence[Sample], seconds: float) -> Dict[str, Any]:
+    lat = sorted(s.latency for s in samples if s.ok)
+    n = len(samples)
+    errors = sum(1 for s in samples if not s.ok)
+    return {
+        "requests": n,
+        "throughput_rps": n / seconds if seconds > 0 else None,
+        "hands_per_sec": sum(s.hands for s in samples if s.ok) / seconds if seconds > 0 else None,
+        "p50_ms": None if not lat else _percentile(lat, 50) * 1000,
+        "p95_ms": None if not lat else _percentile(lat, 95) * 1000,
+        "p99_ms": None if not lat else _percentile(lat, 99) * 1000,
+        "error_rate": errors / n if n else 0.0,
+        "rejected": sum(1 for s in samples if s.status == 429),
+    }
+
+
+@dataclass
+class StageResult:
+    users: int
+    duration: float
+    overall: Dict[str, Any]
+    by_scenario: Dict[str, Dict[str, Any]]
+    timeline: List[Dict[str, Any]]
+    memory: List[Tuple[float, Optional[int]]]
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def peak_rss(self) -> Optional[int]:
+        values = [m for _, m in self.memory if m is not None]
+        return max(values) if values else None
+
+
+def run_stage(
+    base_url: str,
+    users: int,
+    duration: float,
+    scenarios: Optional[Dict[str, float]] = None,
+    hands_mix: Optional[Dict[int, float]] = None,
+    think: float = 0.0,
+    server_pid: Optional[int] = None,
+    sample_every: float = 0.5,
+    window: float = 5.0,
+    timeout: float = 300.0,
+    seed: int = 0,
+) -> StageResult:
+    """Run ``users`` concurrent users for ``duration`` seconds against ``base_url``."""
+    scenarios = scenarios or DEFAULT_SCENARIOS
+    hands_mix = hands_mix or DEFAULT_HANDS_MIX
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+    samples: List[Sample] = []
+    lock = threading.Lock()
+    memory: List[Tuple[float, Optional[int]]] = []
+    stop = threading.Event()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def user(i: int) -> None:
+        rng = random.Random(seed * 1_000_003 + i)
+        client = _Client(base_url, f"load-{seed}-{i}", timeout)
+        while time.perf_counter() < deadline:
+            scenario = _weighted(rng, list(scenarios.items()))
+            params = random_params(rng, hands_mix)
+            t0 = time.perf_counter()
+            try:
+                status, hands = SCENARIOS[scenario](client, params)
+                err = None if 200 <= status < 300 else f"HTTP {status}"
+            except (OSError, ValueError) as e:
+                status, hands, err = 0, 0, type(e).__name__
+            t1 = time.perf_counter()
+            with lock:
+                samples.append(Sample(scenario, t0 - start, t1 - t0, status, hands, err))
+            if think > 0:
+                time.sleep(rng.expovariate(1.0 / think))
+
+    def sample_memory() -> None:
+        while True:
+            memory.append((time.perf_counter() - start, rss_bytes(server_pid) if server_pid else None))
+            if stop.wait(sample_every):
+                return
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stop.set()
+    sampler.join()
+    elapsed = time.perf_counter() - start
+
+    timeline = []
+    t = 0.0
+    while t < elapsed:
+        chunk = [s for s in samples if t <= s.started + s.latency < t + window]
+        mem = [m for ts, m in memory if t <= ts < t + window and m is not None]
+        row = {"t": t, **_stats(chunk, min(window, elapsed - t))}
+        row["rss_bytes"] = max(mem) if mem else None
+        timeline.append(row)
+        t += window
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if s.error:
+            errors[s.error] = errors.get(s.error, 0) + 1
+    return StageResult(
+        users=users,
+        duration=elapsed,
+        overall=_stats(samples, elapsed),
+        by_scenario={name: _stats([s for s in samples if s.scenario == name], elapsed) for name in scenarios},
+        timeline=timeline,
+        memory=memory,
+        errors=errors,
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: Optional[int] = None, env: Optional[Dict[str, str]] = None, wait: float = 15.0) -> Tuple[subprocess.Popen, str]:
+    """Start server.py in a subprocess and wait for /health; returns (process, base url).
+
+    The server trusts X-Client-Id so each simulated user gets its own job limit.
+    """
+    port = port or _free_port()
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(here, "server.py"), "--port", str(port)],
+        cwd=here, env={**os.environ, "API_TRUST_CLIENT_ID": "1", **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=1) as resp:
+                if resp.status == 200:
+                    return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"server.py did not become healthy on port {port}")
+
+
+def _parse_mix(text: str, key_type: Callable[[str], Any]) -> Dict[Any, float]:
+    out: Dict[Any, float] = {}
+    for item in text.split(","):
+        if item.strip():
+            key, _, weight = item.partition("=") if "=" in item else item.partition(":")
+            out[key_type(key.strip())] = float(weight or 1.0)
+    return out
+
+
+def format_stage(res: StageResult) -> str:
+    def ms(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v:,.1f}"
+
+    o = res.overall
+    peak = res.peak_rss
+    lines = [
+        f"users={res.users:<4} {o['throughput_rps']:8.2f} req/s {o['hands_per_sec']:12,.0f} hands/s  "
+        f"p50 {ms(o['p50_ms'])} ms  p95 {ms(o['p95_ms'])} ms  p99 {ms(o['p99_ms'])} ms  "
+        f"errors {o['error_rate']:.1%} (429: {o['rejected']})  "
+        f"server RSS peak {'-' if peak is None else f'{peak / 2**20:,.1f} MiB'}"
+    ]
+    for name, st in res.by_scenario.items():
+        lines.append(
+            f"    {name:<9} {st['requests']:>6} req  p50 {ms(st['p50_ms'])} ms  p95 {ms(st['p95_ms'])} ms  "
+            f"p99 {ms(st['p99_ms'])} ms  errors {st['error_rate']:.1%}"
+        )
+    if res.errors:
+        lines.append("    errors: " + ", ".join(f"{k} x{v}" for k, v in sorted(res.errors.items())))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for the simulation HTTP API")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", type=str, help="已运行的服务地址，如 http://127.0.0.1:8000")
+    target.add_argument("--start", action="store_true", help="在子进程中启动本地 server.py")
+    parser.add_argument("--server-pid", type=int, default=None, help="--url 模式下用于采样内存的服务进程 PID")
+    parser.add_argument("--users", type=str, default="1,4,16", help="并发用户数，逗号分隔逐级加压")
+    parser.add_argument("--duration", type=float, default=30.0, help="每级持续秒数")
+    parser.add_argument("--scenarios", type=str, default=None, help="场景权重，如 simulate=0.7,job=0.2,stream=0.1")
+    parser.add_argument("--hands-mix", type=str, default=None, help="局数权重，如 1000=0.6,10000=0.3,100000=0.1")
+    parser.add_argument("--think", type=float, default=0.5, help="平均思考时间（秒，指数分布）")
+    parser.add_argument("--window", type=float, default=5.0, help="时间线窗口（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, default=None, help="结果 JSON 路径")
+    args = parser.parse_args(argv)
+
+    scenarios = _parse_mix(args.scenarios, str) if args.scenarios else None
+    hands_mix = _parse_mix(args.hands_mix, int) if args.hands_mix else None
+    proc = None
+    if args.start:
+        proc, url = start_server()
+        pid: Optional[int] = proc.pid
+    else:
+        url, pid = args.url, args.server_pid
+    stages: List[StageResult] = []
+    try:
+        for users in (int(u) for u in args.users.split(",") if u.strip()):
+            res = run_stage(
+                url, users, args.duration, scenarios=scenarios, hands_mix=hands_mix, think=args.think,
+                server_pid=pid, window=args.window, seed=args.seed,
+            )
+            stages.append(res)
+            print(format_stage(res), flush=True)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        payload = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "url": url,
+                "duration": args.duration,
+                "think": args.think,
+                "scenarios": scenarios or DEFAULT_SCENARIOS,
+                "hands_mix": {str(k): v for k, v in (hands_mix or DEFAULT_HANDS_MIX).items()},
+            },
+            "stages": [asdict(s) for s in stages],
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
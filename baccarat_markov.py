@@ -0,0 +1,357 @@
+"""
+马尔可夫链破产概率 / Exact Markov-chain risk of ruin
+
+把下注过程建模为马尔可夫链：每手结果按精确的庄/闲/和概率独立抽取（整靴初始概率，
+忽略牌靴消耗效应），状态为（资金格点，策略状态，上一注结果，连输/连赢计数，
+持续倍率）。资金按所有可能盈亏金额的最大公约数离散成格点，每个非资金状态对应一个
+NumPy 向量；逐手按备忘的转移表平移/累加这些向量，即可得到精确的破产概率、H 手后
+资金分布与期望流水。
+
+示例：python baccarat_markov.py --bankroll 10000 --bet 100 --hands 1000 --strategy always-banker
+"""
+from __future__ import annotations
+
+import argparse
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from baccarat_core import RunParams, outcome_probabilities
+
+
+# 金额最小刻度：1/2000 元（= 分 / 20），保证庄赢扣 5% 佣金后仍为整数
+TICKS_PER_UNIT = 2000
+
+_OUTCOMES = ("player", "banker", "tie")
+
+# strategy state -> [(prob, side, state_after_decide)]
+_Decision = Tuple[float, Optional[str], Tuple]
+# (p_decision, bet_ticks, [(q, delta_ticks, next_state)], [(q, next_state)])
+_Branch = Tuple[float, int, List[Tuple[float, int, Tuple]], List[Tuple[float, Tuple]]]
+
+
+def _opposite(side: str) -> str:
+    return "banker" if side == "player" else "player"
+
+
+def _initial_strategy_state(name: str) -> Tuple:
+    if name == "alternate":
+        return ("player",)
+    if name == "flip-opposite-wait":
+        # (last_winner, streak capped at 2, waiting_due_to_streak, just_switched)
+        return (None, 0, False, False)
+    return ()
+
+
+def _strategy_decide(name: str, state: Tuple) -> List[_Decision]:
+    if name == "always-banker":
+        return [(1.0, "banker", state)]
+    if name == "always-player":
+        return [(1.0, "player", state)]
+    if name == "random":
+        return [(0.5, "player", state), (0.5, "banker", state)]
+    if name == "alternate":
+        side = state[0]
+        return [(1.0, side, (_opposite(side),))]
+    if name == "flip-opposite-wait":
+        last, streak, waiting, switched = state
+        if last is None:
+            return [(1.0, None, state)]
+        if switched:
+            return [(1.0, _opposite(last), (last, streak, waiting, False))]
+        if waiting:
+            return [(1.0, None, state)]
+        if streak <= 1:
+            return [(1.0, _opposite(last), state)]
+        return [(1.0, None, state)]
+    raise ValueError(f"Unknown strategy: {name}")
+
+
+def _strategy_observe(name: str, state: Tuple, outcome: str) -> Tuple:
+    if name != "flip-opposite-wait" or outcome == "tie":
+        return state
+    last, streak, waiting, switched = state
+    if last is None:
+        return (outcome, 1, False, False)
+    if outcome == last:
+        streak = min(streak + 1, 2)
+        return (last, streak, waiting or streak >= 2, switched)
+    return (outcome, 1, False, switched or waiting)
+
+
+def _progression_factor(inc_pct: float, dec_pct: float) -> float:
+    inc = max(0.0, float(inc_pct or 0.0))
+    dec = max(0.0, float(dec_pct or 0.0))
+    if inc > 0:
+        return 1.0 + inc / 100.0
+    if dec > 0:
+        return max(0.0, 1.0 - dec / 100.0)
+    return 1.0
+
+
+def _persist(current: float, effective: float) -> float:
+    # 按方向持久化：>1 取最大，<1 取最小
+    return max(current, effective) if effective >= 1.0 else min(current, effective)
+
+
+@dataclass
+class RuinResult:
+    params: RunParams
+    hands: int
+    outcome_probabilities: Dict[str, float]
+    # 资金低于最小可下注额（此后再也无法下注）的概率，按手累计
+    ruin_probability: float
+    ruin_curve: List[float]
+    # P(最终资金 < 基础注)
+    below_base_bet_probability: float
+    expected_final_bankroll: float
+    expected_turnover: float
+    profit_probability: float
+    final_bankroll: np.ndarray
+    final_probability: np.ndarray
+    states: int
+
+    def quantile(self, q: float) -> float:
+        cdf = np.cumsum(self.final_probability)
+        i = int(np.searchsorted(cdf, q * cdf[-1]))
+        return float(self.final_bankroll[min(i, len(cdf) - 1)])
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "hands": self.hands,
+            "ruin_probability": self.ruin_probability,
+            "below_base_bet_probability": self.below_base_bet_probability,
+            "expected_final_bankroll": self.expected_final_bankroll,
+            "expected_profit": self.expected_final_bankroll - float(self.params.bankroll),
+            "expected_turnover": self.expected_turnover,
+            "profit_probability": self.profit_probability,
+            "p5_final_bankroll": self.quantile(0.05),
+            "median_final_bankroll": self.quantile(0.5),
+            "p95_final_bankroll": self.quantile(0.95),
+            "states": self.states,
+        }
+
+
+class MarkovRiskModel:
+    """Exact betting-state Markov chain for one RunParams configuration."""
+
+    def __init__(self, params: RunParams, probabilities: Optional[Dict[str, float]] = None):
+        self.params = params
+        self.strategy = params.strategy.lower()
+        # 提前校验策略名
+        _strategy_decide(self.strategy, _initial_strategy_state(self.strategy))
+        self.probs = probabilities or outcome_probabilities(int(params.decks))
+        self.base_bet = float(params.bet)
+        self.loss_start = max(1, int(params.loss_progression_start or 1))
+        self.win_start = max(1, int(params.win_progression_start or 1))
+        self.loss_factor = _progression_factor(params.loss_progression_pct, params.loss_progression_dec_pct)
+        self.win_factor = _progression_factor(params.win_progression_inc_pct, params.win_progression_dec_pct)
+        self.loss_mode = params.loss_progression_win_mode or "reset"
+        self.win_mode = params.win_progression_loss_mode or "reset"
+        # 无进阶时连输/连赢计数不影响注码，封顶为 0 以合并状态
+        self.loss_cap = self.loss_start if self.loss_factor != 1.0 else 0
+        self.win_cap = self.win_start if self.win_factor != 1.0 else 0
+        self._transitions: Dict[Tuple, List[_Branch]] = {}
+
+        multipliers = {1.0, self.loss_factor, self.win_factor}
+        self.bet_ticks = {m: self._ticks(round(max(0.0, self.base_bet * m), 2)) for m in multipliers}
+        deltas = []
+        for t in self.bet_ticks.values():
+            if t > 0:
+                deltas += [t, t * 19 // 20]
+        self.unit = math.gcd(*deltas) if deltas else 1
+        self.min_bet_ticks = min((t for t in self.bet_ticks.values() if t > 0), default=0)
+
+    @staticmethod
+    def _ticks(amount: float) -> int:
+        return int(round(amount * TICKS_PER_UNIT))
+
+    def initial_state(self) -> Tuple:
+        # (strategy state, last bet result, loss streak, win streak, loss persist, win persist)
+        return (_initial_strategy_state(self.strategy), None, 0, 0, 1.0, 1.0)
+
+    def _multiplier(self, state: Tuple) -> float:
+        _strat, last, loss_streak, win_streak, loss_persist, win_persist = state
+        if last == "loss":
+            eff = self.loss_factor if loss_streak >= self.loss_start else 1.0
+            if self.loss_mode in ("persist", "ignore"):
+                eff = _persist(loss_persist, eff)
+            return eff
+        if last == "win":
+            eff = self.win_factor if win_streak >= self.win_start else 1.0
+            if self.win_mode in ("persist", "ignore"):
+                eff = _persist(win_persist, eff)
+            return eff
+        return 1.0
+
+    def _after_bet(self, state: Tuple, result: str) -> Tuple:
+        strat, last, loss_streak, win_streak, loss_persist, win_persist = state
+        if result == "win":
+            loss_streak = 0
+            win_streak = min(win_streak + 1, self.win_cap)
+            last = "win"
+            if self.loss_mode == "reset":
+                loss_persist = 1.0
+            if self.win_mode in ("persist", "ignore"):
+                eff = self.win_factor if win_streak >= self.win_start else 1.0
+                win_persist = _persist(win_persist, eff)
+        else:
+            win_streak = 0
+            loss_streak = min(loss_streak + 1, self.loss_cap)
+            last = "loss"
+            if self.win_mode == "reset":
+                win_persist = 1.0
+            if self.loss_mode in ("persist", "ignore"):
+                eff = self.loss_factor if loss_streak >= self.loss_start else 1.0
+                loss_persist = _persist(loss_persist, eff)
+        return (strat, last, loss_streak, win_streak, loss_persist, win_persist)
+
+    def transitions(self, state: Tuple) -> List[_Branch]:
+        """Memoized decision branches for one hand from a non-bankroll state.
+
+        Each branch is (p_decision, bet_ticks, bet_outcomes, observe_outcomes):
+        bet_outcomes [(q, delta_ticks, next_state)] apply to bankroll cells that
+        can cover the stake; observe_outcomes [(q, next_state)] apply when the
+        decision is to observe or the bankroll is insufficient.
+        """
+        cached = self._transitions.get(state)
+        if cached is not None:
+            return cached
+        branches: List[_Branch] = []
+        for p_dec, side, strat_after in _strategy_decide(self.strategy, state[0]):
+            decided = (strat_after,) + state[1:]
+            bet = self.bet_ticks[self._multiplier(state)] if side else 0
+            bet_outcomes: List[Tuple[float, int, Tuple]] = []
+            observe_outcomes: List[Tuple[float, Tuple]] = []
+            for outcome in _OUTCOMES:
+                q = self.probs[outcome]
+                observed = _strategy_observe(self.strategy, strat_after, outcome)
+                observe_outcomes.append((q, (observed,) + decided[1:]))
+                if bet > 0:
+                    if outcome == "tie":
+                        nxt, delta = decided, 0
+                    elif outcome == side:
+                        nxt = self._after_bet(decided, "win")
+                        delta = bet if side == "player" else bet * 19 // 20
+                    else:
+                        nxt, delta = self._after_bet(decided, "loss"), -bet
+                    bet_outcomes.append((q, delta, (observed,) + nxt[1:]))
+            branches.append((p_dec, bet, bet_outcomes, observe_outcomes))
+        self._transitions[state] = branches
+        return branches
+
+    def run(self, hands: Optional[int] = None) -> RuinResult:
+        H = int(self.params.hands if hands is None else hands)
+        unit = self.unit
+        init = self._ticks(float(self.params.bankroll))
+        below = init // unit  # cells below the start bankroll (down to >= 0)
+        above = (H * max(self.bet_ticks.values())) // unit + 1
+        L = below + above + 1
+        i0 = below
+        values = init + (np.arange(L, dtype=np.int64) - i0) * unit  # bankroll ticks per cell
+
+        def first_affordable(bet: int) -> int:
+            return int(np.searchsorted(values, bet, side="left"))
+
+        afford_idx = {t: first_affordable(t) for t in self.bet_ticks.values()}
+        ruin_idx = first_affordable(self.min_bet_ticks) if self.min_bet_ticks > 0 else 0
+
+        dist: Dict[Tuple, np.ndarray] = {}
+        start = np.zeros(L)
+        start[i0] = 1.0
+        dist[self.initial_state()] = start
+        turnover = 0.0
+        ruin_curve: List[float] = []
+
+        for _ in range(H):
+            new: Dict[Tuple, np.ndarray] = {}
+
+            def acc_for(key: Tuple) -> np.ndarray:
+                acc = new.get(key)
+                if acc is None:
+                    acc = new[key] = np.zeros(L)
+                return acc
+
+            for state, arr in dist.items():
+                for p_dec, bet, bet_outcomes, observe_outcomes in self.transitions(state):
+                    thr = afford_idx[bet] if bet > 0 else L
+                    if thr < L:
+                        part = arr[thr:]
+                        turnover += p_dec * float(part.sum()) * bet / TICKS_PER_UNIT
+                        for q, delta, nxt in bet_outcomes:
+                            shift = delta // unit
+                            hi = L - max(0, shift)
+                            acc_for(nxt)[thr + shift:hi + shift] += (p_dec * q) * arr[thr:hi]
+                    if thr > 0:
+                        # 观望，或资金不足以下注的格点
+                        poor = arr[:thr]
+                        for q, nxt in observe_outcomes:
+                            acc_for(nxt)[:thr] += (p_dec * q) * poor
+            dist = new
+            ruin_curve.append(float(sum(a[:ruin_idx].sum() for a in dist.values())))
+
+        final = np.zeros(L)
+        for arr in dist.values():
+            final += arr
+        nz = final > 1e-15
+        return RuinResult(
+            params=self.params,
+            hands=H,
+            outcome_probabilities=dict(self.probs),
+            ruin_probability=ruin_curve[-1] if ruin_curve else 0.0,
+            ruin_curve=ruin_curve,
+            below_base_bet_probability=float(final[: afford_idx[self.bet_ticks[1.0]]].sum()),
+            expected_final_bankroll=float((values * final).sum() / TICKS_PER_UNIT),
+            expected_turnover=turnover,
+            profit_probability=float(final[i0 + 1:].sum()),
+            final_bankroll=values[nz] / TICKS_PER_UNIT,
+            final_probability=final[nz],
+            states=len(self._transitions),
+        )
+
+
+def risk_of_ruin(params: RunParams, hands: Optional[int] = None) -> RuinResult:
+    """Exact ruin probability / final-bankroll distribution / expected turnover for ``params``."""
+    return MarkovRiskModel(params).run(hands)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Exact Markov-chain risk of ruin for progression settings")
+    parser.add_argument("--bankroll", type=float, required=True)
+    parser.add_argument("--bet", type=float, required=True)
+    parser.add_argument("--hands", type=int, required=True)
+    parser.add_argument("--decks", type=int, default=8, choices=[6, 8])
+    parser.add_argument("--strategy", type=str, default="flip-opposite-wait")
+    parser.add_argument("--loss-progression-pct", type=float, default=0.0)
+    parser.add_argument("--loss-progression-dec-pct", type=float, default=0.0)
+    parser.add_argument("--loss-progression-start", type=int, default=1)
+    parser.add_argument("--loss-progression-win-mode", type=str, default="reset", choices=["reset", "persist", "ignore"])
+    parser.add_argument("--win-progression-inc-pct", type=float, default=0.0)
+    parser.add_argument("--win-progression-dec-pct", type=float, default=0.0)
+    parser.add_argument("--win-progression-start", type=int, default=1)
+    parser.add_argument("--win-progression-loss-mode", type=str, default="reset", choices=["reset", "persist", "ignore"])
+    args = parser.parse_args(argv)
+    params = RunParams(
+        bankroll=args.bankroll,
+        bet=args.bet,
+        hands=args.hands,
+        decks=args.decks,
+        strategy=args.strategy,
+        loss_progression_pct=args.loss_progression_pct,
+        loss_progression_dec_pct=args.loss_progression_dec_pct,
+        loss_progression_start=args.loss_progression_start,
+        loss_progression_win_mode=args.loss_progression_win_mode,
+        win_progression_inc_pct=args.win_progression_inc_pct,
+        win_progression_dec_pct=args.win_progression_dec_pct,
+        win_progression_start=args.win_progression_start,
+        win_progression_loss_mode=args.win_progression_loss_mode,
+    )
+    result = risk_of_ruin(params)
+    for k, v in result.summary().items():
+        print(f"{k}: {v:.6f}" if isinstance(v, float) else f"{k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+进阶参数优化器 / Successive-halving optimizer for progression settings
+
+在连输/连赢进阶参数空间（百分比、起始阈值、reset/persist 模式等）中搜索使目标最优的组合：
+- 目标：最终资金中位数/均值、破产率、ROI（可含返水）；
+- 每一轮所有存活候选使用同一批种子（共同随机数，牌靴完全相同），可多进程并行评估；
+- 逐轮按目标淘汰较差的 1 - 1/eta，幸存者获得 eta 倍的会话数（successive halving），
+  把模拟预算集中到有希望的候选上；
+- 输出按目标排序的结果表及置信区间。
+
+会话由 baccarat_vector.simulate_sessions 批量模拟。
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from baccarat_core import RunParams
+from baccarat_vector import simulate_sessions
+
+
+# 目标名 -> 是否越大越好
+OBJECTIVES: Dict[str, bool] = {
+    "median_final_bankroll": True,
+    "mean_final_bankroll": True,
+    "ruin_rate": False,
+    "roi": True,
+    "roi_rebate": True,
+}
+
+# 不参与搜索的字段（种子由优化器统一分配，输出路径与结果无关）
+_FIXED_FIELDS = ("seed", "csv_path", "json_path")
+
+
+def _z_value(confidence: float) -> float:
+    from statistics import NormalDist
+    return NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+
+def _mean_ci(x: np.ndarray, z: float) -> Tuple[float, float, float]:
+    m = float(x.mean())
+    if len(x) < 2:
+        return m, m, m
+    half = z * float(x.std(ddof=1)) / math.sqrt(len(x))
+    return m, m - half, m + half
+
+
+def _median_ci(x: np.ndarray, z: float) -> Tuple[float, float, float]:
+    # 分布无关的次序统计量区间（二项分布正态近似）
+    s = np.sort(x)
+    n = len(s)
+    half = z * math.sqrt(n) / 2.0
+    lo = max(0, int(math.floor(n / 2.0 - half)))
+    hi = min(n - 1, int(math.ceil(n / 2.0 + half)) - 1)
+    return float(np.median(s)), float(s[lo]), float(s[max(lo, hi)])
+
+
+def _wilson_ci(k: int, n: int, z: float) -> Tuple[float, float, float]:
+    if n == 0:
+        return 0.0, 0.0, 1.0
+    p = k / n
+    denom = 1.0 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return p, max(0.0, centre - half), min(1.0, centre + half)
+
+
+def _evaluate(params: RunParams, sessions: int, seed: Any) -> Dict[str, np.ndarray]:
+    """Run one batch for one candidate; module-level so it can be sent to worker processes."""
+    res = simulate_sessions(params, sessions, seed=seed)
+    return {
+        "final_bankroll": res.final_bankroll,
+        "total_wagered": res.total_wagered,
+        "ruined": res.ruined,
+    }
+
+
+@dataclass
+class CandidateResult:
+    """Accumulated per-session outcomes and the latest estimate for one candidate."""
+    index: int
+    overrides: Dict[str, Any]
+    params: RunParams
+    rung: int = 0
+    final_bankroll: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    total_wagered: np.ndarray = field(default_factory=lambda: np.empty(0), repr=False)
+    ruined: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=bool), repr=False)
+    estimate: float = float("nan")
+    ci_low: float = float("nan")
+    ci_high: float = float("nan")
+
+    @property
+    def sessions(self) -> int:
+        return int(len(self.final_bankroll))
+
+    def add(self, batch: Dict[str, np.ndarray]) -> None:
+        self.final_bankroll = np.concatenate([self.final_bankroll, batch["final_bankroll"]])
+        self.total_wagered = np.concatenate([self.total_wagered, batch["total_wagered"]])
+        self.ruined = np.concatenate([self.ruined, batch["ruined"]])
+
+    def roi(self, rebate_pct: float = 0.0) -> np.ndarray:
+        w = self.total_wagered
+        profit = self.final_bankroll - float(self.params.bankroll) + w * (rebate_pct / 100.0)
+        return np.divide(profit, w, out=np.zeros_like(w), where=w > 0)
+
+    def score(self, objective: str, z: float, rebate_pct: float = 0.0) -> None:
+        if objective == "median_final_bankroll":
+            est = _median_ci(self.final_bankroll, z)
+        elif objective == "mean_final_bankroll":
+            est = _mean_ci(self.final_bankroll, z)
+        elif objective == "ruin_rate":
+            est = _wilson_ci(int(self.ruined.sum()), self.sessions, z)
+        elif objective == "roi":
+            est = _mean_ci(self.roi(), z)
+        elif objective == "roi_rebate":
+            est = _mean_ci(self.roi(rebate_pct), z)
+        else:
+            raise ValueError(f"Unknown objective: {objective}")
+        self.estimate, self.ci_low, self.ci_high = est
+
+    def row(self, rebate_pct: float = 0.0) -> Dict[str, Any]:
+        return {
+            **self.overrides,
+            "rung": self.rung,
+            "sessions": self.sessions,
+            "estimate": self.estimate,
+            "ci_low": self.ci_low,
+            "ci_high": self.ci_high,
+            "median_final_bankroll": float(np.median(self.final_bankroll)),
+            "ruin_rate": float(self.ruined.mean()),
+            "mean_roi": float(self.roi(rebate_pct).mean()),
+        }
+
+
+@dataclass
+class OptimizationResult:
+    objective: str
+    maximize: bool
+    confidence: float
+    rebate_pct: float
+    ranked: List[CandidateResult]
+    total_sessions: int
+    rungs: int
+
+    @property
+    def best(self) -> CandidateResult:
+        return self.ranked[0]
+
+    def table(self) -> List[Dict[str, Any]]:
+        return [{"rank": i + 1, **c.row(self.rebate_pct)} for i, c in enumerate(self.ranked)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "objective": self.objective,
+            "maximize": self.maximize,
+            "confidence": self.confidence,
+            "rebate_pct": self.rebate_pct,
+            "rungs": self.rungs,
+            "total_sessions": self.total_sessions,
+            "total_hands": self.total_sessions * int(self.best.params.hands),
+            "ranked": self.table(),
+        }
+
+
+def expand_space(space: Dict[str, Sequence[Any]], max_candidates: Optional[int] = None, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Cartesian grid of overrides; randomly subsampled when larger than max_candidates."""
+    names = {f.name for f in fields(RunParams)}
+    for key in space:
+        if key not in names or key in _FIXED_FIELDS:
+            raise ValueError(f"Cannot search over field: {key}")
+    keys = list(space)
+    grid = [dict(zip(keys, combo)) for combo in itertools.product(*(list(space[k]) for k in keys))]
+    if max_candidates is not None and len(grid) > max_candidates:
+        grid = random.Random(seed).sample(grid, int(max_candidates))
+    return grid
+
+
+def successive_halving(
+    base: RunParams,
+    space: Dict[str, Sequence[Any]],
+    objective: str = "median_final_bankroll",
+    min_sessions: int = 64,
+    eta: int = 3,
+    max_rungs: Optional[int] = None,
+    confidence: float = 0.95,
+    rebate_pct: float = 0.0,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    max_candidates: Optional[int] = None,
+) -> OptimizationResult:
+    """Search ``space`` (field -> candidate values) around ``base`` with successive halving.
+
+    Rung r gives every survivor ``min_sessions * eta**r`` sessions in total; the
+    additional batch of each rung is simulated with one shared seed for all
+    candidates, so comparisons within a rung use identical shoes. After each
+    rung the best ``ceil(n / eta)`` survive. Runs until one candidate is left
+    or ``max_rungs`` is reached. workers > 1 evaluates candidates in a process pool.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+    if eta < 2:
+        raise ValueError("eta must be >= 2")
+    maximize = OBJECTIVES[objective]
+    z = _z_value(confidence)
+    overrides = expand_space(space, max_candidates, seed)
+    if not overrides:
+        raise ValueError("Empty search space")
+    candidates = [CandidateResult(i, o, replace(base, **o)) for i, o in enumerate(overrides)]
+    seeds = np.random.SeedSequence(seed)
+
+    def sort_key(c: CandidateResult) -> Tuple[int, float]:
+        return (-c.rung, -c.estimate if maximize else c.estimate)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers and workers > 1 else None
+    survivors = candidates
+    total_sessions = 0
+    rung = 0
+    try:
+        while True:
+            target = int(min_sessions) * int(eta) ** rung
+            # 子 SeedSequence 直接交给 worker，由其按 params.rng 构造随机流
+            batch_seed = seeds.spawn(1)[0]
+            jobs = [(c, target - c.sessions) for c in survivors if target > c.sessions]
+            if executor is not None:
+                futures = [executor.submit(_evaluate, c.params, n, batch_seed) for c, n in jobs]
+                batches = [f.result() for f in futures]
+            else:
+                batches = [_evaluate(c.params, n, batch_seed) for c, n in jobs]
+            for (c, n), batch in zip(jobs, batches):
+                c.add(batch)
+                c.rung = rung
+                c.score(objective, z, rebate_pct)
+                total_sessions += n
+            survivors = sorted(survivors, key=sort_key)
+            rung += 1
+            if len(survivors) <= 1 or (max_rungs is not None and rung >= max_rungs):
+                break
+            survivors = survivors[: max(1, math.ceil(len(survivors) / eta))]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return OptimizationResult(
+        objective=objective,
+        maximize=maximize,
+        confidence=confidence,
+        rebate_pct=rebate_pct,
+        ranked=sorted(candidates, key=sort_key),
+        total_sessions=total_sessions,
+        rungs=rung,
+    )
+
+
+def parse_space(items: List[str]) -> Dict[str, List[Any]]:
+    """Parse ``name=v1,v2,...`` items, coercing values to the RunParams field type.
+
+    Raises ValueError for unknown or fixed fields and for values of the wrong type.
+    """
+    defaults = RunParams(bankroll=0.0, bet=0.0, hands=0)
+    names = {f.name for f in fields(RunParams)}
+    space: Dict[str, List[Any]] = {}
+    for item in items:
+        name, sep, values = item.partition("=")
+        name = name.strip().replace("-", "_")
+        if not sep or not values:
+            raise ValueError(f"Expected name=v1,v2,... but got: {item}")
+        if name not in names or name in _FIXED_FIELDS:
+            raise ValueError(f"Cannot search over field: {name}")
+        kind = type(getattr(defaults, name))
+        cast = kind if kind in (int, float, str) else str
+        try:
+            space[name] = [cast(v.strip()) for v in values.split(",")]
+        except ValueError:
+            raise ValueError(f"Invalid {kind.__name__} value in --space {item}") from None
+    return space
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Successive-halving search over progression settings")
+    parser.add_argument("--bankroll", type=float, required=True)
+    parser.add_argument("--bet", type=float, required=True)
+    parser.add_argument("--hands", type=int, required=True)
+    parser.add_argument("--decks", type=int, default=8, choices=[6, 8])
+    parser.add_argument("--penetration", type=int, default=52)
+    parser.add_argument("--strategy", type=str, default="flip-opposite-wait")
+    parser.add_argument(
+        "--space",
+        action="append",
+        required=True,
+        help="搜索维度，可重复，例如 loss_progression_pct=0,25,50,100 或 loss_progression_win_mode=reset,persist",
+    )
+    parser.add_argument("--objective", type=str, default="median_final_bankroll", choices=sorted(OBJECTIVES))
+    parser.add_argument("--rebate-pct", type=float, default=0.0, help="返水比例(%)，用于 roi_rebate")
+    parser.add_argument("--min-sessions", type=int, default=64, help="第一轮每个候选的会话数")
+    parser.add_argument("--eta", type=int, default=3, help="每轮保留 1/eta，幸存者会话数乘以 eta")
+    parser.add_argument("--max-rungs", type=int, default=None)
+    parser.add_argument("--max-candidates", type=int, default=None, help="网格过大时随机抽样的候选数")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认单进程）")
+    parser.add_argument("--top", type=int, default=20, help="打印前 N 名")
+    parser.add_argument("--json", dest="json_path", type=str, default=None, help="结果表 JSON 输出路径")
+    args = parser.parse_args(argv)
+
+    base = RunParams(
+        bankroll=args.bankroll,
+        bet=args.bet,
+        hands=args.hands,
+        decks=args.decks,
+        penetration=args.penetration,
+        strategy=args.strategy,
+    )
+    try:
+        result = successive_halving(
+            base,
+            parse_space(args.space),
+            objective=args.objective,
+            min_sessions=args.min_sessions,
+            eta=args.eta,
+            max_rungs=args.max_rungs,
+            confidence=args.confidence,
+            rebate_pct=args.rebate_pct,
+            seed=args.seed,
+            workers=args.workers,
+            max_candidates=args.max_candidates,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    rows = result.table()
+    keys = list(rows[0].keys())
+    print(f"objective={result.objective} ({'max' if result.maximize else 'min'}); rungs={result.rungs}; "
+          f"sessions={result.total_sessions}; hands={result.total_sessions * args.hands}")
+    print("\t".join(keys))
+    for row in rows[: args.top]:
+        print("\t".join(f"{row[k]:.6g}" if isinstance(row[k], float) else str(row[k]) for k in keys))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+运行剖析 / CPU and memory profiling of a run
+
+- cpu：在 cProfile 下运行，写出 <前缀>.pstats；同时由后台线程按固定间隔采样主线程调用栈，
+  写出 <前缀>.collapsed（每行 "帧;帧;帧 次数"，flamegraph.pl / speedscope 可直接渲染）。
+- mem：在 tracemalloc 下运行，报告峰值、按代码行排名的存活分配，以及运行前后 HandEvent /
+  list 对象的数量与字节数变化；<前缀>.collapsed 为按调用栈汇总的存活字节数。
+  Card 对象来自缓存的整副牌靴模板（Shoe.reset 只重排引用，不再逐张创建），运行前后的差值
+  恒为 0，因此单独报告存活总数。
+
+两种模式都会把文字报告写入 <前缀>.txt 并返回。
+"""
+from __future__ import annotations
+
+import cProfile
+import gc
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, Tuple
+
+from baccarat_core import Card, HandEvent
+
+
+PROFILE_MODES = ("cpu", "mem")
+# 内存报告中统计运行前后变化的对象类型
+CENSUS_TYPES: Tuple[type, ...] = (HandEvent, list)
+# 跨运行共享的对象（缓存的牌靴模板），只报告存活总数
+SHARED_TYPES: Tuple[type, ...] = (Card,)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack every ``interval`` seconds into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def __enter__(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+def profile_cpu(fn: Callable[[], Any], prefix: str, top: int = 25, interval: float = 0.001) -> Tuple[Any, str]:
+    """Run ``fn`` under cProfile and a stack sampler; returns (fn result, report text)."""
+    profiler = cProfile.Profile()
+    with StackSampler(threading.get_ident(), interval) as sampler:
+        t0 = time.perf_counter()
+        profiler.enable()
+        try:
+            result = fn()
+        finally:
+            profiler.disable()
+        wall = time.perf_counter() - t0
+    profiler.dump_stats(prefix + ".pstats")
+    sampler.write(prefix + ".collapsed")
+    buf = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buf)
+    stats.sort_stats("cumulative").print_stats(top)
+    stats.sort_stats("tottime").print_stats(top)
+    report = (
+        f"CPU profile: wall {wall:.3f}s (under cProfile); {sum(sampler.counts.values())} stack samples\n"
+        f"pstats: {prefix}.pstats\ncollapsed stacks: {prefix}.collapsed\n\n{buf.getvalue()}"
+    )
+    _write(prefix + ".txt", report)
+    return result, report
+
+
+def _census() -> Dict[type, Tuple[int, int]]:
+    """Count and shallow bytes (including instance __dict__) of live CENSUS_TYPES / SHARED_TYPES objects."""
+    out = {t: [0, 0] for t in CENSUS_TYPES + SHARED_TYPES}
+    for obj in gc.get_objects():
+        t = type(obj)
+        if t in out:
+            size = sys.getsizeof(obj)
+            d = getattr(obj, "__dict__", None)
+            if d is not None:
+                size += sys.getsizeof(d)
+            out[t][0] += 1
+            out[t][1] += size
+    return {t: (n, b) for t, (n, b) in out.items()}
+
+
+def profile_mem(fn: Callable[[], Any], prefix: str, top: int = 25, frames: int = 16) -> Tuple[Any, str]:
+    """Run ``fn`` under tracemalloc; returns (fn result, report text).
+
+    The snapshot and object census are taken while the result is still alive,
+    so they show what the run keeps in memory (e.g. the event list).
+    """
+    gc.collect()
+    before = _census()
+    tracemalloc.start(frames)
+    try:
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    gc.collect()
+    after = _census()
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+
+    lines = [
+        f"Memory profile: peak {peak / 1024:,.1f} KiB; live at end {current / 1024:,.1f} KiB",
+        "",
+        "Objects created by the run (still alive):",
+        f"  {'type':<12} {'count':>12} {'bytes':>14} {'bytes/obj':>10}",
+    ]
+    for t in CENSUS_TYPES:
+        n = after[t][0] - before[t][0]
+        b = after[t][1] - before[t][1]
+        per = f"{b / n:.1f}" if n > 0 else "-"
+        lines.append(f"  {t.__name__:<12} {n:>12,} {b:>14,} {per:>10}")
+    lines += ["", "Shared objects (cached deck templates reused by every shoe; live totals):"]
+    for t in SHARED_TYPES:
+        n, b = after[t]
+        lines.append(f"  {t.__name__:<12} {n:>12,} {b:>14,}")
+    lines += ["", f"Top {top} allocation sites (live bytes):"]
+    for stat in snapshot.statistics("lineno")[:top]:
+        frame = stat.traceback[0]
+        lines.append(f"  {stat.size / 1024:>10,.1f} KiB {stat.count:>9,} blocks  {frame.filename}:{frame.lineno}")
+
+    stacks: Counter = Counter()
+    for stat in snapshot.statistics("traceback"):
+        # 回溯按从外到内排列，正是 collapsed 格式的顺序
+        stacks[";".join(f"{os.path.basename(f.filename)}:{f.lineno}" for f in stat.traceback)] += stat.size
+    with open(prefix + ".collapsed", "w", encoding="utf-8") as f:
+        for stack, size in stacks.most_common():
+            f.write(f"{stack} {size}\n")
+    lines += ["", f"collapsed stacks (bytes): {prefix}.collapsed"]
+    report = "\n".join(lines) + "\n"
+    _write(prefix + ".txt", report)
+    return result, report
+
+
+def _write(path: str, text: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def profile_call(mode: str, fn: Callable[[], Any], prefix: str, top: int = 25) -> Tuple[Any, str]:
+    """Profile ``fn`` in ``mode`` ("cpu" or "mem"), writing <prefix>.* files."""
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    parent = os.path.dirname(os.path.abspath(prefix))
+    os.makedirs(parent, exist_ok=True)
+    if mode == "cpu":
+        return profile_cpu(fn, prefix, top)
+    return profile_mem(fn, prefix, top)
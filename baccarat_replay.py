@@ -0,0 +1,325 @@
+"""
+牌靴回放 / Replay of recorded shoes
+
+把实际记录的牌局（逐手记录，可长达数千万手）作为模拟循环的发牌来源，代替随机生成的
+Shoe：ReplayGame 提供与 BaccaratGame 相同的接口（deal_one_hand / needs_shuffle /
+shuffle / cards_left / exhausted），策略、进阶注码、汇总与导出全部照常运行。
+
+记录格式（逐手一条，均可 gzip 压缩为 .gz）：
+- CSV：outcome（player/banker/tie 或 P/B/T）、player_cards / banker_cards（JSON 列表或以空格、
+  | 分隔的牌面）；可选 shoe（牌靴编号，变化即换靴）、shoe_cards_left（变大即换靴）。
+  本项目导出的报表 CSV 可直接回放。
+- NDJSON：每行一个对象，字段同 CSV，牌面为列表。
+- 二进制 .bacr：文件头 b"BACR\\x01"，之后每手 1 字节头 + 每张牌 1 字节（RANKS 下标）。
+  头字节 bit0-1 结果（0 闲 / 1 庄 / 2 和），bit2 新牌靴，bit3-4 闲家牌数，bit5-6 庄家牌数。
+
+有牌面时结果由牌面按规则计算；只有结果的记录也能回放，此时点数为 None、每手发牌数为 0。
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import json
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from baccarat_core import RANKS, RunParams, RunSummary, _compare_totals, hand_total, save_json, simulate_hands, write_csv
+
+
+BINARY_MAGIC = b"BACR\x01"
+_RANK_INDEX = {r: i for i, r in enumerate(RANKS)}
+_OUTCOME_CODES = ("player", "banker", "tie")
+_OUTCOME_ALIASES = {
+    "player": "player", "p": "player", "闲": "player",
+    "banker": "banker", "b": "banker", "庄": "banker",
+    "tie": "tie", "t": "tie", "和": "tie",
+}
+
+
+class ReplayHand(NamedTuple):
+    new_shoe: bool
+    outcome: str
+    player_cards: Tuple[str, ...] = ()
+    banker_cards: Tuple[str, ...] = ()
+    # 记录中的剩余牌数（发完本手后）；没有时按副牌数推算
+    cards_left: Optional[int] = None
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _open_binary(path: str, mode: str = "rb"):
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+def _parse_cards(value: Any, where: str) -> Tuple[str, ...]:
+    if value is None or value == "":
+        return ()
+    if isinstance(value, list):
+        cards = value
+    elif value.startswith("["):
+        cards = json.loads(value)
+    else:
+        cards = value.replace("|", " ").split()
+    cards = tuple(str(c).upper() for c in cards)
+    for c in cards:
+        if c not in _RANK_INDEX:
+            raise ValueError(f"{where}: unknown card rank {c!r}")
+    return cards
+
+
+class _ShoeTracker:
+    """Detects shoe boundaries from an explicit shoe id or from a rising cards-left count."""
+
+    def __init__(self):
+        self.first = True
+        self.last_shoe: Any = None
+        self.last_left: Optional[int] = None
+
+    def new_shoe(self, shoe: Any, left: Optional[int]) -> bool:
+        if self.first:
+            is_new = True
+        elif shoe is not None:
+            is_new = shoe != self.last_shoe
+        else:
+            is_new = left is not None and self.last_left is not None and left > self.last_left
+        self.first = False
+        self.last_shoe = shoe
+        self.last_left = left
+        return is_new
+
+
+def _record_to_hand(rec: Dict[str, Any], tracker: _ShoeTracker, where: str) -> ReplayHand:
+    pc = _parse_cards(rec.get("player_cards"), where)
+    bc = _parse_cards(rec.get("banker_cards"), where)
+    if pc or bc:
+        if not (2 <= len(pc) <= 3 and 2 <= len(bc) <= 3):
+            raise ValueError(f"{where}: each side needs 2 or 3 cards")
+        outcome = _compare_totals(hand_total(list(pc)), hand_total(list(bc)))
+    else:
+        outcome = _OUTCOME_ALIASES.get(str(rec.get("outcome", "")).strip().lower())
+        if outcome is None:
+            raise ValueError(f"{where}: missing or unknown outcome {rec.get('outcome')!r}")
+    shoe = rec.get("shoe", rec.get("shoe_id"))
+    if shoe == "":
+        shoe = None
+    left = rec.get("shoe_cards_left")
+    left = int(left) if left not in (None, "") else None
+    return ReplayHand(tracker.new_shoe(shoe, left), outcome, pc, bc, left)
+
+
+def read_csv(path: str) -> Iterator[ReplayHand]:
+    tracker = _ShoeTracker()
+    with _open_text(path) as f:
+        for i, rec in enumerate(csv.DictReader(f), start=2):
+            yield _record_to_hand(rec, tracker, f"{path}:{i}")
+
+
+def read_ndjson(path: str) -> Iterator[ReplayHand]:
+    tracker = _ShoeTracker()
+    with _open_text(path) as f:
+        for i, line in enumerate(f, start=1):
+            if line.strip():
+                yield _record_to_hand(json.loads(line), tracker, f"{path}:{i}")
+
+
+def read_binary(path: str, chunk_size: int = 1 << 20) -> Iterator[ReplayHand]:
+    with _open_binary(path) as f:
+        if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(f"{path}: not a .bacr replay file")
+        buf = b""
+        pos = 0
+        while True:
+            chunk = f.read(chunk_size)
+            buf = buf[pos:] + chunk
+            pos = 0
+            end = len(buf)
+            # 最后一块不完整的记录留到下一轮
+            while pos < end:
+                head = buf[pos]
+                n_p = (head >> 3) & 3
+                n_b = (head >> 5) & 3
+                stop = pos + 1 + n_p + n_b
+                if stop > end:
+                    break
+                cards = tuple(RANKS[c] for c in buf[pos + 1:stop])
+                yield ReplayHand(bool(head & 4), _OUTCOME_CODES[head & 3], cards[:n_p], cards[n_p:], None)
+                pos = stop
+            if not chunk:
+                if pos < end:
+                    raise ValueError(f"{path}: truncated record at end of file")
+                return
+
+
+def write_binary(hands: Iterable[ReplayHand], path: str) -> int:
+    """Write hands as a .bacr file (optionally .bacr.gz); returns the number of hands written."""
+    n = 0
+    with _open_binary(path, "wb") as f:
+        f.write(BINARY_MAGIC)
+        out = bytearray()
+        for h in hands:
+            head = _OUTCOME_CODES.index(h.outcome) | (4 if h.new_shoe else 0)
+            head |= len(h.player_cards) << 3 | len(h.banker_cards) << 5
+            out.append(head)
+            out.extend(_RANK_INDEX[c] for c in h.player_cards)
+            out.extend(_RANK_INDEX[c] for c in h.banker_cards)
+            n += 1
+            if len(out) >= 1 << 20:
+                f.write(out)
+                out.clear()
+        f.write(out)
+    return n
+
+
+def read_hands(path: str) -> Iterator[ReplayHand]:
+    """Stream hands from a CSV / NDJSON / .bacr log, chosen by extension (.gz allowed)."""
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".bacr"):
+        return read_binary(path)
+    if name.endswith((".ndjson", ".jsonl")):
+        return read_ndjson(path)
+    if name.endswith(".csv"):
+        return read_csv(path)
+    raise ValueError(f"Unknown replay log format: {path}")
+
+
+class ReplayGame:
+    """Hand source over recorded hands, usable in place of BaccaratGame.
+
+    Shoe boundaries come from the log, so params.penetration is ignored;
+    the run ends when the log is exhausted or params.hands is reached.
+    """
+
+    def __init__(self, hands: Iterable[ReplayHand], decks: int = 8):
+        self._it = iter(hands)
+        self._next: Optional[ReplayHand] = next(self._it, None)
+        self._shoe_cards = int(decks) * 52
+        self._dealt = 0
+        self._hands_in_shoe = 0
+        self._recorded_left: Optional[int] = None
+        self.shoes = 1 if self._next is not None else 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self._next is None
+
+    @property
+    def cards_left(self) -> int:
+        if self._recorded_left is not None:
+            return self._recorded_left
+        return self._shoe_cards - self._dealt
+
+    def needs_shuffle(self, penetration: int) -> bool:
+        return self._next is not None and self._next.new_shoe and self._hands_in_shoe > 0
+
+    def shuffle(self) -> None:
+        self._dealt = 0
+        self._hands_in_shoe = 0
+        self.shoes += 1
+
+    def deal_one_hand(self) -> Dict[str, Any]:
+        h = self._next
+        if h is None:
+            raise RuntimeError("Replay log is exhausted; cannot deal.")
+        self._next = next(self._it, None)
+        pc = list(h.player_cards)
+        bc = list(h.banker_cards)
+        n = len(pc) + len(bc)
+        self._dealt += n
+        self._hands_in_shoe += 1
+        self._recorded_left = h.cards_left
+        return {
+            "player_cards": pc,
+            "banker_cards": bc,
+            "player_total": hand_total(pc) if pc else None,
+            "banker_total": hand_total(bc) if bc else None,
+            "outcome": h.outcome,
+            "cards_dealt": n,
+        }
+
+
+def replay_hands(params: RunParams, source: str, yield_per_hand: bool = True):
+    """simulate_hands over the recorded log at ``source`` instead of generated shoes."""
+    return simulate_hands(params, yield_per_hand=yield_per_hand, game=ReplayGame(read_hands(source), params.decks))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Backtest strategies on recorded shoes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    conv = sub.add_parser("convert", help="把 CSV/NDJSON 记录转换为紧凑二进制 .bacr")
+    conv.add_argument("source")
+    conv.add_argument("dest")
+
+    run = sub.add_parser("run", help="在记录上运行策略")
+    run.add_argument("source")
+    run.add_argument("--bankroll", type=float, required=True)
+    run.add_argument("--bet", type=float, required=True)
+    run.add_argument("--hands", type=int, default=None, help="最多回放的手数（默认整份记录）")
+    run.add_argument("--decks", type=int, default=8, choices=[6, 8])
+    run.add_argument("--strategy", type=str, default="flip-opposite-wait")
+    run.add_argument("--seed", type=int, default=None, help="random 策略的种子")
+    run.add_argument("--loss-progression-pct", type=float, default=0.0)
+    run.add_argument("--loss-progression-dec-pct", type=float, default=0.0)
+    run.add_argument("--loss-progression-start", type=int, default=1)
+    run.add_argument("--loss-progression-win-mode", type=str, default="reset", choices=["reset", "persist", "ignore"])
+    run.add_argument("--win-progression-inc-pct", type=float, default=0.0)
+    run.add_argument("--win-progression-dec-pct", type=float, default=0.0)
+    run.add_argument("--win-progression-start", type=int, default=1)
+    run.add_argument("--win-progression-loss-mode", type=str, default="reset", choices=["reset", "persist", "ignore"])
+    run.add_argument("--csv", dest="csv_path", type=str, default=None, help="逐手报表 CSV（流式写出）")
+    run.add_argument("--json", dest="json_path", type=str, default=None, help="汇总 JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        n = write_binary(read_hands(args.source), args.dest)
+        print(f"Wrote {n} hands to {args.dest}")
+        return
+
+    params = RunParams(
+        bankroll=args.bankroll,
+        bet=args.bet,
+        hands=args.hands if args.hands is not None else sys.maxsize,
+        decks=args.decks,
+        strategy=args.strategy,
+        seed=args.seed,
+        csv_path=args.csv_path,
+        json_path=args.json_path,
+        loss_progression_pct=args.loss_progression_pct,
+        loss_progression_dec_pct=args.loss_progression_dec_pct,
+        loss_progression_start=args.loss_progression_start,
+        loss_progression_win_mode=args.loss_progression_win_mode,
+        win_progression_inc_pct=args.win_progression_inc_pct,
+        win_progression_dec_pct=args.win_progression_dec_pct,
+        win_progression_start=args.win_progression_start,
+        win_progression_loss_mode=args.win_progression_loss_mode,
+    )
+    gen = replay_hands(params, args.source)
+    result: Dict[str, RunSummary] = {}
+
+    def events():
+        result["summary"] = yield from gen
+
+    if args.csv_path:
+        with open(args.csv_path, "w", newline="", encoding="utf-8") as f:
+            write_csv(events(), f, params)
+    else:
+        for _ in events():
+            pass
+    summary = result["summary"]
+    summary.params["hands"] = summary.bet_hands + summary.observe_hands
+    if args.json_path:
+        save_json(summary, args.json_path)
+    print(f"Hands: {summary.params['hands']}; Shoes: {summary.shoe_reshuffles}; Bet hands: {summary.bet_hands}")
+    print(
+        f"Bankroll: start {summary.initial_bankroll:.2f} -> end {summary.final_bankroll:.2f}; "
+        f"Profit: {summary.total_profit:+.2f}; ROI: {summary.roi*100:.3f}%; Max drawdown: {summary.max_drawdown:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+随机数后端 / Pluggable RNG backends
+
+    mt       random.Random（Mersenne Twister），与既有结果逐位一致（默认）
+    pcg64    numpy.random.Generator(PCG64)
+    philox   numpy.random.Generator(Philox)，基于计数器，支持 jumped() 跳跃
+
+牌靴与 random 策略只用到 shuffled / shuffle / choice / random，两类后端都提供这些方法。
+NumPy 后端用一次 permutation + 对象数组索引完成洗牌，并批量预取均匀随机数；
+spawn(n) 派生 n 条统计独立的子流（NumPy 后端基于 SeedSequence.spawn）。
+进程池 worker 使用 spawn_seeds 派生的子 SeedSequence（可 pickle），在 worker 内用
+make_rng / numpy_generator 构造各自的流；两者的 seed 参数都接受整数或 SeedSequence。
+后端名记录在 RunSummary.params["rng"] 中。
+
+向量化引擎（numpy_generator）中 mt 与 pcg64 是同一个 default_rng（PCG64）流。
+"""
+from __future__ import annotations
+
+import random
+from typing import Any, List, Optional, Sequence, TypeVar, Union
+
+
+RNG_BACKENDS = ("mt", "pcg64", "philox")
+DEFAULT_RNG = "mt"
+# NumPy 后端每次预取的均匀随机数个数
+_RANDOM_BATCH = 1024
+
+T = TypeVar("T")
+
+
+class MTRandom(random.Random):
+    """random.Random with the backend interface; same stream as random.Random(seed)."""
+
+    name = "mt"
+
+    def shuffled(self, items: Sequence[T]) -> List[T]:
+        out = list(items)
+        self.shuffle(out)
+        return out
+
+    def spawn(self, n: int) -> List["MTRandom"]:
+        # MT 没有跳跃功能：子流种子取自本流的 128 位输出
+        return [MTRandom(self.getrandbits(128)) for _ in range(int(n))]
+
+
+class NumPyRandom:
+    """Backend on a NumPy Generator (PCG64 or Philox)."""
+
+    def __init__(self, name: str = "pcg64", seed: Any = None, seed_seq: Any = None, bit_generator: Any = None):
+        import numpy as np
+
+        if name not in ("pcg64", "philox"):
+            raise ValueError(f"Unknown NumPy RNG backend: {name}")
+        self.name = name
+        self._np = np
+        if bit_generator is None:
+            if seed_seq is None:
+                seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+            self._seq = seed_seq
+            cls = np.random.PCG64 if name == "pcg64" else np.random.Philox
+            bit_generator = cls(self._seq)
+        else:
+            self._seq = bit_generator.seed_seq
+        self.generator = np.random.Generator(bit_generator)
+        self._uniform: List[float] = []
+        self._items: Optional[Sequence[Any]] = None
+        self._items_array = None
+
+    def shuffled(self, items: Sequence[T]) -> List[T]:
+        # 同一个模板（如整副牌靴）反复洗牌时复用其对象数组
+        if items is not self._items:
+            arr = self._np.empty(len(items), dtype=object)
+            arr[:] = items
+            self._items, self._items_array = items, arr
+        return self._items_array[self.generator.permutation(len(items))].tolist()
+
+    def shuffle(self, x: List[Any]) -> None:
+        x[:] = self.shuffled(tuple(x))
+
+    def random(self) -> float:
+        if not self._uniform:
+            self._uniform = self.generator.random(_RANDOM_BATCH).tolist()
+            self._uniform.reverse()
+        return self._uniform.pop()
+
+    def choice(self, seq: Sequence[T]) -> T:
+        return seq[int(self.random() * len(seq))]
+
+    def spawn(self, n: int) -> List["NumPyRandom"]:
+        return [NumPyRandom(self.name, seed_seq=s) for s in self._seq.spawn(int(n))]
+
+    def jumped(self, jumps: int = 1) -> "NumPyRandom":
+        """Independent stream that starts ``jumps`` * 2**127 (PCG64) / 2**128 (Philox) draws ahead."""
+        return NumPyRandom(self.name, bit_generator=self.generator.bit_generator.jumped(jumps))
+
+
+RNG = Union[random.Random, MTRandom, NumPyRandom]
+
+
+def make_rng(name: str = DEFAULT_RNG, seed: Any = None) -> RNG:
+    """RNG backend ``name`` seeded with ``seed`` (int, None or a numpy SeedSequence)."""
+    name = (name or DEFAULT_RNG).lower()
+    if name == "mt":
+        if hasattr(seed, "generate_state"):
+            # SeedSequence：取 128 位熵作为 MT 的种子
+            seed = int.from_bytes(seed.generate_state(4).tobytes(), "little")
+        return MTRandom(seed)
+    if name in ("pcg64", "philox"):
+        return NumPyRandom(name, seed)
+    raise ValueError(f"Unknown RNG backend: {name}")
+
+
+def spawn_seeds(seed: Any, n: int) -> List[Any]:
+    """``n`` independent child SeedSequences of ``seed``; picklable, so they can be sent to worker processes.
+
+    Child i equals SeedSequence(entropy, spawn_key=(i,)), so it does not depend
+    on which other children are used (e.g. when resuming part of a batch).
+    """
+    import numpy as np
+
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return root.spawn(int(n))
+
+
+def spawn_rngs(name: str, seed: Any, n: int) -> List[RNG]:
+    """``n`` statistically independent streams derived from one seed (e.g. one per worker)."""
+    return [make_rng(name, s) for s in spawn_seeds(seed, n)]
+
+
+def numpy_generator(name: str = DEFAULT_RNG, seed: Any = None):
+    """numpy Generator for the vectorized engines (seed: int, None or SeedSequence).
+
+    mt has no vectorized counterpart and maps to the same default PCG64 stream as pcg64.
+    """
+    import numpy as np
+
+    name = (name or DEFAULT_RNG).lower()
+    if name in ("mt", "pcg64"):
+        return np.random.default_rng(seed)
+    if name == "philox":
+        return np.random.Generator(np.random.Philox(seed))
+    raise ValueError(f"Unknown RNG backend: {name}")
@@ -0,0 +1,180 @@
+"""
+按目标精度提前停止 / Sequential simulation to a target confidence interval
+
+调用方给出目标精度（例如 ROI ±0.05%，95% 置信），模拟按批推进，批均值法
+（batch means）在线估计比率指标及其方差，精度达标即停止；params.hands 作为上限。
+
+- 比率指标：roi = Σ盈亏 / Σ下注额，hit_rate = 赢局数 / 分胜负的下注局数；
+- 进阶注码与策略状态使相邻局相关，按批汇总吸收短程自相关；批数达到 2 × max_batches
+  时相邻两批合并、批大小翻倍，使批大小随样本量增长（固定批数方案）；
+- 批统计量用 Welford 单遍算法求均值/方差/协方差，再以 delta 方法得到比率的标准误；
+- 区间（estimate ± half_width）只覆盖已完成的批，即前 batch_hands = 批数 × 批大小 局；
+  未满一批的尾部局数只计入 run_estimate（全部局数上的比率，与 RunSummary 一致）。
+  精度达标时恰好停在批边界，两者相同；达到 hands 上限时可能不同。
+"""
+from __future__ import annotations
+
+import math
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+from baccarat_core import HandEvent, RunParams, RunSummary, simulate_hands
+
+
+METRICS = ("roi", "hit_rate")
+
+
+def _welford(pairs: List[Tuple[float, float]]) -> Tuple[int, float, float, float, float, float]:
+    """One-pass (n, mean_x, mean_y, var_x, var_y, cov_xy) of (x, y) pairs."""
+    n = 0
+    mx = my = 0.0
+    sxx = syy = sxy = 0.0
+    for x, y in pairs:
+        n += 1
+        dx = x - mx
+        mx += dx / n
+        dy = y - my
+        my += dy / n
+        sxx += dx * (x - mx)
+        syy += dy * (y - my)
+        sxy += dx * (y - my)
+    if n < 2:
+        return n, mx, my, 0.0, 0.0, 0.0
+    return n, mx, my, sxx / (n - 1), syy / (n - 1), sxy / (n - 1)
+
+
+class BatchMeansEstimator:
+    """Ratio estimate sum(x) / sum(y) with a batch-means confidence interval.
+
+    ``update`` returns True once at least ``min_batches`` batches are complete
+    and the half-width at ``confidence`` is at most ``target_half_width``.
+    """
+
+    def __init__(
+        self,
+        metric: str = "roi",
+        target_half_width: Optional[float] = None,
+        confidence: float = 0.95,
+        batch_size: int = 500,
+        max_batches: int = 32,
+        min_batches: int = 10,
+    ):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        self.metric = metric
+        self.target_half_width = target_half_width
+        self.confidence = float(confidence)
+        self.z = NormalDist().inv_cdf(0.5 + self.confidence / 2.0)
+        self.batch_size = max(1, int(batch_size))
+        self.max_batches = max(2, int(max_batches))
+        self.min_batches = max(2, int(min_batches))
+        self.hands = 0
+        self.batches: List[Tuple[float, float]] = []
+        self._bx = 0.0
+        self._by = 0.0
+        self._bn = 0
+
+    def _terms(self, e: HandEvent) -> Tuple[float, float]:
+        if self.metric == "roi":
+            return e.win_amount, e.bet_amount
+        decided = bool(e.bet_side) and e.outcome != "tie"
+        return (1.0 if decided and e.bet_side == e.outcome else 0.0), (1.0 if decided else 0.0)
+
+    def update(self, e: HandEvent) -> bool:
+        x, y = self._terms(e)
+        self.hands += 1
+        self._bx += x
+        self._by += y
+        self._bn += 1
+        if self._bn < self.batch_size:
+            return False
+        self.batches.append((self._bx, self._by))
+        self._bx = self._by = 0.0
+        self._bn = 0
+        if len(self.batches) >= 2 * self.max_batches:
+            it = iter(self.batches)
+            self.batches = [(a[0] + b[0], a[1] + b[1]) for a, b in zip(it, it)]
+            self.batch_size *= 2
+        return self.target_met()
+
+    def interval(self) -> Tuple[Optional[float], Optional[float]]:
+        """(estimate, half-width) over the completed batches; None when undefined."""
+        n, mx, my, vx, vy, cxy = _welford(self.batches)
+        if n < 2 or my <= 0:
+            return None, None
+        r = mx / my
+        var_r = max(0.0, vx - 2.0 * r * cxy + r * r * vy) / (n * my * my)
+        return r, self.z * math.sqrt(var_r)
+
+    def lag1_autocorrelation(self) -> Optional[float]:
+        """Lag-1 autocorrelation of batch ratios; near zero when batches are long enough."""
+        ratios = [x / y for x, y in self.batches if y > 0]
+        if len(ratios) < 3:
+            return None
+        m = sum(ratios) / len(ratios)
+        den = sum((r - m) ** 2 for r in ratios)
+        if den == 0:
+            return None
+        return sum((a - m) * (b - m) for a, b in zip(ratios, ratios[1:])) / den
+
+    def target_met(self) -> bool:
+        if self.target_half_width is None or len(self.batches) < self.min_batches:
+            return False
+        _r, half = self.interval()
+        return half is not None and half <= self.target_half_width
+
+    def run_estimate(self) -> Optional[float]:
+        """Ratio over every hand seen, including the incomplete final batch."""
+        x = sum(b[0] for b in self.batches) + self._bx
+        y = sum(b[1] for b in self.batches) + self._by
+        return x / y if y > 0 else None
+
+    def report(self) -> Dict[str, Any]:
+        est, half = self.interval()
+        return {
+            "metric": self.metric,
+            # 批均值估计与区间只覆盖前 batch_hands 局（已完成的批）
+            "estimate": est,
+            "half_width": half,
+            "batch_hands": len(self.batches) * self.batch_size,
+            "run_estimate": self.run_estimate(),
+            "target_half_width": self.target_half_width,
+            "confidence": self.confidence,
+            "met": self.target_met(),
+            "hands_used": self.hands,
+            "batches": len(self.batches),
+            "batch_size": self.batch_size,
+            "lag1_autocorr": self.lag1_autocorrelation(),
+        }
+
+
+def simulate_to_precision(
+    params: RunParams,
+    target_half_width: float,
+    metric: str = "roi",
+    confidence: float = 0.95,
+    batch_size: int = 500,
+    min_batches: int = 10,
+    max_batches: int = 32,
+    keep_events: bool = True,
+    phase_timing: Optional[bool] = None,
+) -> Tuple[List[HandEvent], RunSummary]:
+    """Simulate until ``metric`` is known to ±target_half_width, or ``params.hands`` hands.
+
+    Returns (events, summary); summary.stopping holds the estimate, the
+    half-width reached, whether the target was met and the hands used.
+    With keep_events=False the events list stays empty (summary-only runs);
+    phase_timing is passed to simulate_hands (fills summary.timing).
+    """
+    est = BatchMeansEstimator(metric, target_half_width, confidence, batch_size, max_batches, min_batches)
+    events: List[HandEvent] = []
+    gen = simulate_hands(params, yield_per_hand=True, should_stop=est.update, phase_timing=phase_timing)
+    try:
+        while True:
+            ev = next(gen)
+            if keep_events:
+                events.append(ev)
+    except StopIteration as stop:
+        summary = stop.value
+    summary.stopping = est.report()
+    return events, summary
@@ -5,6 +5,9 @@
 运行示例（建议加 --silent 以提速）：
     python baccarat_sim.py --bankroll 100000 --bet 100 --hands 50000 --decks 8 --seed 42 --csv ./out/report.csv --silent
 
+参数网格批量运行（清单为 JSON/YAML，可中断后续跑）：
+    python baccarat_sim.py sweep manifest.yaml --out ./out/sweep.parquet --workers 8
+
 本脚本作为命令行入口，核心逻辑在 baccarat_core.py 中实现。
 """
 import os
@@ -20,6 +23,11 @@ from baccarat_core import (
     save_csv,
     save_json,
 )
+from baccarat_sequential import METRICS as TARGET_METRICS, simulate_to_precision
+from baccarat_sweep import SWEEP_FORMATS, expand_manifest, load_manifest, run_sweep
+import baccarat_store
+from baccarat_profile import PROFILE_MODES, profile_call
+from baccarat_rng import DEFAULT_RNG, RNG_BACKENDS
 
 
 
@@ -29,7 +37,9 @@ def print_summary(stats: Dict[str, Any], csv_path: str, json_path: str) -> None:
 
     print("\n===== Simulation Summary =====")
     print(f"Strategy: {stats['strategy']}; Bet: {stats['bet_size']}; Decks: {stats['decks']}; Penetration: {stats['penetration']}")
-    print(f"Hands: {stats['hands']}; Bet hands: {stats['bet_hands']}; Observe: {stats['observe_hands']}; Pushes: {stats['push_hands']}")
+    played = stats.get("hands_played", stats["hands"])
+    hands_s = f"{played}" if played == stats["hands"] else f"{played} (cap {stats['hands']})"
+    print(f"Hands: {hands_s}; Bet hands: {stats['bet_hands']}; Observe: {stats['observe_hands']}; Pushes: {stats['push_hands']}")
     print(
         f"Player/Banker/Tie: {stats['player_wins']}/{stats['banker_wins']}/{stats['ties']} "
         f"({pct(stats['outcome_distribution']['player']['pct'])}/"
@@ -43,12 +53,41 @@ def print_summary(stats: Dict[str, Any], csv_path: str, json_path: str) -> None:
         f"Bankroll: start {stats['initial_bankroll']:.2f} -> end {stats['final_bankroll']:.2f}; "
         f"Profit: {stats['total_profit']:+.2f}; ROI: {stats['roi']*100:.3f}%"
     )
+    sharpe = stats.get("sharpe_ratio")
+    print(
+        f"Peak/Trough: {stats['peak_bankroll']:.2f}/{stats['trough_bankroll']:.2f}; "
+        f"Max drawdown: {stats['max_drawdown']:.2f} ({pct(stats['max_drawdown_pct'])}, {stats['max_drawdown_duration']} hands)"
+    )
+    print(
+        f"Volatility/hand: {stats['pnl_volatility']:.2f}; "
+        f"Sharpe/hand: {f'{sharpe:.4f}' if sharpe is not None else 'N/A'}; "
+        f"Longest loss streak: {stats['longest_loss_streak']}"
+    )
     print(f"Avg cards/hand: {stats['avg_cards_per_hand']:.3f}; Cards dealt total: {stats['cards_dealt_total']}")
     print(f"Shoe reshuffles: {stats['shoe_reshuffles']}")
+    timing = stats.get("timing")
+    if timing:
+        rate = lambda v: "N/A" if v is None else f"{v:,.1f}"  # noqa: E731
+        print(
+            f"Wall time: {timing['wall_seconds']:.3f}s; Hands/sec: {rate(timing['hands_per_sec'])}; "
+            f"Shuffles/sec: {rate(timing['shuffles_per_sec'])}"
+        )
+        for name, ph in timing["phases"].items():
+            per_call = "-" if ph["us_per_call"] is None else f"{ph['us_per_call']:.2f}µs"
+            share = "-" if ph["pct"] is None else f"{ph['pct']*100:.1f}%"
+            print(f"  {name:<10} {ph['seconds']:.4f}s {share:>6} calls={ph['calls']} per-call={per_call}")
     print(f"CSV: {csv_path}")
     print(f"JSON: {json_path}")
 
 
+def _print_event(ev) -> None:
+    print(
+        f"#{ev.hand_no} {ev.timestamp} bet={ev.bet_side or '-'} amt={ev.bet_amount:.2f} "
+        f"P={ev.player_cards}({ev.player_total}) B={ev.banker_cards}({ev.banker_total}) -> {ev.outcome} "
+        f"win={ev.win_amount:+.2f} bank={ev.bankroll_after:.2f} left={ev.shoe_cards_left} comm={ev.commission_paid:.2f}"
+    )
+
+
 def _ensure_parent_dir(path: str) -> None:
     parent = os.path.dirname(os.path.abspath(path))
     if parent and not os.path.exists(parent):
@@ -80,9 +119,47 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
         help="下注策略",
     )
     parser.add_argument("--seed", type=int, default=None, help="随机种子（可选）")
+    parser.add_argument(
+        "--rng",
+        type=str,
+        default=DEFAULT_RNG,
+        choices=list(RNG_BACKENDS),
+        help="随机数后端：mt 与历史结果逐位一致；pcg64 / philox（NumPy）洗牌更快。"
+        "向量化引擎没有 MT 实现，其中 mt 与 pcg64 使用同一个 default_rng（PCG64）流",
+    )
     parser.add_argument("--csv", dest="csv_path", type=str, default=None, help="CSV 报表输出路径")
     parser.add_argument("--json", dest="json_path", type=str, default=None, help="JSON 汇总输出路径")
     parser.add_argument("--silent", action="store_true", help="仅保存报表与汇总，不在控制台打印每局")
+    parser.add_argument(
+        "--target-half-width",
+        type=float,
+        default=None,
+        help="目标置信区间半宽（如 ROI ±0.5%% 填 0.005）；达到即停止，--hands 作为上限",
+    )
+    parser.add_argument("--target-metric", type=str, default="roi", choices=list(TARGET_METRICS), help="提前停止所依据的指标")
+    parser.add_argument("--confidence", type=float, default=0.95, help="置信水平（默认0.95）")
+    parser.add_argument(
+        "--db",
+        type=str,
+        default=os.environ.get("BACCARAT_DB"),
+        help="同时写入 SQLite 结果仓库（默认取环境变量 BACCARAT_DB）",
+    )
+    parser.add_argument("--db-hands", action="store_true", help="在结果仓库中同时保存逐局数据（列式压缩）")
+    parser.add_argument("--label", type=str, default=None, help="结果仓库中该次运行的标签")
+    parser.add_argument(
+        "--phase-timing",
+        action="store_true",
+        default=None,
+        help="统计各阶段耗时（洗牌/决策/注码/发牌/结算/事件/消费）与吞吐量；也可设 BACCARAT_PHASE_TIMING=1",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        choices=list(PROFILE_MODES),
+        help="剖析本次运行：cpu 写出 pstats 与 collapsed 调用栈；mem 报告峰值、分配位置与 HandEvent/Card/list 对象",
+    )
+    parser.add_argument("--profile-out", type=str, default=None, help="剖析输出文件前缀（默认 out/baccarat_profile_<时间>_<模式>）")
     parser.add_argument("--run-tests", action="store_true", help="运行内置单元测试并退出")
 
     args = parser.parse_args(argv)
@@ -107,9 +184,116 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
         parser.error("--bet 和 --bankroll 必须为正数")
     if args.penetration < 1:
         parser.error("--penetration 必须为正整数")
+    if args.target_half_width is not None and args.target_half_width <= 0:
+        parser.error("--target-half-width 必须为正数")
+    if not (0 < args.confidence < 1):
+        parser.error("--confidence 必须在 0 和 1 之间")
     return args
 
 
+def parse_sweep_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="baccarat_sim.py sweep", description="Run a grid of RunParams from a manifest")
+    parser.add_argument("manifest", type=str, help="JSON/YAML 清单（base / grid / cells）")
+    parser.add_argument("--out", dest="out_path", type=str, required=True, help="汇总表输出路径（.csv 或 .parquet）")
+    parser.add_argument("--format", dest="fmt", type=str, default=None, choices=list(SWEEP_FORMATS), help="默认按扩展名判断")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数（默认 CPU 数，1 为单进程）")
+    parser.add_argument("--seed", type=int, default=None, help="未指定 seed 的组合所用独立子流的根种子（可复现）")
+    parser.add_argument("--silent", action="store_true", help="不打印每个组合的进度")
+    return parser.parse_args(argv)
+
+
+def sweep_main(argv: Optional[List[str]] = None) -> None:
+    args = parse_sweep_args(argv)
+    try:
+        cells = expand_manifest(load_manifest(args.manifest))
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Invalid manifest: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    def on_row(done: int, total: int, row: Dict[str, Any]) -> None:
+        if not args.silent:
+            print(
+                f"[{done}/{total}] {row['cell_id']} {row['strategy']} decks={row['decks']} pen={row['penetration']} "
+                f"seed={row['seed']} -> final={row['final_bankroll']:.2f} roi={row['roi']*100:.3f}%"
+            )
+
+    try:
+        result = run_sweep(cells, args.out_path, fmt=args.fmt, workers=args.workers, on_row=on_row, seed=args.seed)
+    except ValueError as e:
+        print(f"Sweep failed: {e}", file=sys.stderr)
+        sys.exit(2)
+    print(f"Cells: {result.total}; ran: {result.ran}; resumed: {result.skipped}")
+    print(f"Table: {result.out_path}")
+    print(f"Journal: {result.journal_path}")
+
+
+def parse_query_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="baccarat_sim.py query", description="Query the SQLite results warehouse")
+    parser.add_argument("--db", type=str, default=os.environ.get("BACCARAT_DB") or baccarat_store.DEFAULT_DB_PATH)
+    parser.add_argument("--where", action="append", default=[], help="过滤条件，可重复，如 strategy=always-banker、roi>0")
+    parser.add_argument("--since", type=str, default=None, help="只看该时间之后的运行（如 2026-09-01）")
+    parser.add_argument("--group-by", type=str, default=None, help="按列分组对比，逗号分隔，如 strategy,decks")
+    parser.add_argument("--metric", type=str, default="roi", help="分组对比的指标列（默认 roi）")
+    parser.add_argument("--order-by", type=str, default="run_id", help="排序列（默认 run_id；分组时按均值）")
+    parser.add_argument("--asc", action="store_true", help="升序（默认降序）")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--columns", type=str, default="run_id,created_at,strategy,bet_size,decks,penetration,hands,final_bankroll,roi,max_drawdown,sharpe_ratio")
+    parser.add_argument("--json", dest="as_json", action="store_true", help="以 JSON 输出")
+    return parser.parse_args(argv)
+
+
+def _print_rows(rows: List[Dict[str, Any]], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    if not rows:
+        print("(no runs)")
+        return
+    keys = list(rows[0].keys())
+    print("\t".join(keys))
+    for row in rows:
+        print("\t".join("" if row[k] is None else f"{row[k]:.6g}" if isinstance(row[k], float) else str(row[k]) for k in keys))
+
+
+def query_main(argv: Optional[List[str]] = None) -> None:
+    args = parse_query_args(argv)
+    conn = baccarat_store.connect(args.db)
+    try:
+        filters = baccarat_store.parse_filters(args.where)
+        if args.since:
+            filters.append(("created_at", ">=", args.since))
+        if args.group_by:
+            rows = baccarat_store.compare_runs(
+                conn, [c.strip() for c in args.group_by.split(",") if c.strip()], args.metric,
+                filters=filters, descending=not args.asc, limit=args.limit,
+            )
+        else:
+            rows = baccarat_store.query_runs(
+                conn, filters, order_by=args.order_by, descending=not args.asc, limit=args.limit,
+                columns=[c.strip() for c in args.columns.split(",") if c.strip()],
+            )
+    except ValueError as e:
+        print(f"Invalid query: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        conn.close()
+    _print_rows(rows, args.as_json)
+
+
+def import_main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="baccarat_sim.py import", description="Load existing summary JSON files into the results warehouse")
+    parser.add_argument("paths", nargs="+", help="baccarat_summary_*.json 文件")
+    parser.add_argument("--db", type=str, default=os.environ.get("BACCARAT_DB") or baccarat_store.DEFAULT_DB_PATH)
+    parser.add_argument("--hands", action="store_true", help="同时导入对应的逐局报表 CSV")
+    args = parser.parse_args(argv)
+    conn = baccarat_store.connect(args.db)
+    try:
+        n = baccarat_store.import_files(conn, args.paths, with_hands=args.hands)
+    finally:
+        conn.close()
+    print(f"Imported {n} run(s) into {args.db} ({len(args.paths) - n} skipped)")
+
+
 # ----------------------
 # Unit tests (embedded) import from core
 # ----------------------
@@ -176,7 +360,811 @@ class TestBankerRules(unittest.TestCase):
         self.assertEqual(len(events), 5)
 
 
+class TestEventHistory(unittest.TestCase):
+    def test_spill_roundtrip(self):
+        from baccarat_core import simulate_hands
+        from baccarat_history import EventHistory
+        params = RunParams(bankroll=1000, bet=10, hands=1200, strategy="alternate", seed=5)
+        events, _ = simulate_hands(params, yield_per_hand=False)
+        hist = EventHistory(ring_size=100, chunk_size=250)
+        try:
+            for ev in events:
+                hist.append(ev)
+            self.assertEqual(len(hist), 1200)
+            self.assertLessEqual(hist.memory_events, 350)
+            self.assertEqual(list(hist), events)
+            self.assertEqual(hist.page(240, 520), events[240:520])
+            self.assertEqual(hist.stats.ties, sum(1 for e in events if e.outcome == "tie"))
+        finally:
+            hist.close()
+
+    def test_eviction_defers_close_to_owner(self):
+        from collections import Counter
+        from baccarat_history import PNL_COUNT_LIMIT, SessionRegistry, _pnl_key
+        registry = SessionRegistry(max_sessions=1)
+        a = registry.get("a")
+        a.gen = simulate_hands(RunParams(bankroll=1000, bet=10, hands=50, seed=1), yield_per_hand=True)
+        a.history.append(next(a.gen))
+        registry.get("b")
+        # 其他用户的请求只摘除会话，不关闭仍可能在播放的生成器
+        self.assertIsNotNone(a.gen)
+        a.history.append(next(a.gen))
+        fresh = registry.get("a")
+        self.assertIsNot(fresh, a)
+        self.assertTrue(fresh.replaced_evicted)
+        self.assertIsNone(a.gen)
+        # 进阶注码下盈亏取值很多：超出上限后按近似桶计数，取值种类有界
+        counts: Counter = Counter()
+        for i in range(3 * PNL_COUNT_LIMIT):
+            counts[_pnl_key(counts, 10.0 + i * 0.37)] += 1
+        self.assertLess(len(counts), 2 * PNL_COUNT_LIMIT)
+        self.assertEqual(sum(counts.values()), 3 * PNL_COUNT_LIMIT)
+
+
+class TestAsyncSimulation(unittest.TestCase):
+    def test_matches_sync_generator(self):
+        import asyncio
+        from baccarat_core import asimulate_hands, simulate_hands
+        params = RunParams(bankroll=1000, bet=10, hands=700, strategy="flip-opposite-wait", seed=11)
+        events, summary = simulate_hands(params, yield_per_hand=False)
+        for use_executor in (True, False):
+            sim = asimulate_hands(params, batch=64, use_executor=use_executor, prefetch=use_executor)
+            a_events, a_summary = asyncio.run(sim.run())
+            self.assertEqual([e.bankroll_after for e in a_events], [e.bankroll_after for e in events])
+            self.assertEqual(a_summary.final_bankroll, summary.final_bankroll)
+
+
+class TestVectorEngine(unittest.TestCase):
+    def test_matches_core_on_same_shoes(self):
+        import random
+        import numpy as np
+        from baccarat_core import Shoe, simulate_hands
+        from baccarat_vector import simulate_sessions
+
+        params = RunParams(bankroll=2000, bet=50, hands=800, strategy="flip-opposite-wait", seed=3,
+                           loss_progression_pct=40, loss_progression_start=2, loss_progression_win_mode="persist")
+        _, summary = simulate_hands(params, yield_per_hand=False)
+
+        shoe = Shoe(decks=params.decks, rng=random.Random(params.seed))
+        first = [True]
+
+        def reference_shoes(indices):
+            if not first[0]:
+                shoe.reset()
+            first[0] = False
+            return np.array([[c.point for c in reversed(shoe.cards)]], dtype=np.int8)
+
+        res = simulate_sessions(params, sessions=1, shoe_factory=reference_shoes)
+        self.assertEqual(res.final_bankroll[0], summary.final_bankroll)
+        self.assertEqual(res.total_wagered[0], summary.total_wagered)
+        self.assertEqual(res.wins[0], summary.wins)
+        self.assertEqual(res.shoe_reshuffles[0], summary.shoe_reshuffles)
+
+
+class TestMarkovRisk(unittest.TestCase):
+    def test_exact_probabilities_8_decks(self):
+        from baccarat_core import outcome_probabilities
+        probs = outcome_probabilities(8)
+        self.assertAlmostEqual(probs["banker"], 0.458597, places=6)
+        self.assertAlmostEqual(probs["player"], 0.446247, places=6)
+        self.assertAlmostEqual(sum(probs.values()), 1.0, places=9)
+
+    def test_single_hand_all_in(self):
+        from baccarat_core import outcome_probabilities
+        from baccarat_markov import risk_of_ruin
+        probs = outcome_probabilities(8)
+        res = risk_of_ruin(RunParams(bankroll=100, bet=100, hands=1, strategy="always-banker"))
+        self.assertAlmostEqual(res.ruin_probability, probs["player"], places=12)
+        self.assertAlmostEqual(res.expected_final_bankroll, 100 + 95 * probs["banker"] - 100 * probs["player"], places=9)
+        self.assertAlmostEqual(res.expected_turnover, 100.0, places=9)
+
+
+class TestOptimizer(unittest.TestCase):
+    def test_successive_halving_ranks_and_prunes(self):
+        from baccarat_optimize import successive_halving
+        base = RunParams(bankroll=5000, bet=100, hands=200, strategy="always-banker")
+        space = {"loss_progression_pct": [0.0, 50.0, 100.0], "loss_progression_win_mode": ["reset", "persist"]}
+        res = successive_halving(base, space, min_sessions=20, eta=2, seed=7)
+        self.assertEqual(len(res.ranked), 6)
+        self.assertEqual(res.best.rung, res.rungs - 1)
+        self.assertEqual(res.best.sessions, 20 * 2 ** (res.rungs - 1))
+        self.assertTrue(all(c.sessions == 20 for c in res.ranked[-3:]))
+        for c in res.ranked:
+            self.assertLessEqual(c.ci_low, c.estimate)
+            self.assertLessEqual(c.estimate, c.ci_high)
+        self.assertEqual(res.total_sessions, sum(c.sessions for c in res.ranked))
+
+    def test_common_random_numbers(self):
+        from baccarat_optimize import successive_halving
+        base = RunParams(bankroll=5000, bet=100, hands=200, strategy="always-banker")
+        # 进阶比例为 0 时模式不影响注码，两个候选在相同牌靴下结果应完全一致
+        res = successive_halving(base, {"loss_progression_win_mode": ["reset", "persist"]}, min_sessions=16, max_rungs=1)
+        a, b = res.ranked
+        self.assertTrue((a.final_bankroll == b.final_bankroll).all())
+
+
+    def test_parse_space_rejects_unknown_fields(self):
+        from baccarat_optimize import main as optimize_main, parse_space
+        self.assertEqual(parse_space(["loss-progression-pct=0,50"]), {"loss_progression_pct": [0.0, 50.0]})
+        for bad in ("loss_progresion_pct=0,50", "seed=1,2", "loss_progression_start=a,b"):
+            with self.assertRaises(ValueError):
+                parse_space([bad])
+        import contextlib
+        import io
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()) as err:
+            optimize_main(["--bankroll", "1000", "--bet", "10", "--hands", "10", "--space", "bogus=1,2"])
+        self.assertIn("Cannot search over field: bogus", err.getvalue())
+
+
+class TestSequential(unittest.TestCase):
+    def test_stops_once_target_met(self):
+        from baccarat_sequential import simulate_to_precision
+        params = RunParams(bankroll=1e9, bet=100, hands=100000, strategy="always-banker", seed=3)
+        events, summary = simulate_to_precision(params, 0.02, batch_size=200)
+        stop = summary.stopping
+        self.assertTrue(stop["met"])
+        self.assertLessEqual(stop["half_width"], 0.02)
+        self.assertEqual(stop["hands_used"], len(events))
+        self.assertLess(len(events), params.hands)
+        self.assertEqual(summary.bet_hands + summary.observe_hands, len(events))
+        self.assertAlmostEqual(stop["estimate"], summary.roi, places=9)
+
+    def test_cap_reached(self):
+        from baccarat_sequential import simulate_to_precision
+        params = RunParams(bankroll=1e9, bet=100, hands=2000, strategy="always-player", seed=4)
+        events, summary = simulate_to_precision(params, 1e-6, metric="hit_rate", batch_size=100)
+        self.assertFalse(summary.stopping["met"])
+        self.assertEqual(len(events), 2000)
+
+    def test_interval_covers_complete_batches_only(self):
+        from baccarat_sequential import simulate_to_precision
+        params = RunParams(bankroll=1e9, bet=100, hands=2150, strategy="always-banker", seed=4)
+        events, summary = simulate_to_precision(params, 1e-6, batch_size=100, max_batches=8)
+        stop = summary.stopping
+        # 批大小翻倍后最后一批未满：区间只覆盖完整的批，run_estimate 覆盖全部局数
+        self.assertLess(stop["batch_hands"], stop["hands_used"])
+        self.assertEqual(stop["batch_hands"] % stop["batch_size"], 0)
+        self.assertAlmostEqual(stop["run_estimate"], summary.roi, places=9)
+
+
+class TestVarianceReduction(unittest.TestCase):
+    def test_antithetic_pairs_are_mirrored(self):
+        import numpy as np
+        from baccarat_variance import MIRROR, AntitheticShoeFactory
+        make = AntitheticShoeFactory(8, np.random.default_rng(1))
+        first = make(np.arange(4))
+        np.testing.assert_array_equal(first[1], MIRROR[first[0]])
+        # 成对会话在不同时间重洗，仍按各自第 k 副牌配对
+        later_odd = make(np.array([3]))
+        later_even = make(np.array([2]))
+        np.testing.assert_array_equal(later_odd[0], MIRROR[later_even[0]])
+        np.testing.assert_array_equal(np.sort(first[0]), np.sort(first[1]))
+
+    def test_compare_reports_reduction(self):
+        from baccarat_variance import compare_configs
+        base = RunParams(bankroll=100000, bet=100, hands=300, strategy="always-banker")
+        res = compare_configs(base, [{"loss_progression_pct": 0.0}, {"loss_progression_pct": 50.0}], sessions=60, metric="total_profit")
+        self.assertEqual(len(res.configs), 2)
+        self.assertEqual(len(res.diffs), 1)
+        d = res.diffs[0]
+        self.assertGreater(d.vrf_crn, 1.0)
+        self.assertLess(d.half_width_crn, d.half_width_independent)
+        self.assertGreater(res.configs[1].vrf_cv, 1.0)
+
+    def test_degenerate_control_variate_falls_back(self):
+        from baccarat_variance import compare_configs
+        base = RunParams(bankroll=100000, bet=100, hands=300, strategy="always-banker")
+        res = compare_configs(base, [{"strategy": "always-banker"}, {"strategy": "always-player"}], sessions=60)
+        # 平注单边：盈亏是控制量的线性函数，回退为朴素 / CRN 估计而不是给出零宽区间
+        for c in res.configs:
+            self.assertTrue(c.cv_degenerate)
+            self.assertEqual((c.mean_cv, c.half_width_cv, c.vrf_cv), (c.mean, c.half_width, None))
+        d = res.diffs[0]
+        self.assertTrue(d.crn_cv_degenerate)
+        self.assertEqual((d.diff_crn_cv, d.half_width_crn_cv), (d.diff, d.half_width_crn))
+
+
+class TestRiskMetrics(unittest.TestCase):
+    def test_streaming_matches_post_hoc(self):
+        import statistics
+        events, s = simulate_hands(
+            RunParams(bankroll=10000, bet=100, hands=2000, seed=5, strategy="alternate", loss_progression_pct=20),
+            yield_per_hand=False,
+        )
+        path = [10000.0] + [e.bankroll_after for e in events]
+        peak, mdd, under, longest = path[0], 0.0, 0, 0
+        for x in path:
+            if x >= peak:
+                peak, under = x, 0
+            else:
+                under += 1
+                mdd = max(mdd, peak - x)
+                longest = max(longest, under)
+        self.assertAlmostEqual(s.max_drawdown, mdd, places=2)
+        self.assertEqual(s.max_drawdown_duration, longest)
+        self.assertEqual(s.peak_bankroll, max(path))
+        self.assertEqual(s.trough_bankroll, min(path))
+        pnl = [e.win_amount for e in events]
+        self.assertAlmostEqual(s.pnl_volatility, statistics.stdev(pnl), places=6)
+        self.assertAlmostEqual(s.sharpe_ratio, statistics.mean(pnl) / statistics.stdev(pnl), places=6)
+        streak = best = 0
+        for e in events:
+            if e.bet_side and e.outcome != "tie":
+                streak = 0 if e.bet_side == e.outcome else streak + 1
+                best = max(best, streak)
+        self.assertEqual(s.longest_loss_streak, best)
+
+
+class TestFanChart(unittest.TestCase):
+    def test_quantiles_close_to_exact(self):
+        import numpy as np
+        from baccarat_fan import FanChart, default_checkpoints
+        from baccarat_vector import simulate_sessions
+        params = RunParams(bankroll=10000, bet=100, hands=200, strategy="alternate", loss_progression_pct=50)
+        points = default_checkpoints(200, 10)
+        a, b = FanChart(points), FanChart(points)
+        # 两批会话分别汇总后合并，对照保存完整轨迹的精确分位数
+        ra = simulate_sessions(params, 300, seed=1, on_hand=a.observe, record_bankroll=True)
+        rb = simulate_sessions(params, 300, seed=2, on_hand=b.observe, record_bankroll=True)
+        merged = a.merge(b)
+        paths = np.concatenate([ra.bankroll_path, rb.bankroll_path], axis=1)
+        for row in merged.table()[1:]:
+            col = paths[row["hand_no"] - 1]
+            self.assertEqual(row["sessions"], 600)
+            self.assertAlmostEqual(row["mean"], col.mean(), places=6)
+            for q in (5, 50, 95):
+                self.assertLessEqual(abs((col <= row[f"p{q}"]).mean() - q / 100), 0.02)
+
+    def test_memory_independent_of_sessions(self):
+        from baccarat_fan import fan_chart
+        params = RunParams(bankroll=10000, bet=100, hands=100, strategy="always-banker", seed=1)
+        small = fan_chart(params, 200, checkpoints=5, chunk_sessions=100)
+        large = fan_chart(params, 2000, checkpoints=5, chunk_sessions=500)
+        self.assertEqual(large.sessions, 2000)
+        self.assertLess(large.nbytes(), 8 * 2 * 6 * 120)
+        self.assertLessEqual(large.nbytes(), 2 * small.nbytes() + 8 * 2 * 6 * 120)
+
+    def test_runs_as_cancellable_background_job(self):
+        import threading
+        from baccarat_fan import fan_chart
+        from baccarat_jobs import JOB_CANCELLED, JOB_DONE, JobLimitExceeded, JobManager
+        params = RunParams(bankroll=10000, bet=100, hands=100, strategy="always-banker", seed=1)
+        manager = JobManager(max_workers=1, per_user_limit=1)
+        seen = []
+
+        def task(progress):
+            return fan_chart(params, 400, checkpoints=5, chunk_sessions=100, progress=lambda n: (seen.append(n), progress(n)))
+
+        job = manager.submit_task("u", params, task, total=400, kind="fan")
+        # 与普通模拟任务共用按用户的并发上限
+        with self.assertRaises(JobLimitExceeded):
+            manager.submit("u", params)
+        self.assertTrue(job.wait(30))
+        self.assertEqual(job.status, JOB_DONE)
+        self.assertEqual(seen, [100, 200, 300, 400])
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(job.result.sessions, 400)
+
+        gate = threading.Event()
+
+        def blocked(progress):
+            gate.wait(10)
+            return fan_chart(params, 400, checkpoints=5, chunk_sessions=100, progress=progress)
+
+        job = manager.submit_task("u", params, blocked, total=400, kind="fan")
+        manager.cancel(job.job_id)
+        gate.set()
+        self.assertTrue(job.wait(30))
+        self.assertEqual(job.status, JOB_CANCELLED)
+        self.assertIsNone(job.result)
+        manager.shutdown()
+
+    def test_finished_jobs_are_retained_per_owner(self):
+        from baccarat_jobs import JobManager
+        manager = JobManager(max_workers=1, per_user_limit=1, keep_finished=1)
+        mine = manager.submit("a", RunParams(bankroll=1000, bet=10, hands=50, seed=1))
+        self.assertTrue(mine.wait(30))
+        for seed in (2, 3):
+            self.assertTrue(manager.submit("b", RunParams(bankroll=1000, bet=10, hands=50, seed=seed)).wait(30))
+        self.assertIs(manager.get(mine.job_id), mine)
+        self.assertEqual(len(manager.list_jobs("b")), 1)
+        manager.shutdown()
+
+    def test_batches_use_spawned_streams(self):
+        from baccarat_fan import fan_chart
+        params = RunParams(bankroll=10000, bet=100, hands=50, strategy="random", seed=4, rng="philox")
+        a = fan_chart(params, 300, checkpoints=5, chunk_sessions=100).table()
+        b = fan_chart(params, 300, checkpoints=5, chunk_sessions=100, workers=2).table()
+        self.assertEqual(a, b)
+
+
+class TestSweep(unittest.TestCase):
+    def test_grid_run_and_resume(self):
+        import csv
+        import tempfile
+        from baccarat_sweep import expand_manifest, journal_path_for, run_sweep
+        manifest = {
+            "base": {"bankroll": 10000, "bet": 100, "hands": 200},
+            "grid": {"strategy": ["always-banker", "alternate"], "seed": [1, 2]},
+            "cells": [{"strategy": "random", "seed": 3}, {"strategy": "alternate", "seed": 1}],
+        }
+        cells = expand_manifest(manifest)
+        self.assertEqual(len(cells), 5)
+        with tempfile.TemporaryDirectory() as d:
+            out = os.path.join(d, "sweep.csv")
+            first = run_sweep(cells[:3], out, workers=1)
+            self.assertEqual((first.ran, first.skipped), (3, 0))
+            # 模拟中断：日志末尾残缺的一行应被忽略
+            with open(journal_path_for(out), "a", encoding="utf-8") as f:
+                f.write('{"cell_id": "trunc')
+            second = run_sweep(cells, out, workers=1)
+            self.assertEqual((second.ran, second.skipped), (2, 3))
+            with open(out, newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 5)
+        _, ref = simulate_hands(cells[0], yield_per_hand=False)
+        self.assertAlmostEqual(float(rows[0]["final_bankroll"]), ref.final_bankroll)
+        self.assertEqual(rows[0]["strategy"], "always-banker")
+
+    def test_resume_reruns_unseeded_cells_when_streams_change(self):
+        import tempfile
+        from baccarat_sweep import run_sweep
+        seeded = RunParams(bankroll=10000, bet=100, hands=50, strategy="random", seed=1)
+        unseeded = RunParams(bankroll=10000, bet=100, hands=50, strategy="random")
+        with tempfile.TemporaryDirectory() as d:
+            out = os.path.join(d, "sweep.csv")
+            self.assertEqual(run_sweep([seeded, unseeded], out, workers=1, seed=7).ran, 2)
+            self.assertEqual(run_sweep([seeded, unseeded], out, workers=1, seed=7).ran, 0)
+            # 换根种子或调整顺序：未指定 seed 的组合换了子流，需要重跑；指定 seed 的组合照常跳过
+            self.assertEqual(run_sweep([seeded, unseeded], out, workers=1, seed=8).ran, 1)
+            self.assertEqual(run_sweep([unseeded, seeded], out, workers=1, seed=7).ran, 1)
+
+    def test_parquet_without_pyarrow_fails_before_running(self):
+        import tempfile
+        from unittest import mock
+        from baccarat_sweep import journal_path_for, run_sweep
+        cells = [RunParams(bankroll=10000, bet=100, hands=50, seed=1)]
+        with tempfile.TemporaryDirectory() as d, mock.patch.dict(sys.modules, {"pyarrow": None}):
+            out = os.path.join(d, "sweep.parquet")
+            with self.assertRaisesRegex(ValueError, "pyarrow"):
+                run_sweep(cells, out, workers=1)
+            self.assertFalse(os.path.exists(journal_path_for(out)))
+
+
+class TestResultsStore(unittest.TestCase):
+    def test_record_query_and_hand_columns(self):
+        import tempfile
+        from baccarat_store import compare_runs, connect, import_files, load_events, load_hand_columns, parse_filters, query_runs, record_runs
+        runs = []
+        for strategy in ("always-banker", "alternate"):
+            for seed in (1, 2, 3):
+                runs.append(simulate_hands(RunParams(bankroll=10000, bet=100, hands=300, strategy=strategy, seed=seed), yield_per_hand=False))
+        with tempfile.TemporaryDirectory() as d:
+            conn = connect(os.path.join(d, "results.sqlite"))
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            ids = record_runs(conn, [(s, ev if i == 0 else None) for i, (ev, s) in enumerate(runs)])
+            self.assertEqual(ids, list(range(1, 7)))
+            best = query_runs(conn, parse_filters(["strategy=alternate"]), order_by="final_bankroll", limit=1)
+            self.assertEqual(best[0]["final_bankroll"], max(s.final_bankroll for _, s in runs[3:]))
+            groups = {g["strategy"]: g for g in compare_runs(conn, ["strategy"], "total_profit")}
+            self.assertEqual(groups["always-banker"]["runs"], 3)
+            self.assertAlmostEqual(groups["alternate"]["mean"], sum(s.total_profit for _, s in runs[3:]) / 3)
+            # 逐局列往返
+            self.assertEqual(load_events(conn, ids[0]), runs[0][0])
+            self.assertEqual(list(load_hand_columns(conn, ids[0], ["bankroll_after"])), ["bankroll_after"])
+            self.assertEqual(load_events(conn, ids[1]), [])
+            with self.assertRaises(ValueError):
+                parse_filters(["roi; DROP TABLE runs"])
+            # 导入旧的 JSON 汇总，重复导入会跳过
+            path = os.path.join(d, "baccarat_summary_x.json")
+            save_json(runs[0][1], path)
+            self.assertEqual(import_files(conn, [path]), 1)
+            self.assertEqual(import_files(conn, [path]), 0)
+            conn.close()
+
+    def test_rng_column_and_v1_migration(self):
+        import sqlite3
+        import tempfile
+        from baccarat_store import SCHEMA_VERSION, connect, parse_filters, query_runs, record_runs
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "results.sqlite")
+            conn = connect(path)
+            for rng in ("mt", "pcg64"):
+                _, summary = simulate_hands(RunParams(bankroll=10000, bet=100, hands=50, seed=1, rng=rng), yield_per_hand=False)
+                record_runs(conn, [(summary, None)])
+            self.assertEqual([r["rng"] for r in query_runs(conn, parse_filters(["rng=pcg64"]))], ["pcg64"])
+            conn.close()
+            # 还原成 v1 结构（无 rng 列，汇总里也没有 rng），重新打开时应迁移并回填 mt
+            raw = sqlite3.connect(path)
+            raw.execute("ALTER TABLE runs DROP COLUMN rng")
+            raw.execute("UPDATE runs SET summary_json = json_remove(summary_json, '$.params.rng') WHERE run_id = 1")
+            raw.execute("PRAGMA user_version = 1")
+            raw.commit()
+            raw.close()
+            conn = connect(path)
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+            self.assertEqual([r["rng"] for r in query_runs(conn, [], order_by="run_id", descending=False)], ["mt", "pcg64"])
+            conn.close()
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_run_benchmark_reports_rates_latency_and_memory(self):
+        from baccarat_bench import _bench_simulate, default_suite, run_benchmark
+        res = run_benchmark(_bench_simulate("alternate", "loss-reset", 200), repeats=2)
+        self.assertEqual(res["units_per_repeat"], 200)
+        self.assertEqual(len(res["rate_samples"]), 2)
+        self.assertGreater(res["rate_median"], 0)
+        self.assertLessEqual(res["latency_us"]["p50"], res["latency_us"]["max"])
+        self.assertGreater(res["peak_bytes"], 0)
+        names = [b.name for b in default_suite(hands=[100])]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("simulate[random,win-inc,100]", names)
+
+
+class TestMemorySizing(unittest.TestCase):
+    def test_footprint_and_recommendations(self):
+        from baccarat_bench import deep_sizeof, measure_footprint, sizing_recommendations
+        shared = "x" * 1000
+        self.assertLess(deep_sizeof([shared, shared]), 2 * sys.getsizeof(shared))
+        row = measure_footprint(300, rss=False)
+        self.assertEqual(row["hands"], 300)
+        self.assertGreater(row["events_bytes_per_hand"], row["csv_bytes_per_hand"] / 2)
+        self.assertGreater(row["json_summary_bytes"], 0)
+        rows = [{"hands": h, "session_peak_rss": 100 * 2**20 + 2000 * h} for h in (1000, 10000, 100000)]
+        recs = {r["limit_mb"]: r for r in sizing_recommendations(rows, limits_mb=(512,), headroom=1.0)}
+        self.assertAlmostEqual(recs[512]["bytes_per_hand"], 2000)
+        self.assertEqual(recs[512]["max_hands"], (412 * 2**20) // 2000)
+
+
+class TestBenchmarkGate(unittest.TestCase):
+    def test_regressions_are_noise_aware(self):
+        import tempfile
+        from baccarat_bench import compare_reports, load_reports, regressions
+
+        def report(path, entries):
+            results = [
+                {"name": n, "group": g, "unit": "hands", "rate_samples": rates, "peak_bytes": peak}
+                for n, g, rates, peak in entries
+            ]
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"meta": {}, "results": results}, f)
+
+        with tempfile.TemporaryDirectory() as d:
+            base, cur = os.path.join(d, "base.json"), os.path.join(d, "cur.json")
+            report(base, [
+                ("steady", "core", [1000, 1002, 998, 1001, 999], 10000),
+                ("jittery", "core", [1000, 700, 1300, 900, 1100], 10000),
+                ("memory", "core", [1000, 1001, 999, 1000, 1000], 10000),
+                ("export", "export", [1000, 1001, 999, 1000, 1000], 10000),
+            ])
+            report(cur, [
+                ("steady", "core", [900, 902, 898, 901, 899], 10000),
+                ("jittery", "core", [900, 600, 1200, 800, 1000], 10000),
+                ("memory", "core", [1000, 1001, 999, 1000, 1000], 20000),
+                ("export", "export", [500, 501, 499, 500, 500], 10000),
+            ])
+            rows = {r.name: r for r in compare_reports(load_reports([base]), load_reports([cur]))}
+        self.assertEqual(rows["steady"].status, "regression")
+        self.assertEqual(rows["jittery"].status, "noisy")
+        self.assertEqual(rows["memory"].status, "regression")
+        self.assertEqual(rows["export"].status, "regression")
+        self.assertFalse(rows["export"].gated)
+        self.assertEqual(sorted(r.name for r in regressions(list(rows.values()))), ["memory", "steady"])
+
+
+class TestPhaseTiming(unittest.TestCase):
+    def test_phase_counters_and_throughput(self):
+        from unittest import mock
+        from baccarat_core import PHASE_TIMING_ENV, PHASES
+        params = RunParams(bankroll=10000, bet=100, hands=600, penetration=300, seed=5)
+        events, plain = simulate_hands(params, yield_per_hand=False)
+        self.assertIsNone(plain.timing)
+        timed_events, timed = simulate_hands(params, yield_per_hand=False, phase_timing=True)
+        self.assertEqual([e.bankroll_after for e in timed_events], [e.bankroll_after for e in events])
+        t = timed.timing
+        self.assertEqual(list(t["phases"]), list(PHASES))
+        for name in ("decide", "size", "deal", "settle", "event", "yield"):
+            self.assertEqual(t["phases"][name]["calls"], 600)
+        self.assertEqual(t["phases"]["reshuffle"]["calls"], timed.shoe_reshuffles - 1)
+        self.assertLessEqual(sum(p["seconds"] for p in t["phases"].values()), t["wall_seconds"])
+        self.assertAlmostEqual(t["hands_per_sec"] * t["wall_seconds"], 600)
+        with mock.patch.dict(os.environ, {PHASE_TIMING_ENV: "1"}):
+            self.assertIsNotNone(simulate_hands(params, yield_per_hand=False)[1].timing)
+            self.assertIsNone(simulate_hands(params, yield_per_hand=False, phase_timing=False)[1].timing)
+
+    def test_phase_timing_with_target_precision(self):
+        from baccarat_sequential import simulate_to_precision
+        params = RunParams(bankroll=10000, bet=100, hands=5000, seed=5)
+        _, summary = simulate_to_precision(params, 0.05, batch_size=200, phase_timing=True)
+        used = summary.stopping["hands_used"]
+        self.assertEqual(summary.timing["phases"]["decide"]["calls"], used)
+        self.assertEqual(summary.params["hands_played"], used)
+        self.assertEqual(summary.params["hands"], 5000)
+
+
+class TestProfiling(unittest.TestCase):
+    def test_cpu_and_mem_profiles_write_outputs(self):
+        import pstats
+        import tempfile
+        from baccarat_profile import profile_call
+        params = RunParams(bankroll=10000, bet=100, hands=200, seed=3)
+        with tempfile.TemporaryDirectory() as d:
+            (events, _), report = profile_call("cpu", lambda: simulate_hands(params, yield_per_hand=False), os.path.join(d, "cpu"))
+            self.assertEqual(len(events), 200)
+            self.assertIn("_simulate_hands_iter", report)
+            stats = pstats.Stats(os.path.join(d, "cpu.pstats"))
+            self.assertTrue(any(fn[2] == "deal_one_hand" for fn in stats.stats))
+            with open(os.path.join(d, "cpu.collapsed"), encoding="utf-8") as f:
+                for line in f:
+                    self.assertTrue(line.rsplit(" ", 1)[1].strip().isdigit())
+            (events, _), report = profile_call("mem", lambda: simulate_hands(params, yield_per_hand=False), os.path.join(d, "mem"))
+            self.assertRegex(report, r"HandEvent\s+200\s")
+            # 牌靴复用缓存模板中的 Card，只作为共享对象报告总量
+            self.assertRegex(report, r"Shared objects[^\n]*\n\s+Card\s+[1-9]")
+            self.assertIn("peak", report)
+            self.assertTrue(os.path.getsize(os.path.join(d, "mem.collapsed")) > 0)
+
+
+class TestReplay(unittest.TestCase):
+    def test_replay_reproduces_exported_run(self):
+        import tempfile
+        from baccarat_replay import read_hands, replay_hands, write_binary
+        params = RunParams(bankroll=10000, bet=100, hands=400, decks=6, penetration=200, strategy="flip-opposite-wait", seed=11, loss_progression_pct=50.0)
+        events, ref = simulate_hands(params, yield_per_hand=False)
+        self.assertGreater(ref.shoe_reshuffles, 1)
+        with tempfile.TemporaryDirectory() as d:
+            csv_path = os.path.join(d, "run.csv")
+            save_csv(events, csv_path, params)
+            bin_path = os.path.join(d, "run.bacr.gz")
+            self.assertEqual(write_binary(read_hands(csv_path), bin_path), len(events))
+            nd_path = os.path.join(d, "run.ndjson")
+            with open(nd_path, "w", encoding="utf-8") as f:
+                for e in events:
+                    f.write(json.dumps({"outcome": e.outcome[0].upper()}) + "\n")
+            for path in (csv_path, bin_path):
+                replayed, summary = replay_hands(params, path, yield_per_hand=False)
+                self.assertEqual([e.outcome for e in replayed], [e.outcome for e in events])
+                self.assertEqual([e.player_cards for e in replayed], [e.player_cards for e in events])
+                self.assertEqual(summary.shoe_reshuffles, ref.shoe_reshuffles)
+                self.assertAlmostEqual(summary.final_bankroll, ref.final_bankroll)
+            # 只有结果的记录：资金变化相同，但没有牌面
+            replayed, summary = replay_hands(params, nd_path, yield_per_hand=False)
+            self.assertAlmostEqual(summary.final_bankroll, ref.final_bankroll)
+            self.assertIsNone(replayed[0].player_total)
+
+
+class TestSimulationAPI(unittest.TestCase):
+    @staticmethod
+    def _call(app, method, path, body=None, query=""):
+        import io
+        raw = json.dumps(body).encode("utf-8") if body is not None else b""
+        environ = {
+            "REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query,
+            "CONTENT_LENGTH": str(len(raw)), "wsgi.input": io.BytesIO(raw),
+        }
+        status = []
+        chunks = app(environ, lambda s, headers: status.append(s))
+        try:
+            body = b"".join(chunks)
+        finally:
+            getattr(chunks, "close", lambda: None)()
+        return int(status[0].split()[0]), body
+
+    def test_bad_params_are_rejected_with_400(self):
+        from server import create_app
+        app = create_app()
+        base = {"bankroll": 1000, "bet": 10, "hands": 50, "seed": 1}
+        for bad in ({"hands": "abc"}, {"bankroll": [1000]}, {"strategy": "bogus"}, {"decks": 0},
+                    {"penetration": -5}, {"penetration": 416}, {"loss_progression_win_mode": "double"},
+                    {"bet": float("inf")}, {"hands": 2.5}, {"rng": "xorshift"}):
+            status, body = self._call(app, "POST", "/simulate", dict(base, **bad))
+            self.assertEqual(status, 400, (bad, body))
+        status, body = self._call(app, "POST", "/simulate", dict(base, bankroll="1000", hands=50.0))
+        self.assertEqual(status, 200, body)
+        self.assertEqual(json.loads(body)["params"]["hands"], 50)
+
+    def test_simulate_keeps_summary_only(self):
+        from server import create_app
+        app = create_app()
+        status, _ = self._call(app, "POST", "/simulate", {"bankroll": 1000, "bet": 10, "hands": 300, "seed": 3})
+        self.assertEqual(status, 200)
+        (job,) = app.manager.list_jobs()
+        self.assertIsNone(job.events)
+        self.assertEqual(job.hands_done, 300)
+        # /jobs 需要逐局事件，不能复用只含汇总的缓存
+        status, body = self._call(app, "POST", "/jobs", {"bankroll": 1000, "bet": 10, "hands": 300, "seed": 3})
+        job = app.manager.get(json.loads(body)["job_id"])
+        self.assertTrue(job.wait(30))
+        self.assertFalse(job.cached)
+        self.assertEqual(len(job.events), 300)
+
+    def test_job_hands_cap_event_budget_and_client_id(self):
+        from baccarat_jobs import EVENT_BYTES, JobManager, ResultCache
+        from server import SimulationAPI, _client_id
+        app = SimulationAPI(max_job_hands=100)
+        status, body = self._call(app, "POST", "/jobs", {"bankroll": 1000, "bet": 10, "hands": 101, "seed": 1})
+        self.assertEqual(status, 400, body)
+        # 已完成任务保留的事件超出字节预算时，最旧的任务先被丢弃
+        manager = JobManager(max_workers=1, per_user_limit=4, cache=ResultCache(max_event_bytes=150 * EVENT_BYTES),
+                             max_event_bytes=150 * EVENT_BYTES)
+        jobs = []
+        for seed in (1, 2, 3):
+            jobs.append(manager.submit("u", RunParams(bankroll=1000, bet=10, hands=100, seed=seed)))
+            self.assertTrue(jobs[-1].wait(30))
+        self.assertEqual([j.job_id for j in manager.list_jobs()], [jobs[2].job_id])
+        self.assertEqual(len(manager.cache._data), 1)
+        manager.shutdown()
+        # X-Client-Id 只在显式信任时使用
+        environ = {"HTTP_X_CLIENT_ID": "spoofed", "REMOTE_ADDR": "10.0.0.1"}
+        self.assertEqual(_client_id(environ), "10.0.0.1")
+        self.assertEqual(_client_id(environ, trust_header=True), "spoofed")
+
+    def test_stream_validates_before_headers(self):
+        from server import create_app
+        app = create_app()
+        query = "format=ndjson&hands_per_sec=0&bankroll=1000&bet=10&hands=20&seed=1"
+        status, body = self._call(app, "GET", "/stream", query=query + "&strategy=bogus")
+        self.assertEqual(status, 400)
+        self.assertIn("Unknown strategy", json.loads(body)["error"])
+        status, body = self._call(app, "GET", "/stream", query=query)
+        self.assertEqual(status, 200)
+        frames = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+        self.assertEqual([f["type"] for f in frames], ["hand"] * 20 + ["summary"])
+        self.assertEqual(frames[-2]["kpi"]["hands"], 20)
+        # 流结束后槽位已释放
+        self.assertTrue(app._stream_slots.acquire(blocking=False))
+
+
+class TestLoadTest(unittest.TestCase):
+    def test_stage_against_in_process_server(self):
+        import threading
+        from wsgiref.simple_server import make_server
+        from baccarat_loadtest import run_stage
+        from server import _ThreadingWSGIServer, create_app
+        httpd = make_server("127.0.0.1", 0, create_app(), server_class=_ThreadingWSGIServer)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{httpd.server_port}"
+            res = run_stage(url, users=2, duration=1.0, hands_mix={200: 1.0}, server_pid=os.getpid(), sample_every=0.2, window=0.5)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        self.assertGreater(res.overall["requests"], 0)
+        self.assertEqual(res.overall["error_rate"], 0.0, res.errors)
+        self.assertLessEqual(res.overall["p50_ms"], res.overall["p99_ms"])
+        self.assertEqual(set(res.by_scenario), {"simulate", "job", "stream"})
+        self.assertTrue(res.timeline)
+        if sys.platform.startswith("linux"):
+            self.assertGreater(res.peak_rss, 0)
+
+
+class TestPageBenchmark(unittest.TestCase):
+    def test_pages_render_headlessly_with_timings(self):
+        from baccarat_uibench import bench_page
+        for page in ("play", "fast"):
+            rows = bench_page(page, 300, repeats=1)
+            self.assertEqual([r["phase"] for r in rows], ["first", "load", "rerun"])
+            first, load, rerun = rows
+            self.assertEqual(first["to_df_median"], 0.0)
+            self.assertGreater(rerun["to_df_median"], 0.0)
+            self.assertGreater(rerun["charts_median"], 0.0)
+            self.assertGreater(rerun["payload_bytes"], first["payload_bytes"])
+            self.assertGreaterEqual(rerun["script_median"], rerun["to_df_median"])
+        self.assertGreater(rerun["summary_median"], 0.0)
+
+
+class TestEngineEquivalence(unittest.TestCase):
+    def test_alternative_engines_match_reference(self):
+        from baccarat_verify import default_cases, verify
+        results = verify(default_cases(hands=300, seeds=(1, 2), decks=(8,)))
+        compared = [r for r in results if r.skipped is None]
+        self.assertTrue(compared)
+        for r in compared:
+            self.assertEqual(r.mismatches, [], r.case)
+        self.assertTrue(all(r.case.startswith("random") for r in results if r.skipped))
+
+    def test_verifier_reports_differences(self):
+        import baccarat_verify
+        from baccarat_verify import default_cases, verify
+
+        def off_by_one(params, reference):
+            run = baccarat_verify.replay_engine(params, reference)
+            run.columns["bankroll_after"] = list(run.columns["bankroll_after"])
+            run.columns["bankroll_after"][5] += 0.01
+            run.summary["wins"] += 1
+            return run
+
+        baccarat_verify.ENGINES["broken"] = off_by_one
+        try:
+            (res,) = verify(default_cases(hands=50, seeds=(1,), strategies=("always-banker",), progressions={"flat": {}}, decks=(8,)), ["broken"])
+        finally:
+            del baccarat_verify.ENGINES["broken"]
+        self.assertEqual([(m.where, m.field) for m in res.mismatches], [("hand 6", "bankroll_after"), ("summary", "wins")])
+
+    def test_outcome_frequencies_match_exact_probabilities(self):
+        from baccarat_verify import chi_square, frequency_checks
+        self.assertAlmostEqual(chi_square({"player": 50, "banker": 40, "tie": 10}, {"player": 0.5, "banker": 0.4, "tie": 0.1})[1], 1.0)
+        checks = frequency_checks(["reference"], decks=(8,), hands=50000) + frequency_checks(["vector"], decks=(6, 8), hands=200000)
+        for c in checks:
+            self.assertTrue(c.passed, (c.engine, c.decks, c.chi2))
+
+
+class TestRNGBackends(unittest.TestCase):
+    def test_mt_backend_is_bit_compatible(self):
+        import random
+        from baccarat_core import Shoe
+        from baccarat_rng import make_rng
+        a = Shoe(decks=8, rng=random.Random(5))
+        b = Shoe(decks=8, rng=make_rng("mt", 5))
+        for _ in range(3):
+            self.assertEqual([c.rank for c in a.cards], [c.rank for c in b.cards])
+            a.reset()
+            b.reset()
+        _, summary = simulate_hands(RunParams(bankroll=10000, bet=100, hands=200, strategy="random", seed=5), yield_per_hand=False)
+        self.assertEqual(summary.params["rng"], "mt")
+
+    def test_numpy_backends_shuffle_reproducibly_and_spawn_streams(self):
+        from collections import Counter
+        from baccarat_core import Shoe
+        from baccarat_rng import make_rng, spawn_rngs
+        for name in ("pcg64", "philox"):
+            shoe = Shoe(decks=6, rng=make_rng(name, 9))
+            again = Shoe(decks=6, rng=make_rng(name, 9))
+            self.assertEqual([c.rank for c in shoe.cards], [c.rank for c in again.cards])
+            self.assertEqual(set(Counter(c.rank for c in shoe.cards).values()), {24})
+            shoe.reset()
+            self.assertNotEqual([c.rank for c in shoe.cards], [c.rank for c in again.cards])
+            streams = [[rng.random() for _ in range(5)] for rng in spawn_rngs(name, 9, 3)]
+            self.assertEqual(len({tuple(s) for s in streams}), 3)
+            self.assertEqual(streams, [[rng.random() for _ in range(5)] for rng in spawn_rngs(name, 9, 3)])
+            params = RunParams(bankroll=10000, bet=100, hands=300, strategy="random", seed=9, rng=name)
+            events, summary = simulate_hands(params, yield_per_hand=False)
+            self.assertEqual(summary.params["rng"], name)
+            self.assertEqual([e.bankroll_after for e in events], [e.bankroll_after for e in simulate_hands(params, yield_per_hand=False)[0]])
+        with self.assertRaises(ValueError):
+            make_rng("xorshift", 1)
+
+    def test_sweep_workers_get_spawned_streams(self):
+        import csv
+        import tempfile
+        from baccarat_rng import make_rng, spawn_rngs, spawn_seeds
+        from baccarat_sweep import expand_manifest, run_sweep
+        for name in ("mt", "pcg64"):
+            # worker 端由子 SeedSequence 构造的流与进程内 spawn_rngs 一致
+            self.assertEqual([make_rng(name, s).random() for s in spawn_seeds(5, 2)], [r.random() for r in spawn_rngs(name, 5, 2)])
+        cells = expand_manifest({
+            "base": {"bankroll": 10000, "bet": 100, "hands": 200, "strategy": "random", "rng": "pcg64"},
+            "grid": {"decks": [6, 8]},
+        })
+        tables = []
+        with tempfile.TemporaryDirectory() as d:
+            for i, workers in enumerate((1, 2)):
+                out = os.path.join(d, f"sweep{i}.csv")
+                run_sweep(cells, out, workers=workers, seed=11)
+                with open(out, newline="", encoding="utf-8") as f:
+                    tables.append([(r["decks"], r["final_bankroll"]) for r in csv.DictReader(f)])
+        self.assertEqual(tables[0], tables[1])
+
+    def test_numpy_backends_match_engines_and_probabilities(self):
+        from baccarat_verify import default_cases, frequency_checks, verify
+        cases = default_cases(hands=200, seeds=(3,), strategies=("flip-opposite-wait",), decks=(8,), rngs=("pcg64", "philox"))
+        for r in verify(cases):
+            self.assertEqual(r.mismatches, [], r.case)
+        for c in frequency_checks(["reference"], decks=(8,), hands=30000, rngs=("pcg64", "philox")):
+            self.assertTrue(c.passed, (c.rng, c.chi2))
+
+
 def main(argv: Optional[List[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == "sweep":
+        sweep_main(argv[1:])
+        return
+    if argv and argv[0] == "query":
+        query_main(argv[1:])
+        return
+    if argv and argv[0] == "import":
+        import_main(argv[1:])
+        return
     args = parse_args(argv)
     if args.run_tests:
         suite = unittest.defaultTestLoader.loadTestsFromModule(sys.modules[__name__])
@@ -199,25 +1187,52 @@ def main(argv: Optional[List[str]] = None) -> None:
         seed=args.seed,
         csv_path=csv_path,
         json_path=json_path,
+        rng=args.rng,
     )
 
-    # run and collect all events quickly
-    events = []
-    for ev in simulate_hands(params, yield_per_hand=True):
-        events.append(ev)
-        if not args.silent:
-            print(
-                f"#{ev.hand_no} {ev.timestamp} bet={ev.bet_side or '-'} amt={ev.bet_amount:.2f} "
-                f"P={ev.player_cards}({ev.player_total}) B={ev.banker_cards}({ev.banker_total}) -> {ev.outcome} "
-                f"win={ev.win_amount:+.2f} bank={ev.bankroll_after:.2f} left={ev.shoe_cards_left} comm={ev.commission_paid:.2f}"
+    def execute():
+        if args.target_half_width is not None:
+            # 按目标精度提前停止，--hands 为上限
+            events, summary = simulate_to_precision(
+                params,
+                args.target_half_width,
+                metric=args.target_metric,
+                confidence=args.confidence,
+                phase_timing=args.phase_timing,
             )
+            if not args.silent:
+                for ev in events:
+                    _print_event(ev)
+        else:
+            # run and collect all events; the summary comes from the same run (StopIteration.value)
+            events = []
+            gen = simulate_hands(params, yield_per_hand=True, phase_timing=args.phase_timing)
+            try:
+                while True:
+                    ev = next(gen)
+                    events.append(ev)
+                    if not args.silent:
+                        _print_event(ev)
+            except StopIteration as stop:
+                summary = stop.value
 
-    # derive summary similar to previous stats using last event and counters from JSON save in core
-    # we need to recompute summary via yield_per_hand=False path for consistency
-    _, summary = simulate_hands(params, yield_per_hand=False)
+        save_csv(events, csv_path, params)
+        save_json(summary, json_path)
+        return events, summary
 
-    save_csv(events, csv_path, params)
-    save_json(summary, json_path)
+    profile_report = None
+    if args.profile:
+        prefix = args.profile_out or os.path.join(os.getcwd(), "out", f"baccarat_profile_{ts}_{args.profile}")
+        (events, summary), profile_report = profile_call(args.profile, execute, prefix)
+    else:
+        events, summary = execute()
+    if args.db:
+        conn = baccarat_store.connect(args.db)
+        try:
+            run_id = baccarat_store.record_run(conn, summary, events if args.db_hands else None, label=args.label, source=os.path.abspath(json_path))
+        finally:
+            conn.close()
+        print(f"Recorded run #{run_id} in {args.db}")
 
     # Print concise summary
     stats = {
@@ -231,6 +1246,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         "final_bankroll": summary.final_bankroll,
         "total_profit": summary.total_profit,
         "total_wagered": summary.total_wagered,
+        "roi": summary.roi,
         "bet_hands": summary.bet_hands,
         "observe_hands": summary.observe_hands,
         "push_hands": summary.push_hands,
@@ -245,8 +1261,32 @@ def main(argv: Optional[List[str]] = None) -> None:
         "shoe_reshuffles": summary.shoe_reshuffles,
         "strategy_hit_rate": summary.strategy_hit_rate,
         "outcome_distribution": summary.outcome_distribution,
+        "peak_bankroll": summary.peak_bankroll,
+        "trough_bankroll": summary.trough_bankroll,
+        "max_drawdown": summary.max_drawdown,
+        "max_drawdown_pct": summary.max_drawdown_pct,
+        "max_drawdown_duration": summary.max_drawdown_duration,
+        "pnl_volatility": summary.pnl_volatility,
+        "sharpe_ratio": summary.sharpe_ratio,
+        "longest_loss_streak": summary.longest_loss_streak,
+        "timing": summary.timing,
     }
+    if summary.stopping is not None:
+        stop = summary.stopping
+        est = "N/A" if stop["estimate"] is None else f"{stop['estimate']:.6f} ± {stop['half_width']:.6f}"
+        if stop["batch_hands"] < stop["hands_used"]:
+            # 区间只覆盖完整的批；全部局数上的比率另行给出
+            run = "N/A" if stop["run_estimate"] is None else f"{stop['run_estimate']:.6f}"
+            est += f" over the first {stop['batch_hands']} hands (all hands: {run})"
+        print(
+            f"Early stop: {stop['metric']} = {est} at {stop['confidence']:.0%} "
+            f"(target ±{stop['target_half_width']}, {'met' if stop['met'] else 'not met'}); "
+            f"hands used: {stop['hands_used']}/{params.hands}"
+        )
     print_summary(stats, csv_path, json_path)
+    if profile_report:
+        print()
+        print(profile_report, end="")
 
 
 if __name__ == "__main__":
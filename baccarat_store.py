@@ -0,0 +1,486 @@
+"""
+结果仓库 / SQLite results warehouse
+
+把每次运行的参数与汇总写入一个本地 SQLite 文件（WAL 模式），参数列与主要指标列建有索引，
+“上个月哪个配置 ROI 最好”之类的问题直接用 SQL 回答，不必再遍历 out/ 下成千上万个
+CSV/JSON 文件。
+
+- runs：每次运行一行；参数、标量指标各占一列，完整汇总另存 summary_json。
+- hand_columns：可选的逐局数据，按列存储（每列一个 numpy 数组，zlib 压缩为一个 BLOB），
+  读取时可以只取需要的列（例如只取 bankroll_after 画资金曲线）。
+- 批量写入用 executemany，在一个事务里完成；run_id 在事务内预先分配。
+- 结构版本记录在 PRAGMA user_version 中，旧版本数据库打开时按 _MIGRATIONS 逐级升级。
+"""
+from __future__ import annotations
+
+import csv
+import json
+import os
+import re
+import sqlite3
+import zlib
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from baccarat_core import RANKS, HandEvent, RunSummary
+from baccarat_rng import DEFAULT_RNG
+
+
+DEFAULT_DB_PATH = os.path.join("out", "baccarat_results.sqlite")
+SCHEMA_VERSION = 2
+
+# (列名, SQLite 类型)；参数列取自 RunSummary.params
+PARAM_COLUMNS: List[Tuple[str, str]] = [
+    ("strategy", "TEXT"),
+    ("bet_size", "REAL"),
+    ("hands", "INTEGER"),
+    ("decks", "INTEGER"),
+    ("penetration", "INTEGER"),
+    ("seed", "INTEGER"),
+    ("loss_progression_pct", "REAL"),
+    ("loss_progression_dec_pct", "REAL"),
+    ("loss_progression_start", "INTEGER"),
+    ("loss_progression_win_mode", "TEXT"),
+    ("win_progression_inc_pct", "REAL"),
+    ("win_progression_dec_pct", "REAL"),
+    ("win_progression_start", "INTEGER"),
+    ("win_progression_loss_mode", "TEXT"),
+    ("rng", "TEXT"),
+]
+METRIC_COLUMNS: List[Tuple[str, str]] = [
+    ("initial_bankroll", "REAL"),
+    ("final_bankroll", "REAL"),
+    ("total_profit", "REAL"),
+    ("total_wagered", "REAL"),
+    ("roi", "REAL"),
+    ("bet_hands", "INTEGER"),
+    ("observe_hands", "INTEGER"),
+    ("push_hands", "INTEGER"),
+    ("wins", "INTEGER"),
+    ("losses", "INTEGER"),
+    ("commission_total", "REAL"),
+    ("player_wins", "INTEGER"),
+    ("banker_wins", "INTEGER"),
+    ("ties", "INTEGER"),
+    ("avg_cards_per_hand", "REAL"),
+    ("cards_dealt_total", "INTEGER"),
+    ("shoe_reshuffles", "INTEGER"),
+    ("strategy_hit_rate", "REAL"),
+    ("peak_bankroll", "REAL"),
+    ("trough_bankroll", "REAL"),
+    ("max_drawdown", "REAL"),
+    ("max_drawdown_pct", "REAL"),
+    ("max_drawdown_duration", "INTEGER"),
+    ("pnl_volatility", "REAL"),
+    ("sharpe_ratio", "REAL"),
+    ("longest_loss_streak", "INTEGER"),
+]
+# 旧汇总（引入该参数之前）缺少的参数按当时唯一的取值填充
+_PARAM_DEFAULTS: Dict[str, Any] = {"rng": DEFAULT_RNG}
+RUN_COLUMNS: List[str] = (
+    ["run_id", "created_at", "label", "source"]
+    + [c for c, _ in PARAM_COLUMNS]
+    + [c for c, _ in METRIC_COLUMNS]
+)
+_INDEXES = {
+    "idx_runs_config": ("strategy", "decks", "penetration", "bet_size"),
+    "idx_runs_progression": ("loss_progression_pct", "win_progression_inc_pct"),
+    "idx_runs_created": ("created_at",),
+    "idx_runs_roi": ("roi",),
+    "idx_runs_final": ("final_bankroll",),
+    "idx_runs_drawdown": ("max_drawdown",),
+    "idx_runs_sharpe": ("sharpe_ratio",),
+}
+
+_SIDES = (None, "player", "banker")
+_OUTCOMES = ("player", "banker", "tie")
+_RANK_INDEX = {r: i for i, r in enumerate(RANKS)}
+_NO_CARD = 255
+# 时间戳存为相对该纪元的微秒数（事件时间戳不带时区）
+_EPOCH = datetime(1970, 1, 1)
+# 逐局列：列名 -> numpy dtype；player_cards/banker_cards 为 (n, 3) 的 RANKS 下标，255 表示无牌
+HAND_COLUMNS: Dict[str, str] = {
+    "timestamp": "int64",
+    "hand_no": "int32",
+    "bet_side": "int8",
+    "bet_amount": "float64",
+    "player_cards": "uint8",
+    "banker_cards": "uint8",
+    "player_total": "int8",
+    "banker_total": "int8",
+    "outcome": "int8",
+    "win_amount": "float64",
+    "bankroll_after": "float64",
+    "shoe_cards_left": "int32",
+    "commission_paid": "float64",
+    "cumulative_win": "float64",
+}
+
+
+def connect(path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """Open (creating if needed) a results database in WAL mode."""
+    if path != ":memory:":
+        parent = os.path.dirname(os.path.abspath(path))
+        if parent and not os.path.exists(parent):
+            os.makedirs(parent, exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    _ensure_schema(conn)
+    return conn
+
+
+# 升级脚本：版本 v -> v + 1
+_MIGRATIONS: Dict[int, str] = {
+    # v2：随机数后端列；v1 时代只有 mt 后端
+    1: """
+ALTER TABLE runs ADD COLUMN rng TEXT;
+UPDATE runs SET rng = COALESCE(json_extract(summary_json, '$.params.rng'), 'mt');
+""",
+}
+
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version == SCHEMA_VERSION:
+        return
+    if version > SCHEMA_VERSION:
+        raise ValueError(f"Results database schema v{version} is newer than supported v{SCHEMA_VERSION}")
+    if version > 0:
+        while version < SCHEMA_VERSION:
+            conn.executescript(f"BEGIN;\n{_MIGRATIONS[version]}\nPRAGMA user_version = {version + 1};\nCOMMIT;")
+            version += 1
+        return
+    cols = ",\n    ".join(f"{name} {kind}" for name, kind in PARAM_COLUMNS + METRIC_COLUMNS)
+    conn.executescript(f"""
+BEGIN;
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    label TEXT,
+    source TEXT,
+    {cols},
+    summary_json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hand_columns (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+{"".join(f"CREATE INDEX IF NOT EXISTS {name} ON runs({', '.join(keys)});" for name, keys in _INDEXES.items())}
+PRAGMA user_version = {SCHEMA_VERSION};
+COMMIT;
+""")
+
+
+def _summary_dict(summary: Union[RunSummary, Dict[str, Any]]) -> Dict[str, Any]:
+    return asdict(summary) if isinstance(summary, RunSummary) else dict(summary)
+
+
+def _run_row(run_id: int, data: Dict[str, Any], created_at: str, label: Optional[str], source: Optional[str]) -> Tuple[Any, ...]:
+    params = data.get("params") or {}
+    return (
+        run_id, created_at, label, source,
+        *(params.get(c, _PARAM_DEFAULTS.get(c)) for c, _ in PARAM_COLUMNS),
+        *(data.get(c) for c, _ in METRIC_COLUMNS),
+        json.dumps(data, ensure_ascii=False),
+    )
+
+
+def _cards_matrix(hands: Sequence[List[str]]) -> np.ndarray:
+    out = np.full((len(hands), 3), _NO_CARD, dtype=np.uint8)
+    for i, cards in enumerate(hands):
+        for j, c in enumerate(cards):
+            out[i, j] = _RANK_INDEX[c]
+    return out
+
+
+def events_to_columns(events: Sequence[HandEvent]) -> Dict[str, np.ndarray]:
+    """Per-hand columns as numpy arrays (see HAND_COLUMNS); None totals become -1."""
+    side_code = {s: i for i, s in enumerate(_SIDES)}
+    outcome_code = {s: i for i, s in enumerate(_OUTCOMES)}
+    cols = {
+        "timestamp": [(datetime.fromisoformat(e.timestamp) - _EPOCH) // timedelta(microseconds=1) for e in events],
+        "hand_no": [e.hand_no for e in events],
+        "bet_side": [side_code[e.bet_side] for e in events],
+        "bet_amount": [e.bet_amount for e in events],
+        "player_total": [-1 if e.player_total is None else e.player_total for e in events],
+        "banker_total": [-1 if e.banker_total is None else e.banker_total for e in events],
+        "outcome": [outcome_code[e.outcome] for e in events],
+        "win_amount": [e.win_amount for e in events],
+        "bankroll_after": [e.bankroll_after for e in events],
+        "shoe_cards_left": [e.shoe_cards_left for e in events],
+        "commission_paid": [e.commission_paid for e in events],
+        "cumulative_win": [e.cumulative_win for e in events],
+    }
+    arrays = {name: np.asarray(values, dtype=HAND_COLUMNS[name]) for name, values in cols.items()}
+    arrays["player_cards"] = _cards_matrix([e.player_cards for e in events])
+    arrays["banker_cards"] = _cards_matrix([e.banker_cards for e in events])
+    return arrays
+
+
+def _column_rows(run_id: int, columns: Dict[str, np.ndarray], level: int) -> List[Tuple[Any, ...]]:
+    rows = []
+    for name, arr in columns.items():
+        arr = np.ascontiguousarray(arr, dtype=HAND_COLUMNS[name])
+        rows.append((run_id, name, arr.dtype.str, len(arr), "zlib", zlib.compress(arr.tobytes(), level)))
+    return rows
+
+
+def _insert(conn: sqlite3.Connection, items: Iterable[Tuple[Dict[str, Any], Optional[Sequence[HandEvent]], str, Optional[str], Optional[str]]], level: int) -> List[int]:
+    """Insert (summary dict, events, created_at, label, source) items in one transaction."""
+    run_rows: List[Tuple[Any, ...]] = []
+    hand_rows: List[Tuple[Any, ...]] = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        next_id = conn.execute("SELECT COALESCE(MAX(run_id), 0) + 1 FROM runs").fetchone()[0]
+        for data, events, created_at, label, source in items:
+            run_rows.append(_run_row(next_id, data, created_at, label, source))
+            if events:
+                hand_rows.extend(_column_rows(next_id, events_to_columns(events), level))
+            next_id += 1
+        placeholders = ", ".join("?" * (len(RUN_COLUMNS) + 1))
+        conn.executemany(f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}, summary_json) VALUES ({placeholders})", run_rows)
+        conn.executemany("INSERT INTO hand_columns VALUES (?, ?, ?, ?, ?, ?)", hand_rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return [row[0] for row in run_rows]
+
+
+def record_runs(
+    conn: sqlite3.Connection,
+    runs: Iterable[Tuple[Union[RunSummary, Dict[str, Any]], Optional[Sequence[HandEvent]]]],
+    label: Optional[str] = None,
+    source: Optional[str] = None,
+    level: int = 6,
+) -> List[int]:
+    """Insert (summary, events-or-None) pairs in one transaction; returns the new run ids."""
+    created_at = datetime.now().isoformat(timespec="seconds")
+    return _insert(conn, ((_summary_dict(s), ev, created_at, label, source) for s, ev in runs), level)
+
+
+def record_run(
+    conn: sqlite3.Connection,
+    summary: Union[RunSummary, Dict[str, Any]],
+    events: Optional[Sequence[HandEvent]] = None,
+    label: Optional[str] = None,
+    source: Optional[str] = None,
+) -> int:
+    return record_runs(conn, [(summary, events)], label=label, source=source)[0]
+
+
+def load_hand_columns(conn: sqlite3.Connection, run_id: int, columns: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+    """Decompress the stored per-hand columns of ``run_id`` (all, or only ``columns``)."""
+    sql = "SELECT name, dtype, rows, codec, data FROM hand_columns WHERE run_id = ?"
+    args: List[Any] = [run_id]
+    if columns is not None:
+        sql += f" AND name IN ({', '.join('?' * len(columns))})"
+        args.extend(columns)
+    out: Dict[str, np.ndarray] = {}
+    for name, dtype, rows, codec, data in conn.execute(sql, args):
+        if codec != "zlib":
+            raise ValueError(f"Unsupported column codec: {codec}")
+        arr = np.frombuffer(zlib.decompress(data), dtype=np.dtype(dtype))
+        out[name] = arr.reshape(rows, -1) if name.endswith("_cards") else arr
+    return out
+
+
+def load_events(conn: sqlite3.Connection, run_id: int) -> List[HandEvent]:
+    """Rebuild the HandEvents of ``run_id`` from its stored columns."""
+    cols = load_hand_columns(conn, run_id)
+    if not cols:
+        return []
+
+    def cards(row: np.ndarray) -> List[str]:
+        return [RANKS[c] for c in row.tolist() if c != _NO_CARD]
+
+    def total(v: int) -> Optional[int]:
+        return None if v < 0 else v
+
+    return [
+        HandEvent(
+            timestamp=(_EPOCH + timedelta(microseconds=int(cols["timestamp"][i]))).isoformat(),
+            hand_no=int(cols["hand_no"][i]),
+            bet_side=_SIDES[cols["bet_side"][i]],
+            bet_amount=float(cols["bet_amount"][i]),
+            player_cards=cards(cols["player_cards"][i]),
+            banker_cards=cards(cols["banker_cards"][i]),
+            player_total=total(int(cols["player_total"][i])),
+            banker_total=total(int(cols["banker_total"][i])),
+            outcome=_OUTCOMES[cols["outcome"][i]],
+            win_amount=float(cols["win_amount"][i]),
+            bankroll_after=float(cols["bankroll_after"][i]),
+            shoe_cards_left=int(cols["shoe_cards_left"][i]),
+            commission_paid=float(cols["commission_paid"][i]),
+            cumulative_win=float(cols["cumulative_win"][i]),
+        )
+        for i in range(len(cols["hand_no"]))
+    ]
+
+
+_FILTER_RE = re.compile(r"^\s*([A-Za-z_]+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$")
+
+
+def parse_filters(items: Sequence[str]) -> List[Tuple[str, str, Any]]:
+    """Parse ``column<op>value`` filters (op one of = != > >= < <=), e.g. roi>0, strategy=alternate."""
+    out = []
+    for item in items:
+        m = _FILTER_RE.match(item)
+        if not m:
+            raise ValueError(f"Invalid filter: {item!r} (expected column<op>value)")
+        col, op, raw = m.groups()
+        if col not in RUN_COLUMNS:
+            raise ValueError(f"Unknown column: {col}")
+        value: Any = raw
+        try:
+            value = int(raw)
+        except ValueError:
+            try:
+                value = float(raw)
+            except ValueError:
+                pass
+        out.append((col, op, value))
+    return out
+
+
+def _where(filters: Sequence[Tuple[str, str, Any]]) -> Tuple[str, List[Any]]:
+    if not filters:
+        return "", []
+    clauses = []
+    args = []
+    for col, op, value in filters:
+        if col not in RUN_COLUMNS or op not in ("=", "!=", ">", ">=", "<", "<="):
+            raise ValueError(f"Invalid filter: {col} {op}")
+        clauses.append(f"{col} {op} ?")
+        args.append(value)
+    return " WHERE " + " AND ".join(clauses), args
+
+
+def query_runs(
+    conn: sqlite3.Connection,
+    filters: Sequence[Tuple[str, str, Any]] = (),
+    order_by: str = "run_id",
+    descending: bool = True,
+    limit: Optional[int] = 20,
+    columns: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Runs matching ``filters`` (see parse_filters), ordered by an indexed or any run column."""
+    cols = list(columns or RUN_COLUMNS)
+    for c in cols + [order_by]:
+        if c not in RUN_COLUMNS:
+            raise ValueError(f"Unknown column: {c}")
+    where, args = _where(filters)
+    sql = f"SELECT {', '.join(cols)} FROM runs{where} ORDER BY {order_by} {'DESC' if descending else 'ASC'}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        args.append(int(limit))
+    return [dict(row) for row in conn.execute(sql, args)]
+
+
+def compare_runs(
+    conn: sqlite3.Connection,
+    group_by: Sequence[str] = ("strategy",),
+    metric: str = "roi",
+    filters: Sequence[Tuple[str, str, Any]] = (),
+    descending: bool = True,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Aggregate ``metric`` per group: runs, mean, std, min, max, ordered by mean."""
+    for c in list(group_by) + [metric]:
+        if c not in RUN_COLUMNS:
+            raise ValueError(f"Unknown column: {c}")
+    keys = ", ".join(group_by)
+    where, args = _where(filters)
+    sql = (
+        f"SELECT {keys}, COUNT({metric}) AS runs, AVG({metric}) AS mean, "
+        f"AVG({metric} * {metric}) AS mean_sq, MIN({metric}) AS min, MAX({metric}) AS max "
+        f"FROM runs{where} GROUP BY {keys} ORDER BY mean {'DESC' if descending else 'ASC'}"
+    )
+    if limit is not None:
+        sql += " LIMIT ?"
+        args.append(int(limit))
+    out = []
+    for row in conn.execute(sql, args):
+        d = dict(row)
+        mean_sq = d.pop("mean_sq")
+        n = d["runs"]
+        d["std"] = (max(0.0, mean_sq - d["mean"] ** 2) * n / (n - 1)) ** 0.5 if n > 1 else None
+        out.append(d)
+    return out
+
+
+def _read_report_csv(path: str) -> List[HandEvent]:
+    events = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            events.append(HandEvent(
+                timestamp=row["timestamp"],
+                hand_no=int(row["hand_no"]),
+                bet_side=row["bet_side"] or None,
+                bet_amount=float(row["bet_amount"]),
+                player_cards=json.loads(row["player_cards"]),
+                banker_cards=json.loads(row["banker_cards"]),
+                player_total=int(row["player_total"]) if row["player_total"] != "" else None,
+                banker_total=int(row["banker_total"]) if row["banker_total"] != "" else None,
+                outcome=row["outcome"],
+                win_amount=float(row["win_amount"]),
+                bankroll_after=float(row["bankroll_after"]),
+                shoe_cards_left=int(row["shoe_cards_left"]),
+                commission_paid=float(row["commission_paid"]),
+                cumulative_win=float(row["cumulative_win"]),
+            ))
+    return events
+
+
+def _report_for(json_path: str, summary: Dict[str, Any]) -> Optional[str]:
+    candidate = (summary.get("params") or {}).get("csv_path")
+    if candidate and os.path.exists(candidate):
+        return candidate
+    head, name = os.path.split(json_path)
+    if name.startswith("baccarat_summary_"):
+        sibling = os.path.join(head, "baccarat_report_" + name[len("baccarat_summary_"):-len(".json")] + ".csv")
+        if os.path.exists(sibling):
+            return sibling
+    return None
+
+
+def import_files(conn: sqlite3.Connection, json_paths: Sequence[str], with_hands: bool = False, batch: int = 500) -> int:
+    """Load existing summary JSON files (and, optionally, their report CSVs) into the warehouse.
+
+    created_at is the file's modification time and source its absolute path;
+    files already imported are skipped. Returns the number of runs inserted.
+    """
+    known = {r[0] for r in conn.execute("SELECT source FROM runs WHERE source IS NOT NULL")}
+    inserted = 0
+    items: List[Tuple[Dict[str, Any], Optional[List[HandEvent]], str, Optional[str], Optional[str]]] = []
+    for path in json_paths:
+        source = os.path.abspath(path)
+        if source in known:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            summary = json.load(f)
+        events = None
+        if with_hands:
+            report = _report_for(path, summary)
+            events = _read_report_csv(report) if report else None
+        created_at = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+        items.append((summary, events, created_at, None, source))
+        known.add(source)
+        # 逐局数据可能很大，分批提交
+        if len(items) >= batch or (events and len(items) >= 10):
+            inserted += len(_insert(conn, items, 6))
+            items.clear()
+    if items:
+        inserted += len(_insert(conn, items, 6))
+    return inserted
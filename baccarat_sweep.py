@@ -0,0 +1,228 @@
+"""
+参数网格批量运行 / Parameter-grid sweeps
+
+清单文件（JSON 或 YAML）描述要运行的 RunParams 组合：
+
+    base:   公共字段（bankroll / bet / hands ...）
+    grid:   字段 -> 取值列表，展开为笛卡尔积（如 strategy × decks × penetration × seed）
+    cells:  额外的单独组合列表，各自覆盖 base
+
+每个组合在进程池中以“仅汇总”方式运行（不保留逐局事件），完成一个就向日志文件
+（<输出>.journal.ndjson）追加一行并刷新；中断后重新运行同一命令会跳过日志中已完成的
+组合。全部完成后把日志整理为一张 CSV 或 Parquet 汇总表，每行一个 RunSummary。
+
+未指定 seed 的组合各自使用从 run_sweep(seed=...) 派生的独立子流（按组合在清单中的位置，
+续跑时不变）；指定了 seed 的组合与单独运行该 seed 的结果一致。未指定 seed 的组合的 cell_id
+包含根种子与子流序号，因此换了 --seed 或调整了清单顺序后续跑，不会复用旧子流的日志行。
+"""
+from __future__ import annotations
+
+import csv
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Dict, List, Optional
+
+from baccarat_core import RunParams, RunSummary, run_params_from_dict, simulate_hands
+from baccarat_rng import make_rng, spawn_seeds
+
+
+SWEEP_FORMATS = ("csv", "parquet")
+# 输出路径不参与组合标识，也不写入结果表
+_PATH_FIELDS = ("csv_path", "json_path")
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ValueError("YAML manifests require PyYAML (pip install pyyaml); use JSON otherwise") from e
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("Manifest must be a mapping with base / grid / cells")
+    unknown = sorted(set(data) - {"base", "grid", "cells"})
+    if unknown:
+        raise ValueError(f"Unknown manifest key(s): {', '.join(unknown)}")
+    return data
+
+
+def expand_manifest(manifest: Dict[str, Any]) -> List[RunParams]:
+    """All cells of a manifest in a stable order (grid first, then explicit cells), deduplicated."""
+    base = dict(manifest.get("base") or {})
+    grid = manifest.get("grid") or {}
+    combos: List[Dict[str, Any]] = []
+    if grid:
+        keys = list(grid)
+        for values in itertools.product(*(grid[k] if isinstance(grid[k], list) else [grid[k]] for k in keys)):
+            combos.append(dict(zip(keys, values)))
+    combos.extend(dict(c) for c in (manifest.get("cells") or []))
+    if not combos:
+        combos = [{}]
+    cells: List[RunParams] = []
+    seen = set()
+    for combo in combos:
+        params = run_params_from_dict({**base, **combo})
+        cid = cell_id(params)
+        if cid not in seen:
+            seen.add(cid)
+            cells.append(params)
+    return cells
+
+
+def cell_id(params: RunParams, root_seed: Optional[int] = None, index: Optional[int] = None) -> str:
+    """Stable id of a cell; unseeded cells in a sweep also hash their stream (root seed, index)."""
+    payload: Dict[str, Any] = {k: v for k, v in asdict(params).items() if k not in _PATH_FIELDS}
+    if params.seed is None and index is not None:
+        payload["stream"] = [root_seed, index]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def summary_row(params: RunParams, summary: RunSummary, cid: Optional[str] = None) -> Dict[str, Any]:
+    """Flat result row: cell id, the cell's RunParams fields, then scalar RunSummary fields."""
+    row: Dict[str, Any] = {"cell_id": cid or cell_id(params)}
+    row.update({f.name: getattr(params, f.name) for f in fields(RunParams) if f.name not in _PATH_FIELDS})
+    data = asdict(summary)
+    data.pop("params", None)
+    data.pop("stopping", None)
+    data.pop("timing", None)
+    dist = data.pop("outcome_distribution", {}) or {}
+    row.update(data)
+    for side, stats in dist.items():
+        row[f"{side}_pct"] = stats["pct"]
+    return row
+
+
+def run_cell(params: RunParams, stream: Any = None, cid: Optional[str] = None) -> Dict[str, Any]:
+    """Run one cell in summary-only mode (events are discarded as they are produced).
+
+    ``stream`` (a SeedSequence) seeds the cell's params.rng backend when params.seed is None;
+    ``cid`` is the row's cell id (defaults to cell_id(params)).
+    """
+    rng = make_rng(params.rng, stream) if stream is not None and params.seed is None else None
+    gen = simulate_hands(params, yield_per_hand=True, rng=rng)
+    try:
+        while True:
+            next(gen)
+    except StopIteration as stop:
+        summary = stop.value
+    return summary_row(params, summary, cid)
+
+
+def journal_path_for(out_path: str) -> str:
+    return out_path + ".journal.ndjson"
+
+
+def read_journal(path: str) -> Dict[str, Dict[str, Any]]:
+    """Completed rows by cell id; a truncated last line from an interrupted run is ignored."""
+    done: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[row["cell_id"]] = row
+    return done
+
+
+def write_table(rows: List[Dict[str, Any]], path: str, fmt: str) -> None:
+    if fmt == "csv":
+        keys: List[str] = []
+        for row in rows:
+            keys.extend(k for k in row if k not in keys)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=keys)
+            writer.writeheader()
+            writer.writerows(rows)
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.Table.from_pylist(rows), path, compression="zstd")
+    else:
+        raise ValueError(f"Unknown sweep format: {fmt}")
+
+
+@dataclass
+class SweepResult:
+    out_path: str
+    journal_path: str
+    total: int
+    skipped: int
+    ran: int
+
+
+def run_sweep(
+    cells: List[RunParams],
+    out_path: str,
+    fmt: Optional[str] = None,
+    workers: Optional[int] = None,
+    on_row: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+    seed: Optional[int] = None,
+) -> SweepResult:
+    """Run every cell not yet in the journal, then write the consolidated table.
+
+    fmt defaults to the output extension (.parquet -> parquet, else csv).
+    on_row(done, total, row) is called as each cell finishes.
+    seed is the root of the spawned streams used by cells without their own seed.
+    """
+    fmt = fmt or ("parquet" if out_path.lower().endswith(".parquet") else "csv")
+    if fmt not in SWEEP_FORMATS:
+        raise ValueError(f"Unknown sweep format: {fmt}")
+    if fmt == "parquet":
+        # 在运行任何组合之前检查，避免全部跑完才在写表时失败
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ValueError("Parquet sweep output requires pyarrow (pip install pyarrow); use .csv otherwise") from e
+    parent = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(parent, exist_ok=True)
+    journal = journal_path_for(out_path)
+    done = read_journal(journal)
+    streams = spawn_seeds(seed, len(cells))
+    ids = [cell_id(p, seed, i) for i, p in enumerate(cells)]
+    todo = [(p, s, c) for p, s, c in zip(cells, streams, ids) if c not in done]
+    skipped = len(cells) - len(todo)
+    finished = skipped
+
+    with open(journal, "a+", encoding="utf-8") as log:
+        # 上次中断可能留下没有换行的残缺行，先把它结束掉
+        if log.tell() > 0:
+            log.seek(log.tell() - 1)
+            if log.read(1) != "\n":
+                log.write("\n")
+
+        def record(row: Dict[str, Any]) -> None:
+            nonlocal finished
+            done[row["cell_id"]] = row
+            log.write(json.dumps(row, ensure_ascii=False) + "\n")
+            log.flush()
+            finished += 1
+            if on_row is not None:
+                on_row(finished, len(cells), row)
+
+        if workers is not None and workers <= 1:
+            for params, stream, cid in todo:
+                record(run_cell(params, stream, cid))
+        elif todo:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            try:
+                futures = [pool.submit(run_cell, p, s, c) for p, s, c in todo]
+                for fut in as_completed(futures):
+                    record(fut.result())
+            finally:
+                # 中断时丢弃排队中的组合，已完成的都已写入日志
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    write_table([done[c] for c in ids], out_path, fmt)
+    return SweepResult(out_path=out_path, journal_path=journal, total=len(cells), skipped=skipped, ran=len(todo))
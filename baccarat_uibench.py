@@ -0,0 +1,258 @@
+"""
+页面渲染基准 / Headless page-render timing for app.py
+
+用 Streamlit 的 AppTest 无界面执行 page_play_mode / page_fast_mode，按局数矩阵测量每次
+脚本重跑（rerun）的开销：
+
+    script      整次脚本执行耗时
+    to_df       app.to_df 耗时
+    summary     app.render_summary 耗时
+    charts      st.altair_chart 耗时（Vega-Lite 规格生成 + 数据序列化）
+    tables      st.dataframe 耗时
+    payload     该次执行发往浏览器的 ForwardMsg 序列化字节数与条数
+
+每个页面分三个阶段（一次用户操作可能因 st.rerun 触发多次执行，按操作汇总）：first（首次渲染表单）、load（提交并得到结果：播放模式“跳至报告”、
+极速模式“运行”并等待任务完成）、rerun（结果已就绪时的普通重跑，重复 --repeats 次，
+即用户每次操作控件时的响应开销）。
+
+    python baccarat_uibench.py --hands 1000,10000,100000 --repeats 5 --out out/ui_bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+
+PAGES = ("play", "fast")
+DEFAULT_HANDS = (1000, 10000, 100000)
+TIMERS = ("to_df", "summary", "charts", "tables")
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# AppTest 执行的脚本：页面函数经 page_run 包装以记录每次执行
+_SCRIPT = """
+import sys
+sys.path.insert(0, {here!r})
+import app
+import baccarat_uibench
+baccarat_uibench.page_run(app.page_{page}_mode)
+"""
+
+# 当前脚本执行的累计计时；脚本在单个线程中运行，无需加锁
+_current: Dict[str, float] = {}
+_runs: List[Dict[str, float]] = []
+
+
+def _timed(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current[name] = _current.get(name, 0.0) + time.perf_counter() - t0
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def page_run(page: Callable[[], None]) -> None:
+    """Run ``page`` and record one entry in the run log (also when st.rerun/st.stop interrupts it)."""
+    _current.clear()
+    for key in TIMERS + ("payload_bytes", "messages"):
+        _current[key] = 0.0
+    t0 = time.perf_counter()
+    try:
+        page()
+    finally:
+        _current["script"] = time.perf_counter() - t0
+        _runs.append(dict(_current))
+
+
+@contextmanager
+def instrument() -> Iterator[None]:
+    """Patch app / Streamlit entry points with timers for the duration of the block."""
+    import app
+    import streamlit as st
+    from streamlit.delta_generator import DeltaGenerator
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+
+    enqueue = ForwardMsgQueue.enqueue
+
+    def counting_enqueue(self, msg):
+        _current["payload_bytes"] = _current.get("payload_bytes", 0.0) + msg.ByteSize()
+        _current["messages"] = _current.get("messages", 0.0) + 1
+        return enqueue(self, msg)
+
+    saved = [
+        (app, "to_df", app.to_df),
+        (app, "render_summary", app.render_summary),
+        (DeltaGenerator, "altair_chart", DeltaGenerator.altair_chart),
+        (DeltaGenerator, "dataframe", DeltaGenerator.dataframe),
+        (st, "altair_chart", st.altair_chart),
+        (st, "dataframe", st.dataframe),
+        (ForwardMsgQueue, "enqueue", enqueue),
+    ]
+    app.to_df = _timed("to_df", app.to_df)
+    app.render_summary = _timed("summary", app.render_summary)
+    DeltaGenerator.altair_chart = _timed("charts", DeltaGenerator.altair_chart)
+    DeltaGenerator.dataframe = _timed("tables", DeltaGenerator.dataframe)
+    # st.xxx 是导入时绑定到主容器的方法，不经过类属性
+    st.altair_chart = _timed("charts", st.altair_chart)
+    st.dataframe = _timed("tables", st.dataframe)
+    ForwardMsgQueue.enqueue = counting_enqueue
+    try:
+        yield
+    finally:
+        for owner, name, value in saved:
+            setattr(owner, name, value)
+
+
+def _labels(key: str) -> set:
+    from i18n import LANGUAGES
+    return {lang["translations"].get(key, key) for lang in LANGUAGES.values()}
+
+
+def _button(at, labels: set):
+    for b in at.button:
+        if b.label in labels:
+            return b
+    raise LookupError(f"No button labelled {sorted(labels)}")
+
+
+def _check(at) -> None:
+    if at.exception:
+        raise RuntimeError(f"Page raised: {at.exception[0].message}")
+
+
+def _load_play(at, hands: int, seed: int) -> None:
+    at.number_input(key="play_hands").set_value(hands)
+    at.text_input(key="play_seed_str").input(str(seed))
+    at.slider(key="play_speed").set_value(0.0)
+    at.checkbox(key="play_auto_scroll").uncheck()
+    _button(at, _labels("skip_to_report")).click()
+    at.run()
+
+
+def _load_fast(at, hands: int, seed: int) -> None:
+    at.number_input(key="fast_hands").set_value(hands)
+    at.text_input(key="fast_seed_str").input(str(seed))
+    _button(at, {"运行（只看报告）"}).click()
+    at.run()
+    # 进行中只有任务列表片段轮询（AppTest 不触发 run_every）；等任务完成后整页重跑渲染结果
+    import app
+    for job in app._get_job_manager().list_jobs():
+        job.wait()
+    at.run()
+
+
+_LOADERS = {"play": _load_play, "fast": _load_fast}
+
+
+_KEYS = ("script",) + TIMERS + ("payload_bytes", "messages")
+
+
+def _summarize(actions: Sequence[List[Dict[str, float]]]) -> Dict[str, Any]:
+    """Per-action totals (an action may trigger several executions via st.rerun), then median/max over actions."""
+    totals = [{k: sum(r[k] for r in runs) for k in _KEYS} for runs in actions]
+    out: Dict[str, Any] = {"actions": len(totals), "executions": sum(len(runs) for runs in actions)}
+    for key in ("script",) + TIMERS:
+        values = [t[key] for t in totals]
+        out[f"{key}_median"] = statistics.median(values)
+        out[f"{key}_max"] = max(values)
+    out["payload_bytes"] = int(statistics.median(t["payload_bytes"] for t in totals))
+    out["messages"] = int(statistics.median(t["messages"] for t in totals))
+    return out
+
+
+def bench_page(page: str, hands: int, repeats: int = 5, seed: int = 42, timeout: float = 600.0) -> List[Dict[str, Any]]:
+    """Benchmark one page at one hand count; returns one result row per phase."""
+    from streamlit.testing.v1 import AppTest
+
+    if page not in _LOADERS:
+        raise ValueError(f"Unknown page: {page}")
+    at = AppTest.from_string(_SCRIPT.format(here=_HERE, page=page), default_timeout=timeout)
+    rows: List[Dict[str, Any]] = []
+
+    def phase(name: str, action: Callable[[], None], n: int = 1) -> None:
+        actions = []
+        t0 = time.perf_counter()
+        for _ in range(n):
+            start = len(_runs)
+            action()
+            _check(at)
+            actions.append(_runs[start:])
+        wall = time.perf_counter() - t0
+        rows.append({"page": page, "hands": hands, "phase": name, "wall_seconds": wall / n, **_summarize(actions)})
+
+    with instrument():
+        _runs.clear()
+        phase("first", at.run)
+        phase("load", lambda: _LOADERS[page](at, hands, seed))
+        phase("rerun", at.run, max(1, int(repeats)))
+    return rows
+
+
+def run_matrix(pages: Sequence[str] = PAGES, hands: Sequence[int] = DEFAULT_HANDS, repeats: int = 5, seed: int = 42) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    for page in pages:
+        for n in hands:
+            rows.extend(bench_page(page, int(n), repeats=repeats, seed=seed))
+            print(format_rows(rows[-3:], header=not rows[:-3]), flush=True)
+    return rows
+
+
+def format_rows(rows: Sequence[Dict[str, Any]], header: bool = True) -> str:
+    def ms(v: Optional[float]) -> str:
+        return "-" if v is None else f"{v * 1000:,.1f}"
+
+    lines = []
+    if header:
+        lines.append(
+            f"{'page':<5} {'hands':>8} {'phase':<6} {'exec':>4} {'script ms':>10} {'to_df':>9} "
+            f"{'summary':>9} {'charts':>9} {'tables':>9} {'payload KiB':>12} {'msgs':>5}"
+        )
+    for r in rows:
+        lines.append(
+            f"{r['page']:<5} {r['hands']:>8,} {r['phase']:<6} {r['executions']:>4} {ms(r['script_median']):>10} "
+            f"{ms(r['to_df_median']):>9} {ms(r['summary_median']):>9} {ms(r['charts_median']):>9} "
+            f"{ms(r['tables_median']):>9} {r['payload_bytes'] / 1024:>12,.1f} {r['messages']:>5}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from baccarat_bench import environment
+
+    parser = argparse.ArgumentParser(description="Headless page-render timing for app.py via Streamlit AppTest")
+    parser.add_argument("--pages", type=str, default=",".join(PAGES), help="play,fast")
+    parser.add_argument("--hands", type=str, default=",".join(str(h) for h in DEFAULT_HANDS), help="局数矩阵，逗号分隔")
+    parser.add_argument("--repeats", type=int, default=5, help="结果就绪后的重跑次数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=str, default=None, help="结果 JSON 路径")
+    args = parser.parse_args(argv)
+    # AppTest 每次运行都会按配置重置日志级别，use_container_width 等弃用提示会刷屏
+    for name in ("streamlit.deprecation_util", "streamlit.runtime.scriptrunner_utils.script_run_context"):
+        logging.getLogger(name).disabled = True
+
+    pages = [p.strip() for p in args.pages.split(",") if p.strip()]
+    hands = [int(h) for h in args.hands.split(",") if h.strip()]
+    rows = run_matrix(pages, hands, repeats=args.repeats, seed=args.seed)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        payload = {
+            "environment": environment(),
+            "results": rows,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    # 脚本内 import 的是 baccarat_uibench 模块而不是 __main__，计时状态须落在同一模块里
+    import baccarat_uibench
+    baccarat_uibench.main()
@@ -0,0 +1,326 @@
+"""
+方差缩减对比 / Variance-reduced strategy comparisons
+
+比较多个配置（策略或进阶参数）时，用以下方法在相同会话数下缩小置信区间，并报告各自的
+方差缩减倍数（VRF = 朴素估计方差 / 缩减后方差，即同等精度下所需会话数的倍数）：
+
+- 共同随机数（CRN）：所有配置使用同一个牌靴随机流，每个会话在各配置下发到完全相同的牌；
+  差值估计的方差与独立运行的 Var(A) + Var(B) 对比；
+- 对偶牌靴：会话两两成对，第二个会话的每一副牌靴是第一个的“镜像”（点数 v -> (10 - v) % 10，
+  保持整副牌的点数分布不变）；
+- 控制变量：每个会话押庄/押闲的下注额中，庄赢/闲赢部分减去“下注额 × 精确理论概率”
+  （baccarat_core.outcome_probabilities）作为零均值控制量，回归消去牌运带来的波动。
+
+控制变量的零均值假设基于满靴（off-the-top）理论概率，忽略牌靴消耗与切牌位置的影响。
+平注等配置下盈亏恰好是控制量的线性函数，回归会消去全部方差，估计值退化为满靴理论值，
+区间宽度只剩舍入误差，严重低估了真实不确定性。此时（剩余方差不超过朴素方差的
+CV_DEGENERATE 倍）控制变量结果回退为朴素估计（差值回退为 CRN 估计），cv_degenerate 为 True。
+"""
+from __future__ import annotations
+
+import argparse
+import math
+from dataclasses import dataclass, replace
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from baccarat_core import RunParams, outcome_probabilities
+from baccarat_optimize import expand_space, parse_space
+from baccarat_vector import EnsembleResult, numpy_shoe_factory, simulate_sessions
+
+
+METRICS = ("total_profit", "roi", "final_bankroll")
+
+# 控制变量剩余方差 / 朴素方差不超过该值时视为退化（控制量解释了全部方差）
+CV_DEGENERATE = 1e-9
+
+# 对偶映射：点数 v -> (10 - v) % 10，0 点牌保持不变
+MIRROR = np.array([0, 9, 8, 7, 6, 5, 4, 3, 2, 1], dtype=np.int8)
+
+
+class AntitheticShoeFactory:
+    """Shoe factory pairing sessions (2j, 2j+1): the k-th shoe of one is the mirror of the other's.
+
+    Paired sessions reshuffle at different hands, so each base shoe is kept
+    until the partner asks for its k-th shoe.
+    """
+
+    def __init__(self, decks: int, rng: np.random.Generator):
+        self._make = numpy_shoe_factory(decks, rng)
+        self._n_cards = int(decks) * 52
+        self._count: Dict[int, int] = {}
+        self._pending: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def __call__(self, indices: np.ndarray) -> np.ndarray:
+        keys = []
+        for i in indices.tolist():
+            k = self._count.get(i, 0)
+            self._count[i] = k + 1
+            keys.append((i // 2, k, i % 2))
+        # 每个 (j, k) 只生成一次基础牌靴；同一次调用里成对的两个会话共用
+        fresh: Dict[Tuple[int, int], int] = {}
+        for j, k, _odd in keys:
+            if (j, k) not in self._pending and (j, k) not in fresh:
+                fresh[(j, k)] = len(fresh)
+        if fresh:
+            base = self._make(np.arange(len(fresh)))
+            for key, row in fresh.items():
+                self._pending[key] = base[row]
+        out = np.empty((len(keys), self._n_cards), dtype=np.int8)
+        for n, (j, k, odd) in enumerate(keys):
+            shoe = self._pending[(j, k)]
+            out[n] = MIRROR[shoe] if odd else shoe
+        # 成对会话都取过后释放
+        for j, k, _odd in keys:
+            seen = self._count.get(2 * j, 0) > k and self._count.get(2 * j + 1, 0) > k
+            if seen:
+                self._pending.pop((j, k), None)
+        return out
+
+
+def _metric(res: EnsembleResult, metric: str) -> np.ndarray:
+    if metric == "total_profit":
+        return res.total_profit.astype(float)
+    if metric == "roi":
+        return res.roi.astype(float)
+    if metric == "final_bankroll":
+        return res.final_bankroll.astype(float)
+    raise ValueError(f"Unknown metric: {metric}")
+
+
+def _controls(res: EnsembleResult, probs: Dict[str, float]) -> np.ndarray:
+    """Zero-mean controls: per bet side, stake on banker/player wins minus stake x exact probability."""
+    cols = []
+    for side in range(2):
+        staked = res.stakes[side].sum(axis=0)
+        cols.append(res.stakes[side, 0] - probs["player"] * staked)
+        cols.append(res.stakes[side, 1] - probs["banker"] * staked)
+    return np.column_stack(cols)
+
+
+def _cv_adjust(y: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """y - c @ beta with beta fitted by least squares; controls have mean zero, so the mean is kept."""
+    cc = c - c.mean(axis=0)
+    beta, *_ = np.linalg.lstsq(cc, y - y.mean(), rcond=None)
+    return y - c @ beta
+
+
+def _var(x: np.ndarray) -> float:
+    return float(x.var(ddof=1)) if len(x) > 1 else 0.0
+
+
+def _cv_degenerate(y: np.ndarray, y_cv: np.ndarray) -> bool:
+    """True when the controls explain (numerically) all of y's variance."""
+    return _var(y_cv) <= _var(y) * CV_DEGENERATE
+
+
+def _vrf(plain: float, reduced: float) -> Optional[float]:
+    # 剩余方差只剩舍入误差时不给出有限倍数
+    if reduced <= plain * 1e-12:
+        return None if plain <= 0 else math.inf
+    return plain / reduced
+
+
+@dataclass
+class ConfigEstimate:
+    name: str
+    overrides: Dict[str, Any]
+    sessions: int
+    mean: float
+    half_width: float
+    mean_cv: float
+    half_width_cv: float
+    vrf_cv: Optional[float]
+    cv_degenerate: bool
+    mean_antithetic: float
+    half_width_antithetic: float
+    vrf_antithetic: Optional[float]
+
+
+@dataclass
+class DiffEstimate:
+    name: str
+    baseline: str
+    diff: float
+    half_width_independent: float
+    half_width_crn: float
+    vrf_crn: Optional[float]
+    diff_crn_cv: float
+    half_width_crn_cv: float
+    vrf_crn_cv: Optional[float]
+    crn_cv_degenerate: bool
+
+
+@dataclass
+class ComparisonResult:
+    metric: str
+    sessions: int
+    confidence: float
+    configs: List[ConfigEstimate]
+    diffs: List[DiffEstimate]
+
+    def to_dict(self) -> Dict[str, Any]:
+        from dataclasses import asdict
+        return {
+            "metric": self.metric,
+            "sessions": self.sessions,
+            "confidence": self.confidence,
+            "configs": [asdict(c) for c in self.configs],
+            "diffs": [asdict(d) for d in self.diffs],
+        }
+
+
+def compare_configs(
+    base: RunParams,
+    variants: List[Dict[str, Any]],
+    sessions: int = 1000,
+    metric: str = "total_profit",
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> ComparisonResult:
+    """Compare ``variants`` (RunParams overrides) of ``base``; the first variant is the baseline.
+
+    Every variant is simulated twice with ``sessions`` sessions: once on
+    common shoes (CRN, also used for control variates) and once on antithetic
+    shoe pairs. Half-widths are for the mean of ``metric`` at ``confidence``.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    if not variants:
+        raise ValueError("At least one variant is required")
+    S = int(sessions) - int(sessions) % 2
+    if S < 4:
+        raise ValueError("sessions must be >= 4")
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    probs = outcome_probabilities(int(base.decks))
+    half = lambda var, n: z * math.sqrt(max(0.0, var) / n)  # noqa: E731
+
+    names: List[str] = []
+    crn_y: List[np.ndarray] = []
+    crn_c: List[np.ndarray] = []
+    configs: List[ConfigEstimate] = []
+    for i, overrides in enumerate(variants):
+        params = replace(base, **overrides)
+        name = ", ".join(f"{k}={v}" for k, v in overrides.items()) or "base"
+        # 牌靴使用独立随机流，保证各配置（含 random 策略）发到相同的牌
+        shoes = numpy_shoe_factory(int(params.decks), np.random.default_rng([seed, 0]))
+        crn = simulate_sessions(params, S, seed=seed + 1 + i, shoe_factory=shoes, record_stakes=True)
+        anti = simulate_sessions(
+            params, S, seed=seed + 1 + i,
+            shoe_factory=AntitheticShoeFactory(int(params.decks), np.random.default_rng([seed, 1])),
+        )
+        y = _metric(crn, metric)
+        c = _controls(crn, probs)
+        y_cv = _cv_adjust(y, c)
+        ya = _metric(anti, metric)
+        pair_means = ya.reshape(-1, 2).mean(axis=1)
+        v_plain = _var(y)
+        degenerate = _cv_degenerate(y, y_cv)
+        if degenerate:
+            y_cv = y
+        configs.append(ConfigEstimate(
+            name=name,
+            overrides=dict(overrides),
+            sessions=S,
+            mean=float(y.mean()),
+            half_width=half(v_plain, S),
+            mean_cv=float(y_cv.mean()),
+            half_width_cv=half(_var(y_cv), S),
+            vrf_cv=None if degenerate else _vrf(v_plain, _var(y_cv)),
+            cv_degenerate=degenerate,
+            mean_antithetic=float(ya.mean()),
+            half_width_antithetic=half(_var(pair_means), S // 2),
+            vrf_antithetic=_vrf(_var(ya) / S, _var(pair_means) / (S // 2)),
+        ))
+        names.append(name)
+        crn_y.append(y)
+        crn_c.append(c)
+
+    diffs: List[DiffEstimate] = []
+    for name, y, c in zip(names[1:], crn_y[1:], crn_c[1:]):
+        d = y - crn_y[0]
+        d_cv = _cv_adjust(d, np.column_stack([c, crn_c[0]]))
+        v_indep = _var(y) + _var(crn_y[0])
+        degenerate = _cv_degenerate(d, d_cv)
+        if degenerate:
+            d_cv = d
+        diffs.append(DiffEstimate(
+            name=name,
+            baseline=names[0],
+            diff=float(d.mean()),
+            half_width_independent=half(v_indep, S),
+            half_width_crn=half(_var(d), S),
+            vrf_crn=_vrf(v_indep, _var(d)),
+            diff_crn_cv=float(d_cv.mean()),
+            half_width_crn_cv=half(_var(d_cv), S),
+            vrf_crn_cv=_vrf(v_indep, _var(d_cv)),
+            crn_cv_degenerate=degenerate,
+        ))
+    return ComparisonResult(metric=metric, sessions=S, confidence=confidence, configs=configs, diffs=diffs)
+
+
+def _fmt(v: Any) -> str:
+    if v is None:
+        return "N/A"
+    return f"{v:.6g}" if isinstance(v, float) else str(v)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Variance-reduced comparison of strategies / progression settings")
+    parser.add_argument("--bankroll", type=float, required=True)
+    parser.add_argument("--bet", type=float, required=True)
+    parser.add_argument("--hands", type=int, required=True)
+    parser.add_argument("--decks", type=int, default=8, choices=[6, 8])
+    parser.add_argument("--penetration", type=int, default=52)
+    parser.add_argument("--strategy", type=str, default="flip-opposite-wait")
+    parser.add_argument(
+        "--compare",
+        action="append",
+        required=True,
+        help="对比维度，可重复，例如 strategy=always-banker,always-player；第一个组合为基准",
+    )
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--metric", type=str, default="total_profit", choices=list(METRICS))
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    base = RunParams(
+        bankroll=args.bankroll,
+        bet=args.bet,
+        hands=args.hands,
+        decks=args.decks,
+        penetration=args.penetration,
+        strategy=args.strategy,
+    )
+    result = compare_configs(
+        base,
+        expand_space(parse_space(args.compare)),
+        sessions=args.sessions,
+        metric=args.metric,
+        confidence=args.confidence,
+        seed=args.seed,
+    )
+    print(f"metric={result.metric}; sessions={result.sessions}; confidence={result.confidence}")
+    print("config\tmean\t±plain\tmean_cv\t±cv\tvrf_cv\tmean_anti\t±anti\tvrf_anti")
+    for c in result.configs:
+        print("\t".join(_fmt(v) for v in (
+            c.name, c.mean, c.half_width, c.mean_cv, c.half_width_cv, "degenerate" if c.cv_degenerate else c.vrf_cv,
+            c.mean_antithetic, c.half_width_antithetic, c.vrf_antithetic,
+        )))
+    if result.diffs:
+        print(f"\ndifference vs {result.diffs[0].baseline}")
+        print("config\tdiff\t±independent\t±crn\tvrf_crn\tdiff_crn_cv\t±crn_cv\tvrf_crn_cv")
+        for d in result.diffs:
+            print("\t".join(_fmt(v) for v in (
+                d.name, d.diff, d.half_width_independent, d.half_width_crn, d.vrf_crn,
+                d.diff_crn_cv, d.half_width_crn_cv, "degenerate" if d.crn_cv_degenerate else d.vrf_crn_cv,
+            )))
+    if any(c.cv_degenerate for c in result.configs) or any(d.crn_cv_degenerate for d in result.diffs):
+        print("\ndegenerate: controls explain all variance (e.g. flat bets); cv columns fall back to the plain / crn estimate")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+向量化多会话引擎 / Vectorized multi-session engine
+
+把成千上万个相互独立的会话放在 NumPy 数组里同步推进：每个会话一副牌靴（按抽牌顺序
+存放点数）、资金、连输/连赢计数、持续倍率和策略状态各占数组的一列。每手牌的发牌、
+补牌规则、策略决策、注码调整与结算都以掩码方式批量完成，语义与
+baccarat_core._simulate_hands_iter 保持一致。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from baccarat_core import RANKS, RunParams, banker_draws, card_point
+from baccarat_rng import numpy_generator
+
+
+NO_BET = 0
+PLAYER = 1
+BANKER = 2
+TIE = 3
+
+_LAST_NONE = 0
+_LAST_WIN = 1
+_LAST_LOSS = 2
+
+VECTOR_STRATEGIES = ("flip-opposite-wait", "always-banker", "always-player", "alternate", "random")
+
+# BANKER_DRAW[banker_total, player_third_value]（player_third_value=10 表示闲家未补牌）
+BANKER_DRAW = np.array(
+    [[banker_draws(bt, pv if pv < 10 else None) for pv in range(11)] for bt in range(10)],
+    dtype=bool,
+)
+
+# shoe_factory(session_indices) -> (len(indices), decks*52) 的点数数组，按抽牌先后排列
+ShoeFactory = Callable[[np.ndarray], np.ndarray]
+
+
+def deck_points(decks: int) -> np.ndarray:
+    """Card points of an unshuffled shoe."""
+    return np.array([card_point(r) for _ in range(decks) for r in RANKS for _s in range(4)], dtype=np.int8)
+
+
+def numpy_shoe_factory(decks: int, rng: np.random.Generator) -> ShoeFactory:
+    base = deck_points(decks)
+
+    def make(indices: np.ndarray) -> np.ndarray:
+        return rng.permuted(np.tile(base, (len(indices), 1)), axis=1)
+
+    return make
+
+
+def _progression_factor(inc_pct: float, dec_pct: float) -> float:
+    """Multiplier once a streak is active; increase wins over decrease, as in the core loop."""
+    inc = max(0.0, float(inc_pct or 0.0))
+    dec = max(0.0, float(dec_pct or 0.0))
+    if inc > 0:
+        return 1.0 + inc / 100.0
+    if dec > 0:
+        return max(0.0, 1.0 - dec / 100.0)
+    return 1.0
+
+
+def _directional_persist(persist: np.ndarray, effective: np.ndarray) -> np.ndarray:
+    # 按方向持久化：>1 取最大，<1 取最小
+    return np.where(effective >= 1.0, np.maximum(persist, effective), np.minimum(persist, effective))
+
+
+@dataclass
+class EnsembleResult:
+    """Per-session outcome arrays of a vectorized run (one entry per session)."""
+    params: RunParams
+    sessions: int
+    final_bankroll: np.ndarray
+    total_wagered: np.ndarray
+    bet_hands: np.ndarray
+    observe_hands: np.ndarray
+    push_hands: np.ndarray
+    wins: np.ndarray
+    losses: np.ndarray
+    commission_total: np.ndarray
+    player_wins: np.ndarray
+    banker_wins: np.ndarray
+    ties: np.ndarray
+    cards_dealt_total: np.ndarray
+    shoe_reshuffles: np.ndarray
+    min_bankroll: np.ndarray
+    max_drawdown: np.ndarray
+    # (hands, sessions) 资金轨迹，仅在 record_bankroll=True 时记录
+    bankroll_path: Optional[np.ndarray] = field(default=None, repr=False)
+    # (2, 3, sessions) 下注额按 [下注方-1, 结果-1] 累计（闲/庄 × 闲/庄/和），仅在 record_stakes=True 时记录
+    stakes: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def total_profit(self) -> np.ndarray:
+        return self.final_bankroll - float(self.params.bankroll)
+
+    @property
+    def roi(self) -> np.ndarray:
+        wagered = self.total_wagered
+        return np.divide(self.total_profit, wagered, out=np.zeros_like(wagered), where=wagered > 0)
+
+    @property
+    def ruined(self) -> np.ndarray:
+        """Sessions that can no longer cover the base bet."""
+        return self.final_bankroll < float(self.params.bet)
+
+    def summary(self) -> Dict[str, Any]:
+        fb = self.final_bankroll
+        q = np.percentile(fb, [5, 25, 50, 75, 95])
+        return {
+            "sessions": self.sessions,
+            "hands": int(self.params.hands),
+            "strategy": self.params.strategy,
+            "mean_final_bankroll": float(fb.mean()),
+            "std_final_bankroll": float(fb.std(ddof=1)) if self.sessions > 1 else 0.0,
+            "p5_final_bankroll": float(q[0]),
+            "p25_final_bankroll": float(q[1]),
+            "median_final_bankroll": float(q[2]),
+            "p75_final_bankroll": float(q[3]),
+            "p95_final_bankroll": float(q[4]),
+            "ruin_rate": float(self.ruined.mean()),
+            "mean_roi": float(self.roi.mean()),
+            "mean_total_wagered": float(self.total_wagered.mean()),
+            "mean_max_drawdown": float(self.max_drawdown.mean()),
+        }
+
+    def session_rows(self) -> List[Dict[str, Any]]:
+        cols = {
+            "final_bankroll": self.final_bankroll,
+            "total_profit": self.total_profit,
+            "total_wagered": self.total_wagered,
+            "roi": self.roi,
+            "bet_hands": self.bet_hands,
+            "push_hands": self.push_hands,
+            "wins": self.wins,
+            "losses": self.losses,
+            "commission_total": self.commission_total,
+            "player_wins": self.player_wins,
+            "banker_wins": self.banker_wins,
+            "ties": self.ties,
+            "shoe_reshuffles": self.shoe_reshuffles,
+            "min_bankroll": self.min_bankroll,
+            "max_drawdown": self.max_drawdown,
+        }
+        return [{k: v[i].item() for k, v in cols.items()} for i in range(self.sessions)]
+
+
+def simulate_sessions(
+    params: RunParams,
+    sessions: int,
+    seed: Any = None,
+    shoe_factory: Optional[ShoeFactory] = None,
+    record_bankroll: bool = False,
+    record_stakes: bool = False,
+    on_hand: Optional[Callable[[int, np.ndarray], None]] = None,
+) -> EnsembleResult:
+    """Run ``sessions`` independent sessions of ``params.hands`` hands in lockstep.
+
+    seed (int or SeedSequence) defaults to params.seed; params.rng picks the NumPy bit generator
+    (philox, else the default PCG64). A custom ``shoe_factory`` may supply shoes
+    (e.g. to replay the reference engine's shuffles); it must return card
+    points in draw order with decks*52 columns. record_stakes keeps the
+    stake per (bet side, outcome) for control variates. on_hand(hand_no,
+    bankroll) is called after every hand with the live bankroll array
+    (e.g. to feed streaming aggregators without storing paths).
+    """
+    strategy = params.strategy.lower()
+    if strategy not in VECTOR_STRATEGIES:
+        raise ValueError(f"Unknown strategy: {params.strategy}")
+    S = int(sessions)
+    if S < 1:
+        raise ValueError("sessions must be >= 1")
+    rng = numpy_generator(params.rng, params.seed if seed is None else seed)
+    make_shoes = shoe_factory or numpy_shoe_factory(int(params.decks), rng)
+    n_cards = int(params.decks) * 52
+    penetration = int(params.penetration)
+    idx = np.arange(S)
+
+    base_bet = float(params.bet)
+    loss_start = max(1, int(params.loss_progression_start or 1))
+    win_start = max(1, int(params.win_progression_start or 1))
+    loss_factor = _progression_factor(params.loss_progression_pct, params.loss_progression_dec_pct)
+    win_factor = _progression_factor(params.win_progression_inc_pct, params.win_progression_dec_pct)
+    loss_mode = params.loss_progression_win_mode or "reset"
+    win_mode = params.win_progression_loss_mode or "reset"
+    loss_persist_mode = loss_mode in ("persist", "ignore")
+    win_persist_mode = win_mode in ("persist", "ignore")
+
+    # shoes
+    shoes = make_shoes(idx).astype(np.int8, copy=False)
+    pos = np.zeros(S, dtype=np.int64)
+    shoe_reshuffles = np.ones(S, dtype=np.int64)
+
+    # money & counters
+    bankroll = np.full(S, float(params.bankroll))
+    total_wagered = np.zeros(S)
+    commission_total = np.zeros(S)
+    bet_hands = np.zeros(S, dtype=np.int64)
+    push_hands = np.zeros(S, dtype=np.int64)
+    wins = np.zeros(S, dtype=np.int64)
+    losses = np.zeros(S, dtype=np.int64)
+    player_wins = np.zeros(S, dtype=np.int64)
+    banker_wins = np.zeros(S, dtype=np.int64)
+    ties = np.zeros(S, dtype=np.int64)
+    cards_dealt_total = np.zeros(S, dtype=np.int64)
+    peak = bankroll.copy()
+    min_bankroll = bankroll.copy()
+    max_drawdown = np.zeros(S)
+    path = np.empty((int(params.hands), S)) if record_bankroll else None
+    stakes = np.zeros(6 * S) if record_stakes else None
+
+    # progression state
+    loss_streak = np.zeros(S, dtype=np.int64)
+    win_streak = np.zeros(S, dtype=np.int64)
+    last_bet = np.full(S, _LAST_NONE, dtype=np.int8)
+    loss_persist = np.ones(S)
+    win_persist = np.ones(S)
+
+    # strategy state
+    alt_next = np.full(S, PLAYER, dtype=np.int8)
+    fw_last = np.zeros(S, dtype=np.int8)
+    fw_streak = np.zeros(S, dtype=np.int64)
+    fw_waiting = np.zeros(S, dtype=bool)
+    fw_switched = np.zeros(S, dtype=bool)
+
+    for hand_i in range(int(params.hands)):
+        # reshuffle if penetration reached or insufficient cards for next hand
+        left = n_cards - pos
+        reshuffle = (left < 6) | (left <= penetration)
+        if reshuffle.any():
+            sel = idx[reshuffle]
+            shoes[sel] = make_shoes(sel)
+            pos[sel] = 0
+            shoe_reshuffles[sel] += 1
+
+        # --- strategy decision ---
+        if strategy == "always-banker":
+            side = np.full(S, BANKER, dtype=np.int8)
+        elif strategy == "always-player":
+            side = np.full(S, PLAYER, dtype=np.int8)
+        elif strategy == "alternate":
+            side = alt_next.copy()
+            alt_next = np.where(alt_next == PLAYER, BANKER, PLAYER).astype(np.int8)
+        elif strategy == "random":
+            side = rng.integers(PLAYER, BANKER + 1, size=S, dtype=np.int8)
+        else:
+            opposite = np.where(fw_last == PLAYER, BANKER, PLAYER).astype(np.int8)
+            known = fw_last != 0
+            use_switch = known & fw_switched
+            plain = known & ~fw_switched & ~fw_waiting & (fw_streak <= 1)
+            side = np.where(use_switch | plain, opposite, NO_BET).astype(np.int8)
+            fw_switched = fw_switched & ~use_switch
+
+        # --- bet sizing ---
+        betting = side != NO_BET
+        multiplier = np.ones(S)
+        after_loss = last_bet == _LAST_LOSS
+        if after_loss.any():
+            eff = np.where(loss_streak >= loss_start, loss_factor, 1.0)
+            if loss_persist_mode:
+                eff = _directional_persist(loss_persist, eff)
+            multiplier = np.where(after_loss, eff, multiplier)
+        after_win = last_bet == _LAST_WIN
+        if after_win.any():
+            eff = np.where(win_streak >= win_start, win_factor, 1.0)
+            if win_persist_mode:
+                eff = _directional_persist(win_persist, eff)
+            multiplier = np.where(after_win, eff, multiplier)
+        bet_amount = np.where(betting, np.round(np.maximum(0.0, base_bet * multiplier), 2), 0.0)
+        # bankroll check for betting; if insufficient, treat as observe
+        broke = betting & (bankroll < bet_amount)
+        side = np.where(broke, NO_BET, side).astype(np.int8)
+        bet_amount = np.where(broke, 0.0, bet_amount)
+        betting = side != NO_BET
+        bet_hands += betting
+        total_wagered += bet_amount
+
+        # --- deal (player, player, banker, banker, then thirds) ---
+        p1 = shoes[idx, pos]
+        p2 = shoes[idx, pos + 1]
+        b1 = shoes[idx, pos + 2]
+        b2 = shoes[idx, pos + 3]
+        pos += 4
+        pt = (p1 + p2) % 10
+        bt = (b1 + b2) % 10
+        natural = (pt >= 8) | (bt >= 8)
+        p_draw = ~natural & (pt <= 5)
+        p3 = shoes[idx, pos]
+        pos += p_draw
+        pt = np.where(p_draw, (pt + p3) % 10, pt)
+        p3_code = np.where(p_draw, p3, 10)
+        b_draw = ~natural & BANKER_DRAW[bt, p3_code]
+        b3 = shoes[idx, pos]
+        pos += b_draw
+        bt = np.where(b_draw, (bt + b3) % 10, bt)
+        cards_dealt_total += 4 + p_draw + b_draw
+
+        outcome = np.where(pt > bt, PLAYER, np.where(bt > pt, BANKER, TIE)).astype(np.int8)
+        player_wins += outcome == PLAYER
+        banker_wins += outcome == BANKER
+        is_tie = outcome == TIE
+        ties += is_tie
+
+        # --- settle ---
+        push = betting & is_tie
+        won = betting & ~is_tie & (side == outcome)
+        lost = betting & ~is_tie & (side != outcome)
+        push_hands += push
+        if stakes is not None:
+            cell = ((side[betting].astype(np.int64) - 1) * 3 + outcome[betting] - 1) * S + idx[betting]
+            stakes += np.bincount(cell, weights=bet_amount[betting], minlength=6 * S)
+        commission = np.where(won & (outcome == BANKER), bet_amount * 0.05, 0.0)
+        win_amount = np.where(won, bet_amount - commission, np.where(lost, -bet_amount, 0.0))
+        commission_total += commission
+        wins += won
+        losses += lost
+
+        if won.any():
+            loss_streak = np.where(won, 0, loss_streak)
+            win_streak = np.where(won, win_streak + 1, win_streak)
+            last_bet = np.where(won, _LAST_WIN, last_bet).astype(np.int8)
+            if loss_mode == "reset":
+                loss_persist = np.where(won, 1.0, loss_persist)
+            if win_persist_mode:
+                eff = np.where(win_streak >= win_start, win_factor, 1.0)
+                win_persist = np.where(won, _directional_persist(win_persist, eff), win_persist)
+        if lost.any():
+            win_streak = np.where(lost, 0, win_streak)
+            loss_streak = np.where(lost, loss_streak + 1, loss_streak)
+            last_bet = np.where(lost, _LAST_LOSS, last_bet).astype(np.int8)
+            if win_mode == "reset":
+                win_persist = np.where(lost, 1.0, win_persist)
+            if loss_persist_mode:
+                eff = np.where(loss_streak >= loss_start, loss_factor, 1.0)
+                loss_persist = np.where(lost, _directional_persist(loss_persist, eff), loss_persist)
+
+        bankroll += win_amount
+        peak = np.maximum(peak, bankroll)
+        np.minimum(min_bankroll, bankroll, out=min_bankroll)
+        np.maximum(max_drawdown, peak - bankroll, out=max_drawdown)
+        if path is not None:
+            path[hand_i] = bankroll
+        if on_hand is not None:
+            on_hand(hand_i + 1, bankroll)
+
+        # --- strategy observes outcome ---
+        if strategy == "flip-opposite-wait":
+            decided = ~is_tie
+            first = decided & (fw_last == 0)
+            same = decided & ~first & (outcome == fw_last)
+            flip = decided & ~first & ~same
+            fw_streak = np.where(first | flip, 1, np.where(same, fw_streak + 1, fw_streak))
+            fw_switched = np.where(first, False, fw_switched | (flip & fw_waiting))
+            fw_waiting = np.where(first | flip, False, np.where(same & (fw_streak >= 2), True, fw_waiting))
+            fw_last = np.where(first | flip, outcome, fw_last).astype(np.int8)
+
+    return EnsembleResult(
+        params=params,
+        sessions=S,
+        final_bankroll=np.round(bankroll, 2),
+        total_wagered=np.round(total_wagered, 2),
+        bet_hands=bet_hands,
+        observe_hands=int(params.hands) - bet_hands,
+        push_hands=push_hands,
+        wins=wins,
+        losses=losses,
+        commission_total=np.round(commission_total, 2),
+        player_wins=player_wins,
+        banker_wins=banker_wins,
+        ties=ties,
+        cards_dealt_total=cards_dealt_total,
+        shoe_reshuffles=shoe_reshuffles,
+        min_bankroll=np.round(min_bankroll, 2),
+        max_drawdown=np.round(max_drawdown, 2),
+        bankroll_path=path,
+        stakes=stakes.reshape(2, 3, S) if stakes is not None else None,
+    )
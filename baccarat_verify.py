@@ -0,0 +1,377 @@
+"""
+引擎等价性校验 / Engine equivalence verifier
+
+以 baccarat_core 的 BaccaratGame.deal_one_hand + _simulate_hands_iter 为参照实现，在相同种子
+（相同牌序）下运行其他引擎，逐局逐字段比对 HandEvent，并比对 RunSummary：
+
+    replay   baccarat_replay.ReplayGame 回放参照运行的牌面
+    vector   baccarat_vector.simulate_sessions（单会话，牌靴由同一 RNG 后端按相同种子洗出）；
+             只记录逐局资金，故逐局仅比对 bankroll_after
+
+新引擎在 ENGINES 中登记一个函数即可接入：engine(params, reference_events) -> EngineRun。
+random 策略与洗牌共用一个 RNG，不重放洗牌的引擎无法复现其决策，这类组合会被跳过。
+
+另有统计检验：用大样本的庄/闲/和频数对 outcome_probabilities 的精确概率做卡方拟合检验
+（自由度 2，p = exp(-χ²/2)）。
+
+    python baccarat_verify.py --hands 5000 --seeds 1,2,3
+    python baccarat_verify.py --engines vector --stats-hands 2000000
+    python baccarat_verify.py --rngs mt,pcg64,philox
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from baccarat_core import (
+    HandEvent,
+    RunParams,
+    RunSummary,
+    Shoe,
+    outcome_probabilities,
+    simulate_hands,
+)
+from baccarat_rng import DEFAULT_RNG, RNG_BACKENDS, make_rng
+
+
+EVENT_FIELDS: Tuple[str, ...] = tuple(f.name for f in fields(HandEvent) if f.name != "timestamp")
+# 与实现无关或依赖运行环境的汇总字段
+SUMMARY_SKIP = frozenset({"timing", "stopping"})
+OUTCOMES = ("player", "banker", "tie")
+DEFAULT_STRATEGIES = ("flip-opposite-wait", "always-banker", "always-player", "alternate", "random")
+# 进阶设置组合：平注、连输加注（重置/保持）、连赢加注、连输减注
+DEFAULT_PROGRESSIONS: Dict[str, Dict[str, Any]] = {
+    "flat": {},
+    "loss-reset": {"loss_progression_pct": 50.0, "loss_progression_start": 2},
+    "loss-persist": {"loss_progression_pct": 40.0, "loss_progression_win_mode": "persist"},
+    "win-inc": {"win_progression_inc_pct": 50.0, "win_progression_loss_mode": "persist"},
+    "loss-dec": {"loss_progression_dec_pct": 30.0, "loss_progression_win_mode": "ignore"},
+}
+
+
+@dataclass
+class EngineRun:
+    """What an engine reproduced: per-hand columns (by HandEvent field) and summary fields."""
+    columns: Dict[str, Sequence[Any]]
+    summary: Dict[str, Any]
+
+
+@dataclass
+class Mismatch:
+    engine: str
+    case: str
+    where: str          # "hand <n>" / "summary" / "length"
+    field: str
+    expected: Any
+    actual: Any
+
+
+@dataclass
+class CaseResult:
+    engine: str
+    case: str
+    hands: int
+    fields_checked: int = 0
+    mismatches: List[Mismatch] = field(default_factory=list)
+    skipped: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.skipped is None and not self.mismatches
+
+
+class NotComparable(Exception):
+    """Raised by an engine that cannot reproduce the reference for these params."""
+
+
+def _event_columns(events: Sequence[HandEvent]) -> Dict[str, List[Any]]:
+    return {name: [getattr(e, name) for e in events] for name in EVENT_FIELDS}
+
+
+def _summary_dict(summary: RunSummary) -> Dict[str, Any]:
+    return {k: v for k, v in asdict(summary).items() if k not in SUMMARY_SKIP}
+
+
+def run_reference(params: RunParams) -> Tuple[List[HandEvent], RunSummary]:
+    events, summary = simulate_hands(params, yield_per_hand=False)
+    return events, summary
+
+
+def replay_engine(params: RunParams, reference: Sequence[HandEvent]) -> EngineRun:
+    from baccarat_replay import ReplayGame, ReplayHand
+
+    if params.strategy == "random":
+        raise NotComparable("random strategy shares the shoe RNG; replay does not shuffle")
+    hands = []
+    last_left: Optional[int] = None
+    for e in reference:
+        new_shoe = last_left is None or e.shoe_cards_left > last_left
+        hands.append(ReplayHand(new_shoe, e.outcome, tuple(e.player_cards), tuple(e.banker_cards), e.shoe_cards_left))
+        last_left = e.shoe_cards_left
+    events, summary = simulate_hands(params, yield_per_hand=False, game=ReplayGame(hands, params.decks))
+    return EngineRun(_event_columns(events), _summary_dict(summary))
+
+
+def _reference_shoe_factory(params: RunParams):
+    """Shoes in the exact order the reference engine shuffles them (same backend and seed)."""
+    import numpy as np
+
+    shoe = Shoe(decks=params.decks, rng=make_rng(params.rng, params.seed))
+    first = [True]
+
+    def make(indices):
+        if not first[0]:
+            shoe.reset()
+        first[0] = False
+        return np.array([[c.point for c in reversed(shoe.cards)]], dtype=np.int8)
+
+    return make
+
+
+def vector_engine(params: RunParams, reference: Sequence[HandEvent]) -> EngineRun:
+    from baccarat_vector import simulate_sessions
+
+    if params.strategy == "random":
+        raise NotComparable("random strategy draws decisions from the NumPy RNG")
+    res = simulate_sessions(params, sessions=1, shoe_factory=_reference_shoe_factory(params), record_bankroll=True)
+    path = [round(float(x), 2) for x in res.bankroll_path[:, 0]]
+    initial = float(params.bankroll)
+    summary = {
+        name: getattr(res, name)[0].item()
+        for name in (
+            "final_bankroll", "total_wagered", "bet_hands", "observe_hands", "push_hands", "wins", "losses",
+            "commission_total", "player_wins", "banker_wins", "ties", "cards_dealt_total", "shoe_reshuffles",
+            "max_drawdown",
+        )
+    }
+    summary["trough_bankroll"] = res.min_bankroll[0].item()
+    summary["peak_bankroll"] = round(max([initial] + path), 2)
+    return EngineRun({"bankroll_after": path}, summary)
+
+
+ENGINES: Dict[str, Callable[[RunParams, Sequence[HandEvent]], EngineRun]] = {
+    "replay": replay_engine,
+    "vector": vector_engine,
+}
+
+
+def _same(a: Any, b: Any) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is b
+        return math.isclose(float(a), float(b), rel_tol=1e-12, abs_tol=1e-9)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def compare_run(
+    engine: str,
+    case: str,
+    reference_events: Sequence[HandEvent],
+    reference_summary: RunSummary,
+    run: EngineRun,
+    max_mismatches: int = 20,
+) -> CaseResult:
+    """Diff every per-hand column and summary field ``run`` provides against the reference."""
+    result = CaseResult(engine, case, len(reference_events))
+    ref_cols = _event_columns(reference_events)
+    ref_summary = _summary_dict(reference_summary)
+
+    def add(where: str, name: str, expected: Any, actual: Any) -> None:
+        if len(result.mismatches) < max_mismatches:
+            result.mismatches.append(Mismatch(engine, case, where, name, expected, actual))
+
+    for name, values in run.columns.items():
+        expected = ref_cols[name]
+        if len(values) != len(expected):
+            add("length", name, len(expected), len(values))
+        for i, (exp, act) in enumerate(zip(expected, values)):
+            result.fields_checked += 1
+            if not _same(exp, act):
+                add(f"hand {i + 1}", name, exp, act)
+    for name, act in run.summary.items():
+        result.fields_checked += 1
+        if not _same(ref_summary[name], act):
+            add("summary", name, ref_summary[name], act)
+    return result
+
+
+def default_cases(
+    hands: int = 2000,
+    seeds: Sequence[int] = (1, 2),
+    strategies: Sequence[str] = DEFAULT_STRATEGIES,
+    progressions: Optional[Dict[str, Dict[str, Any]]] = None,
+    decks: Sequence[int] = (6, 8),
+    rngs: Sequence[str] = (DEFAULT_RNG,),
+) -> List[Tuple[str, RunParams]]:
+    """Parameter matrix; penetration alternates between the default and a deep cut to vary reshuffles."""
+    progressions = DEFAULT_PROGRESSIONS if progressions is None else progressions
+    cases = []
+    for rng in rngs:
+        for d in decks:
+            for strategy in strategies:
+                for prog_name, prog in progressions.items():
+                    for seed in seeds:
+                        penetration = 52 if seed % 2 else 14
+                        # 小本金让破产（资金不足转观望）分支也被覆盖
+                        bankroll = 2000.0 if prog else 100000.0
+                        params = RunParams(
+                            bankroll=bankroll, bet=100.0, hands=int(hands), decks=d, penetration=penetration,
+                            strategy=strategy, seed=seed, rng=rng, **prog,
+                        )
+                        cases.append((f"{strategy},{prog_name},decks={d},pen={penetration},seed={seed},rng={rng}", params))
+    return cases
+
+
+def verify(
+    cases: Iterable[Tuple[str, RunParams]],
+    engines: Optional[Sequence[str]] = None,
+    max_mismatches: int = 20,
+) -> List[CaseResult]:
+    names = list(engines or ENGINES)
+    for name in names:
+        if name not in ENGINES:
+            raise ValueError(f"Unknown engine: {name}")
+    results: List[CaseResult] = []
+    for case, params in cases:
+        events, summary = run_reference(params)
+        for name in names:
+            try:
+                run = ENGINES[name](params, events)
+            except NotComparable as e:
+                results.append(CaseResult(name, case, len(events), skipped=str(e)))
+                continue
+            results.append(compare_run(name, case, events, summary, run, max_mismatches))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# 统计检验 / Statistical checks
+# ---------------------------------------------------------------------------
+
+@dataclass
+class FrequencyCheck:
+    engine: str
+    rng: str
+    decks: int
+    hands: int
+    counts: Dict[str, int]
+    expected: Dict[str, float]
+    chi2: float
+    p_value: float
+    alpha: float
+
+    @property
+    def passed(self) -> bool:
+        return self.p_value >= self.alpha
+
+
+def chi_square(counts: Dict[str, int], probs: Dict[str, float]) -> Tuple[float, float]:
+    """Pearson chi-square over player/banker/tie; with 2 degrees of freedom the p-value is exp(-x/2)."""
+    n = sum(counts[k] for k in OUTCOMES)
+    stat = sum((counts[k] - n * probs[k]) ** 2 / (n * probs[k]) for k in OUTCOMES)
+    return stat, math.exp(-stat / 2.0)
+
+
+def reference_outcome_counts(decks: int, hands: int, seed: int, rng: str = DEFAULT_RNG) -> Dict[str, int]:
+    params = RunParams(bankroll=1e12, bet=1.0, hands=int(hands), decks=decks, strategy="always-banker", seed=seed, rng=rng)
+    _, summary = simulate_hands(params, yield_per_hand=False)
+    return {"player": summary.player_wins, "banker": summary.banker_wins, "tie": summary.ties}
+
+
+def vector_outcome_counts(decks: int, hands: int, seed: int, rng: str = DEFAULT_RNG, sessions: int = 1000) -> Dict[str, int]:
+    from baccarat_vector import simulate_sessions
+
+    per = max(1, -(-int(hands) // sessions))
+    params = RunParams(bankroll=1e12, bet=1.0, hands=per, decks=decks, strategy="always-banker", seed=seed, rng=rng)
+    res = simulate_sessions(params, sessions=sessions)
+    return {"player": int(res.player_wins.sum()), "banker": int(res.banker_wins.sum()), "tie": int(res.ties.sum())}
+
+
+# 统计检验用的抽样函数：engine -> (decks, hands, seed, rng) -> 频数
+OUTCOME_SAMPLERS: Dict[str, Callable[[int, int, int, str], Dict[str, int]]] = {
+    "reference": reference_outcome_counts,
+    "vector": vector_outcome_counts,
+}
+
+
+def frequency_checks(
+    engines: Optional[Sequence[str]] = None,
+    decks: Sequence[int] = (6, 8),
+    hands: int = 1_000_000,
+    seed: int = 12345,
+    alpha: float = 1e-3,
+    rngs: Sequence[str] = (DEFAULT_RNG,),
+) -> List[FrequencyCheck]:
+    checks = []
+    for name in engines or OUTCOME_SAMPLERS:
+        for rng in rngs:
+            for d in decks:
+                counts = OUTCOME_SAMPLERS[name](d, hands, seed, rng)
+                probs = outcome_probabilities(d)
+                stat, p = chi_square(counts, probs)
+                checks.append(FrequencyCheck(name, rng, d, sum(counts.values()), counts, probs, stat, p, alpha))
+    return checks
+
+
+def format_results(results: Sequence[CaseResult], checks: Sequence[FrequencyCheck]) -> str:
+    lines = []
+    by_engine: Dict[str, List[CaseResult]] = {}
+    for r in results:
+        by_engine.setdefault(r.engine, []).append(r)
+    for engine, rs in by_engine.items():
+        ok = sum(1 for r in rs if r.ok)
+        skipped = sum(1 for r in rs if r.skipped)
+        failed = [r for r in rs if r.mismatches]
+        checked = sum(r.fields_checked for r in rs)
+        lines.append(f"{engine:<10} {ok} equal, {len(failed)} differ, {skipped} skipped; {checked:,} fields compared")
+        for r in failed:
+            for m in r.mismatches[:5]:
+                lines.append(f"    {r.case}: {m.where} {m.field}: expected {m.expected!r}, got {m.actual!r}")
+    for c in checks:
+        freq = "  ".join(
+            f"{k} {c.counts[k] / c.hands:.5f} (exact {c.expected[k]:.5f})" for k in OUTCOMES
+        )
+        verdict = "ok" if c.passed else "FAIL"
+        lines.append(f"{c.engine:<10} {c.rng:<6} decks={c.decks} n={c.hands:,}  {freq}  chi2={c.chi2:.3f} p={c.p_value:.4f} {verdict}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Verify alternative engines against the reference simulation loop")
+    parser.add_argument("--engines", type=str, default=",".join(ENGINES), help="逗号分隔：" + ",".join(ENGINES))
+    parser.add_argument("--hands", type=int, default=2000, help="每个用例的局数")
+    parser.add_argument("--seeds", type=str, default="1,2", help="逗号分隔的种子")
+    parser.add_argument("--strategies", type=str, default=",".join(DEFAULT_STRATEGIES))
+    parser.add_argument("--rngs", type=str, default=DEFAULT_RNG, help="随机数后端，逗号分隔：" + ",".join(RNG_BACKENDS))
+    parser.add_argument("--stats-hands", type=int, default=1_000_000, help="统计检验样本局数；0 跳过")
+    parser.add_argument("--stats-engines", type=str, default=",".join(OUTCOME_SAMPLERS))
+    parser.add_argument("--alpha", type=float, default=1e-3, help="卡方检验显著性水平")
+    args = parser.parse_args(argv)
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    rngs = [r.strip() for r in args.rngs.split(",") if r.strip()]
+    cases = default_cases(
+        hands=args.hands,
+        seeds=[int(s) for s in args.seeds.split(",") if s.strip()],
+        strategies=[s.strip() for s in args.strategies.split(",") if s.strip()],
+        rngs=rngs,
+    )
+    results = verify(cases, engines)
+    checks: List[FrequencyCheck] = []
+    if args.stats_hands > 0:
+        stats_engines = [e.strip() for e in args.stats_engines.split(",") if e.strip()]
+        checks = frequency_checks(stats_engines, hands=args.stats_hands, alpha=args.alpha, rngs=rngs)
+    print(format_results(results, checks))
+    if any(r.mismatches for r in results) or any(not c.passed for c in checks):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
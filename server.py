@@ -0,0 +1,452 @@
+"""
+无界面 HTTP 模拟接口 / Headless HTTP simulation API
+
+纯标准库 WSGI 应用，wsgi.py 通过 create_app() 自动发现：
+
+    POST   /simulate                 RunParams JSON -> RunSummary JSON（同步，在线程池中执行，不保留逐局事件）
+    POST   /jobs                     RunParams JSON -> {"job_id": ...}（异步长任务，保留逐局事件，局数上限更低）
+    GET    /jobs/{id}                任务状态；完成后附带 summary
+    GET    /jobs/{id}/events         分页事件 ?offset=0&limit=1000
+    DELETE /jobs/{id}                取消任务
+    GET    /stream?bankroll=..&bet=..&hands=..&hands_per_sec=2&format=sse|ndjson
+                                     逐局推送 HandEvent + 增量 KPI（服务端按速率节流）
+
+按用户的并发任务限制以 REMOTE_ADDR 区分用户；只有在受信任的反向代理之后设置
+API_TRUST_CLIENT_ID=1 时才改用客户端提供的 X-Client-Id 头。
+
+本地运行：python server.py --port 8000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import asdict
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIServer, make_server
+
+from baccarat_core import HandEvent, RunParams, build_strategy, run_params_from_dict, simulate_hands
+from baccarat_history import RunningStats
+from baccarat_jobs import JOB_DONE, JobLimitExceeded, JobManager, ResultCache
+from baccarat_rng import RNG_BACKENDS
+
+
+MAX_BODY_BYTES = 64 * 1024
+_JOB_PATH = re.compile(r"^/jobs/([0-9a-f]+)(/events)?/?$")
+MAX_HANDS_PER_SEC = 1000.0
+# RunParams 字段类型（其余字段按 float 解析）；JSON 与查询字符串共用
+_INT_FIELDS = {"hands", "decks", "penetration", "seed", "loss_progression_start", "win_progression_start"}
+_STR_FIELDS = {"strategy", "loss_progression_win_mode", "win_progression_loss_mode", "rng"}
+_PCT_FIELDS = ("loss_progression_pct", "loss_progression_dec_pct", "win_progression_inc_pct", "win_progression_dec_pct")
+_PROGRESSION_MODES = ("reset", "persist", "ignore")
+
+_STATUS_TEXT = {
+    200: "200 OK",
+    202: "202 Accepted",
+    400: "400 Bad Request",
+    404: "404 Not Found",
+    405: "405 Method Not Allowed",
+    409: "409 Conflict",
+    413: "413 Payload Too Large",
+    429: "429 Too Many Requests",
+    500: "500 Internal Server Error",
+    504: "504 Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _read_json(environ: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+    raw = environ["wsgi.input"].read(length) if length > 0 else b""
+    try:
+        data = json.loads(raw.decode("utf-8") or "{}")
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise HTTPError(400, f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Body must be a JSON object")
+    return data
+
+
+def _query_params(qs: Dict[str, List[str]]) -> Dict[str, Any]:
+    # 类型转换与校验统一在 _coerce_params 中进行
+    return {key: values[-1] for key, values in qs.items()}
+
+
+def _coerce_value(key: str, value: Any) -> Any:
+    """Convert one RunParams field from JSON / query-string form; ValueError on a bad type."""
+    if key in _STR_FIELDS:
+        if not isinstance(value, str):
+            raise ValueError(f"{key} must be a string")
+        return value
+    if key == "seed" and value is None:
+        return None
+    # bool 是 int 的子类，不接受 true/false 作为数值
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{key} must be a number")
+    if key in _INT_FIELDS:
+        if isinstance(value, float):
+            if not value.is_integer():
+                raise ValueError(f"{key} must be an integer")
+            return int(value)
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"{key} must be an integer, got {value!r}")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a number, got {value!r}")
+    if not math.isfinite(number):
+        raise ValueError(f"{key} must be finite")
+    return number
+
+
+def _coerce_params(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: _coerce_value(key, value) for key, value in data.items()}
+
+
+def stream_kpis(stats: RunningStats, event: HandEvent, initial_bankroll: float) -> Dict[str, Any]:
+    profit = round(event.bankroll_after - initial_bankroll, 2)
+    wagered = round(stats.total_wagered, 2)
+    return {
+        "hands": stats.hands,
+        "bankroll": event.bankroll_after,
+        "profit": profit,
+        "total_wagered": wagered,
+        "roi": (profit / wagered) if wagered > 0 else 0.0,
+        "player_wins": stats.player_wins,
+        "banker_wins": stats.banker_wins,
+        "ties": stats.ties,
+        "bet_hands": stats.bet_hands,
+        "hit_rate": stats.hit_rate,
+        "commission_total": round(stats.commission_total, 2),
+    }
+
+
+def _client_id(environ: Dict[str, Any], trust_header: bool = False) -> str:
+    if trust_header and environ.get("HTTP_X_CLIENT_ID"):
+        return environ["HTTP_X_CLIENT_ID"]
+    return environ.get("REMOTE_ADDR") or "anonymous"
+
+
+class _StreamBody:
+    """WSGI response iterable that frees its stream slot on close().
+
+    The server calls close() when the response ends or the client disconnects,
+    even if the body generator never started (a bare generator's finally would
+    not run in that case).
+    """
+
+    def __init__(self, body: Iterator[bytes], release: Callable[[], None]):
+        self._body = body
+        self._release = release
+        self._closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._body
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._body.close()
+        finally:
+            self._release()
+
+
+class SimulationAPI:
+    """WSGI callable exposing the simulator over HTTP."""
+
+    def __init__(
+        self,
+        manager: Optional[JobManager] = None,
+        max_hands: int = 1_000_000,
+        simulate_timeout: float = 300.0,
+        max_streams: int = 64,
+        max_job_hands: int = 100_000,
+        trust_client_id: bool = False,
+    ):
+        if manager is None:
+            # 已完成任务与结果缓存中的逐局事件各自按字节预算淘汰
+            budget = int(float(os.environ.get("JOB_EVENT_BUDGET_MB", "256")) * 2**20)
+            manager = JobManager(
+                max_workers=int(os.environ.get("JOB_WORKERS", "2")),
+                per_user_limit=int(os.environ.get("JOB_PER_USER_LIMIT", "4")),
+                cache=ResultCache(max_event_bytes=budget),
+                max_event_bytes=budget,
+            )
+        self.manager = manager
+        self.max_hands = int(max_hands)
+        # /jobs 保留全部逐局事件，局数上限低于只返回汇总的接口
+        self.max_job_hands = min(int(max_job_hands), self.max_hands)
+        self.trust_client_id = bool(trust_client_id)
+        self.simulate_timeout = float(simulate_timeout)
+        self._stream_slots = threading.BoundedSemaphore(max(1, int(max_streams)))
+
+    # ------------------------------------------------------------------
+    # WSGI entry
+    # ------------------------------------------------------------------
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        method = environ.get("REQUEST_METHOD", "GET").upper()
+        path = environ.get("PATH_INFO", "/") or "/"
+        try:
+            if path.rstrip("/") == "/stream":
+                return self.stream(method, environ, start_response)
+            status, payload = self.dispatch(method, path, environ)
+        except HTTPError as e:
+            status, payload = e.status, {"error": e.message}
+        except Exception as e:  # last-resort guard so the worker thread survives
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        start_response(_STATUS_TEXT.get(status, f"{status} Unknown"), [
+            ("Content-Type", "application/json; charset=utf-8"),
+            ("Content-Length", str(len(body))),
+        ])
+        return [body]
+
+    def dispatch(self, method: str, path: str, environ: Dict[str, Any]) -> Tuple[int, Any]:
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/simulate":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            return self.simulate(environ)
+        if path.rstrip("/") == "/jobs":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            return self.create_job(environ)
+        m = _JOB_PATH.match(path)
+        if m:
+            job_id, events = m.group(1), m.group(2)
+            if events:
+                if method != "GET":
+                    raise HTTPError(405, "Use GET")
+                return self.job_events(job_id, environ)
+            if method == "GET":
+                return self.job_status(job_id)
+            if method == "DELETE":
+                return self.cancel_job(job_id)
+            raise HTTPError(405, "Use GET or DELETE")
+        raise HTTPError(404, f"No route for {path}")
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+    def _params(self, environ: Dict[str, Any], data: Optional[Dict[str, Any]] = None) -> RunParams:
+        if data is None:
+            data = _read_json(environ)
+        # 服务端不写文件
+        data.pop("csv_path", None)
+        data.pop("json_path", None)
+        try:
+            params = run_params_from_dict(_coerce_params(data))
+            # 与模拟循环相同的策略构造，未知策略在此处即报错
+            build_strategy(params.strategy, None)
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+        if not (1 <= params.hands <= self.max_hands):
+            raise HTTPError(400, f"hands must be between 1 and {self.max_hands}")
+        if params.bet <= 0 or params.bankroll <= 0:
+            raise HTTPError(400, "bet and bankroll must be positive")
+        if params.decks < 1:
+            raise HTTPError(400, "decks must be at least 1")
+        if not (0 <= params.penetration < params.decks * 52):
+            raise HTTPError(400, f"penetration must be between 0 and {params.decks * 52 - 1} cards")
+        for name in _PCT_FIELDS:
+            if getattr(params, name) < 0:
+                raise HTTPError(400, f"{name} must not be negative")
+        for name in ("loss_progression_win_mode", "win_progression_loss_mode"):
+            if getattr(params, name) not in _PROGRESSION_MODES:
+                raise HTTPError(400, f"{name} must be one of {', '.join(_PROGRESSION_MODES)}")
+        if params.rng not in RNG_BACKENDS:
+            raise HTTPError(400, f"rng must be one of {', '.join(RNG_BACKENDS)}")
+        return params
+
+    def _submit(self, environ: Dict[str, Any], params: RunParams, keep_events: bool = True):
+        try:
+            return self.manager.submit(_client_id(environ, self.trust_client_id), params, keep_events=keep_events)
+        except JobLimitExceeded as e:
+            raise HTTPError(429, str(e))
+
+    def simulate(self, environ: Dict[str, Any]) -> Tuple[int, Any]:
+        params = self._params(environ)
+        # 只返回汇总：不保留逐局事件，内存与局数无关
+        job = self._submit(environ, params, keep_events=False)
+        if not job.wait(self.simulate_timeout):
+            job.cancel()
+            raise HTTPError(504, "Simulation timed out; use POST /jobs for long runs")
+        if job.status != JOB_DONE:
+            raise HTTPError(500, job.error or f"Job {job.status}")
+        return 200, asdict(job.summary)
+
+    def create_job(self, environ: Dict[str, Any]) -> Tuple[int, Any]:
+        params = self._params(environ)
+        if params.hands > self.max_job_hands:
+            raise HTTPError(400, f"hands must be at most {self.max_job_hands} for /jobs; use /simulate for summary-only runs")
+        job = self._submit(environ, params)
+        return 202, job.status_dict()
+
+    def _job(self, job_id: str):
+        job = self.manager.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"Unknown job {job_id}")
+        return job
+
+    def job_status(self, job_id: str) -> Tuple[int, Any]:
+        job = self._job(job_id)
+        payload = job.status_dict()
+        if job.status == JOB_DONE and job.summary is not None:
+            payload["summary"] = asdict(job.summary)
+        return 200, payload
+
+    def cancel_job(self, job_id: str) -> Tuple[int, Any]:
+        job = self._job(job_id)
+        if not self.manager.cancel(job_id):
+            raise HTTPError(409, f"Job {job_id} is already {job.status}")
+        return 202, job.status_dict()
+
+    def job_events(self, job_id: str, environ: Dict[str, Any]) -> Tuple[int, Any]:
+        job = self._job(job_id)
+        if job.status != JOB_DONE or job.events is None:
+            raise HTTPError(409, f"Job {job_id} is {job.status}; events are available once done")
+        qs = parse_qs(environ.get("QUERY_STRING", ""))
+        try:
+            offset = max(0, int(qs.get("offset", ["0"])[0]))
+            limit = min(10_000, max(1, int(qs.get("limit", ["1000"])[0])))
+        except ValueError:
+            raise HTTPError(400, "offset and limit must be integers")
+        page: List[Dict[str, Any]] = [asdict(e) for e in job.events[offset:offset + limit]]
+        total = len(job.events)
+        next_offset = offset + len(page) if offset + len(page) < total else None
+        return 200, {"job_id": job_id, "total": total, "offset": offset, "next_offset": next_offset, "events": page}
+
+
+    # ------------------------------------------------------------------
+    # Live stream
+    # ------------------------------------------------------------------
+    def stream(self, method: str, environ: Dict[str, Any], start_response: Callable) -> Iterable[bytes]:
+        """Push each HandEvent with running KPIs as SSE (default) or NDJSON, paced server-side.
+
+        Control options (hands_per_sec, format) come from the query string; RunParams
+        come from the query string for GET (EventSource) or the JSON body for POST.
+        """
+        qs = parse_qs(environ.get("QUERY_STRING", ""))
+        fmt = qs.pop("format", ["sse"])[-1]
+        if fmt not in ("sse", "ndjson"):
+            raise HTTPError(400, "format must be sse or ndjson")
+        try:
+            rate = float(qs.pop("hands_per_sec", ["2"])[-1])
+        except ValueError:
+            raise HTTPError(400, "hands_per_sec must be a number")
+        rate = min(max(rate, 0.0), MAX_HANDS_PER_SEC)
+        if method == "POST":
+            data = _read_json(environ)
+        elif method == "GET":
+            data = _query_params(qs)
+        else:
+            raise HTTPError(405, "Use GET or POST")
+        params = self._params(environ, data)
+        if not self._stream_slots.acquire(blocking=False):
+            raise HTTPError(429, "Too many concurrent streams")
+        # 在发送 200 之前启动生成器（构造牌靴与策略并发出第一局），
+        # 这样参数问题仍能以 400 返回，而不是在已开始的流中途抛出
+        gen = simulate_hands(params, yield_per_hand=True)
+        try:
+            first: Any = next(gen)
+        except StopIteration as stop:
+            first = stop
+        except ValueError as e:
+            self._stream_slots.release()
+            raise HTTPError(400, str(e))
+        except BaseException:
+            self._stream_slots.release()
+            raise
+        content_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+        start_response("200 OK", [
+            ("Content-Type", f"{content_type}; charset=utf-8"),
+            ("Cache-Control", "no-cache"),
+            ("X-Accel-Buffering", "no"),
+        ])
+        return _StreamBody(self._stream_body(gen, first, params, fmt, rate), self._stream_slots.release)
+
+    def _stream_body(self, gen: Iterator[HandEvent], first: Any, params: RunParams, fmt: str, rate: float) -> Iterator[bytes]:
+        """Frames for ``gen``, whose first item (or StopIteration) was already taken as ``first``."""
+        def frame(kind: str, payload: Dict[str, Any]) -> bytes:
+            text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+            if fmt == "sse":
+                return f"event: {kind}\ndata: {text}\n\n".encode("utf-8")
+            return (json.dumps({"type": kind, **payload}, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+        stats = RunningStats()
+        interval = (1.0 / rate) if rate > 0 else 0.0
+        next_at = time.monotonic()
+        ev = first
+        try:
+            while True:
+                if isinstance(ev, StopIteration):
+                    yield frame("summary", {"summary": asdict(ev.value)})
+                    return
+                stats.update(ev)
+                yield frame("hand", {"event": asdict(ev), "kpi": stream_kpis(stats, ev, float(params.bankroll))})
+                if interval:
+                    next_at += interval
+                    delay = next_at - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                try:
+                    ev = next(gen)
+                except StopIteration as stop:
+                    ev = stop
+        finally:
+            gen.close()
+
+
+def create_app(manager: Optional[JobManager] = None) -> SimulationAPI:
+    """WSGI application factory (picked up by wsgi.py)."""
+    return SimulationAPI(
+        manager=manager,
+        max_hands=int(os.environ.get("API_MAX_HANDS", "1000000")),
+        simulate_timeout=float(os.environ.get("API_SIMULATE_TIMEOUT", "300")),
+        max_streams=int(os.environ.get("API_MAX_STREAMS", "64")),
+        max_job_hands=int(os.environ.get("API_MAX_JOB_HANDS", "100000")),
+        trust_client_id=os.environ.get("API_TRUST_CLIENT_ID", "").strip().lower() in ("1", "true", "yes", "on"),
+    )
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Baccarat simulator HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    httpd = make_server(args.host, args.port, create_app(), server_class=_ThreadingWSGIServer)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()